@@ -0,0 +1,108 @@
+"""
+Benchmark of the parallel horizon evaluation against the serial one.
+
+Builds a synthetic archive in a temporary directory (hourly forecast runs
+with 48 target hours and quarter-hourly observations), evaluates it serially
+and with a process pool, checks that both CSV outputs are byte-identical and
+prints the timings:
+
+    python -m benchmarks.parallel_evaluation --cities 8 --days 60 --workers 4
+"""
+
+import io
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from storage import archive
+from evaluator.horizon import build_horizon_pairs, horizon_metrics, prepare_actuals
+from evaluator.parallel import SHARD_DAYS, evaluate_parallel
+
+PARAMETERS = ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"]
+START = datetime(2025, 1, 1)
+EVALUATION_TIMESTAMP = "benchmark"
+
+
+def build_archive(root: Path, cities: List[str], days: int, seed: int = 0) -> None:
+    """Write `days` of hourly runs and observations per city, one append per city and kind."""
+    rng = np.random.default_rng(seed)
+    issues = pd.date_range(START, periods=days * 24, freq="h") + pd.Timedelta(minutes=55)
+    leads = np.arange(48)
+    for city in cities:
+        issue = np.repeat(issues.to_numpy(), len(leads))
+        target = issue.astype("datetime64[h]") + np.tile(leads, len(issues)).astype("timedelta64[h]")
+        forecasts = pd.DataFrame({"issue_time": issue, "target_time": target.astype("datetime64[s]")})
+        for p in PARAMETERS:
+            forecasts[p] = rng.normal(10, 5, len(forecasts)).round(1)
+        archive.append_frame("hourly", city, forecasts, root=root)
+
+        observed = pd.date_range(START, periods=days * 96, freq="15min")
+        actuals = pd.DataFrame({
+            "issue_time": observed + pd.Timedelta(minutes=7),
+            "target_time": observed,
+            "temperature": rng.normal(10, 5, len(observed)).round(1),
+            "precipitation": np.clip(rng.normal(0, 1, len(observed)), 0, None).round(1),
+            "cloudcover": rng.uniform(0, 100, len(observed)).round(0),
+            "windspeed": np.abs(rng.normal(10, 5, len(observed))).round(1),
+        })
+        archive.append_frame("actual", city, actuals, root=root)
+
+
+def evaluate_serial(cities: List[str], root: Path) -> pd.DataFrame:
+    """The per-city loop of `run_hourly_analysis.run_hourly_horizon_accuracy_evaluation`."""
+    results = []
+    for city in cities:
+        actuals = prepare_actuals(archive.query("actual", city, root=root), PARAMETERS)
+        forecasts = archive.query("hourly", city, parameters=PARAMETERS, root=root)
+        pairs = build_horizon_pairs(forecasts, actuals, PARAMETERS)
+        if not pairs.empty:
+            results.append(horizon_metrics(pairs, EVALUATION_TIMESTAMP))
+    return pd.concat(results, ignore_index=True)
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    buffer = io.StringIO()
+    df.sort_values(by=["city", "parameter", "horizon_hours"]).to_csv(buffer, index=False, float_format="%.3f")
+    return buffer.getvalue().encode()
+
+
+def run(cities: int, days: int, workers: int, shard_days: int) -> None:
+    names = [f"City{i}" for i in range(cities)]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        started = time.perf_counter()
+        build_archive(root, names, days)
+        print(f"[INFO] Built archive for {cities} cities x {days} days in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        serial = to_csv_bytes(evaluate_serial(names, root))
+        serial_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        parallel = to_csv_bytes(evaluate_parallel(names, PARAMETERS, workers=workers, shard_days=shard_days,
+                                                  evaluation_timestamp=EVALUATION_TIMESTAMP, root=root))
+        parallel_time = time.perf_counter() - started
+
+    print(f"serial:              {serial_time:6.2f}s")
+    print(f"parallel ({workers} workers): {parallel_time:6.2f}s  speedup x{serial_time / parallel_time:.2f}")
+    print(f"identical output:    {serial == parallel}")
+    if serial != parallel:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Serial vs parallel horizon evaluation")
+    parser.add_argument("--cities", type=int, default=8)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-days", type=int, default=SHARD_DAYS)
+    args = parser.parse_args()
+    run(args.cities, args.days, args.workers, args.shard_days)
@@ -0,0 +1,220 @@
+"""
+Benchmark of the whole pipeline on synthetic data (benchmarks.synthetic).
+
+For every scale (locations x months) a fresh data directory is generated in a
+temporary workspace and each stage is timed there, the way the run_* scripts
+call it:
+
+    load_csv            storage.load.load_frame over every collector CSV file
+    archive_sync        manifest build and ingest of the CSV files into the archive
+    horizon_evaluation  run_hourly_analysis.run_hourly_horizon_accuracy_evaluation
+    horizon_scan        the same from the memory-mapped forecast store (first sync included)
+    daily_accuracy      run_daily_accuracy.run_daily_accuracy_backfill over the whole period
+    plot_render         visual.batch, every horizon plot rendered
+    plot_unchanged      visual.batch again with unchanged data (all skipped)
+    fetch_batch         fetcher.batch.fetch_batch against the local stub server
+    fetch_async_single  fetcher.aio.fetch_batch_async, one request per location
+
+Timings are written as JSON together with the commit and library versions, so
+runs of two commits can be compared:
+
+    python -m benchmarks.pipeline --scale 3x1 --scale 5x2
+    python -m benchmarks.pipeline --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+import run_daily_accuracy
+import run_hourly_analysis
+from benchmarks import synthetic
+from fetcher.aio import fetch_batch_async
+from fetcher.batch import fetch_batch
+from fetcher.hourly_forecast import HOURLY_VARIABLES
+from fetcher.stub_server import start_stub_server
+from storage import archive
+from storage.layout import CSV_LAYOUT
+from storage.load import load_frame
+from visual.batch import horizon_plot_jobs, render_batch
+
+RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_SCALES = ["3x1", "5x2"]
+
+# Steps slower than this factor of the baseline are reported as regressions
+REGRESSION_RATIO = 1.2
+
+FETCH_QUERY = {"hourly": ",".join(HOURLY_VARIABLES), "forecast_days": 2, "timezone": "Europe/Ljubljana"}
+PLOT_HORIZONS = 6
+
+
+def parse_scale(value: str) -> Tuple[int, int]:
+    """'10x3' -> (10 locations, 3 months)."""
+    locations, months = value.lower().split("x")
+    return int(locations), int(months)
+
+
+def environment() -> Dict:
+    """Commit and versions the timings belong to."""
+    def git(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=Path(__file__).parent, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _timed(steps: Dict[str, float], name: str, step: Callable, verbose: bool):
+    """Run one step, record its wall time and keep its output quiet unless `verbose`."""
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        started = time.perf_counter()
+        result = step()
+        steps[name] = round(time.perf_counter() - started, 4)
+    print(f"[INFO]   {name:<20} {steps[name]:8.3f}s")
+    return result
+
+
+def run_scale(workspace: Path, location_count: int, months: int, workers: int, verbose: bool = False) -> Dict:
+    """Generate one scale in `workspace` and time every stage there."""
+    os.chdir(workspace)
+    counts = synthetic.generate(Path("data"), location_count, months)
+    names = synthetic.location_names(location_count)
+    run_hourly_analysis.CITIES = names
+    run_daily_accuracy.cities = names
+    Path("data/results").mkdir(parents=True, exist_ok=True)
+
+    start = synthetic.START.date()
+    end = (pd.Timestamp(start) + pd.DateOffset(months=months) - pd.Timedelta(days=1)).date()
+    steps: Dict[str, float] = {}
+    print(f"[INFO] {location_count} locations x {months} months ({sum(counts.values())} files)")
+
+    rows = _timed(steps, "load_csv", lambda: sum(
+        len(load_frame(f"{prefix}_*.csv", subfolder)) for subfolder, prefix in CSV_LAYOUT.values()
+    ), verbose)
+    _timed(steps, "archive_sync", archive.sync, verbose)
+    _timed(steps, "horizon_evaluation", run_hourly_analysis.run_hourly_horizon_accuracy_evaluation, verbose)
+    _timed(steps, "horizon_scan", run_hourly_analysis.run_hourly_horizon_accuracy_scan, verbose)
+    _timed(steps, "daily_accuracy", lambda: run_daily_accuracy.run_daily_accuracy_backfill(start, end), verbose)
+
+    parameters = run_hourly_analysis.PARAMETERS
+    jobs = _timed(steps, "plot_jobs", lambda: horizon_plot_jobs(names, parameters, PLOT_HORIZONS), verbose)
+    _timed(steps, "plot_render", lambda: render_batch(jobs, workers, force=True), verbose)
+    _timed(steps, "plot_unchanged", lambda: render_batch(jobs, workers), verbose)
+
+    server, url = start_stub_server()
+    try:
+        coords = synthetic.locations(location_count)
+        _timed(steps, "fetch_batch", lambda: fetch_batch(FETCH_QUERY, coords, url, cache_mode="bypass"), verbose)
+        _timed(steps, "fetch_async_single", lambda: asyncio.run(
+            fetch_batch_async(FETCH_QUERY, coords, url, max_locations=1, cache_mode="bypass")
+        ), verbose)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "locations": location_count,
+        "months": months,
+        "files": counts,
+        "csv_rows": rows,
+        "plots": len(jobs),
+        "steps": steps,
+    }
+
+
+def run(scales: List[Tuple[int, int]], workers: int, output: Path = None, verbose: bool = False) -> Path:
+    """Benchmark every scale and write the JSON report. Returns its path."""
+    report = environment()
+    report["scales"] = []
+    cwd = Path.cwd()
+    try:
+        for location_count, months in scales:
+            with tempfile.TemporaryDirectory(prefix="pipeline_benchmark_") as tmp:
+                report["scales"].append(run_scale(Path(tmp), location_count, months, workers, verbose))
+                os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+
+    if output is None:
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        output = RESULTS_DIR / f"pipeline_{stamp}_{(report['commit'] or 'nogit')[:10]}.json"
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, output)
+    print(f"[INFO] Benchmark results saved to {output}")
+    return output
+
+
+def compare(baseline: Path, current: Path, threshold: float = REGRESSION_RATIO) -> int:
+    """Print per-step ratios current/baseline for the scales both runs have. Returns the number of regressions."""
+    reports = []
+    for path in (baseline, current):
+        with Path(path).open("r", encoding="utf-8") as f:
+            reports.append(json.load(f))
+    old, new = ({(s["locations"], s["months"]): s["steps"] for s in r["scales"]} for r in reports)
+    print(f"baseline {reports[0]['commit'][:10] or '?'}  current {reports[1]['commit'][:10] or '?'}")
+
+    regressions = 0
+    for scale in sorted(old.keys() & new.keys()):
+        print(f"\n{scale[0]} locations x {scale[1]} months")
+        for step in old[scale]:
+            if step not in new[scale]:
+                continue
+            before, after = old[scale][step], new[scale][step]
+            ratio = after / before if before else float("inf")
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {step:<20} {before:8.3f}s -> {after:8.3f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic data")
+    parser.add_argument("--scale", action="append", help="LOCATIONSxMONTHS, may be repeated "
+                        f"(default {' '.join(DEFAULT_SCALES)})")
+    parser.add_argument("--workers", type=int, default=1, help="plot render processes")
+    parser.add_argument("--output", type=Path, help=f"JSON report, default a new file in {RESULTS_DIR}")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the stages")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASELINE", "CURRENT"),
+                        help="compare two reports instead of running")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO,
+                        help="slowdown factor reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+    run([parse_scale(s) for s in args.scale or DEFAULT_SCALES], args.workers, args.output, args.verbose)
@@ -0,0 +1,184 @@
+"""
+Synthetic data directory in the layout the collectors write through
+`storage.save.save_records`:
+
+    data/hourly_forecasts/hourly_{city}_{YYYY-MM-DD}_{HH-MM}.csv   one run per hour, 48 target hours
+    data/daily_forecasts/forecast_{city}_{YYYY-MM-DD}.csv         one run per day, 10 target days
+    data/actual_data/actual_{city}_{YYYY-MM-DD}_{HH-MM}.csv       one current_weather snapshot per hour
+
+Values follow a seasonal and diurnal cycle with autocorrelated noise, and
+forecast errors grow with the lead time, so accuracy curves look plausible.
+
+    python -m benchmarks.synthetic --out /tmp/synthetic --locations 10 --months 3
+"""
+
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import DAILY_PARAMS, HOURLY_PARAMS
+from storage.layout import CSV_LAYOUT
+
+START = datetime(2025, 1, 1)
+HOURLY_LEADS = 48
+DAILY_LEADS = 10
+
+# Minute past the hour at which the simulated collector runs, and the
+# observation interval of the current_weather snapshots
+COLLECT_MINUTE = 55
+OBSERVATION_MINUTES = 15
+
+# Forecast error standard deviation at lead 0; it grows by 4% per hour and 25% per day of lead
+ERROR_SPREAD = {
+    "temperature_2m": 0.6, "precipitation": 0.3, "cloudcover": 12.0, "windspeed_10m": 1.5,
+    "temperature_2m_min": 0.8, "temperature_2m_max": 0.8, "temperature_2m_mean": 0.6,
+    "precipitation_sum": 2.0, "cloudcover_mean": 10.0, "windspeed_10m_max": 2.5,
+}
+HOURLY_GROWTH = 0.04
+DAILY_GROWTH = 0.25
+
+ACTUAL_FIELDS = ["time", "interval", "temperature", "windspeed", "winddirection", "is_day", "weathercode",
+                 "fetched_time", "api_time"]
+
+
+def location_names(count: int) -> List[str]:
+    """The three tracked cities first, then generic names."""
+    names = ["Koper", "Ljubljana", "Maribor"][:count]
+    return names + [f"Location{i:03d}" for i in range(len(names), count)]
+
+
+def locations(count: int, seed: int = 0) -> Dict[str, Tuple[float, float]]:
+    """Coordinates spread over Slovenia."""
+    rng = np.random.default_rng(seed)
+    return {
+        name: (round(float(rng.uniform(45.4, 46.9)), 4), round(float(rng.uniform(13.4, 16.6)), 4))
+        for name in location_names(count)
+    }
+
+
+def truth(times: pd.DatetimeIndex, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Hourly 'true' weather for one location."""
+    n = len(times)
+    day_of_year = times.dayofyear.to_numpy()
+    hour = times.hour.to_numpy()
+    noise = np.cumsum(rng.normal(0, 0.4, n))
+    noise -= np.convolve(noise, np.ones(72) / 72, mode="same")
+    temperature = 11 - 9 * np.cos(2 * np.pi * (day_of_year - 15) / 365) \
+        + 4.5 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 1.5) + noise
+    wet = np.convolve(rng.random(n) < 0.04, np.ones(6), mode="same") > 0
+    precipitation = np.where(wet, rng.gamma(0.8, 1.2, n), 0.0)
+    cloudcover = np.clip(np.where(wet, 85, 35) + rng.normal(0, 20, n), 0, 100)
+    windspeed = np.abs(8 + 4 * np.sin(2 * np.pi * hour / 24) + rng.normal(0, 3, n))
+    return {
+        "temperature_2m": temperature,
+        "precipitation": precipitation,
+        "cloudcover": cloudcover,
+        "windspeed_10m": windspeed,
+    }
+
+
+def _forecast_error(parameter: str, leads: np.ndarray, rng: np.random.Generator, growth: float) -> np.ndarray:
+    """Noise with a standard deviation of ERROR_SPREAD at lead 0, growing linearly with the lead."""
+    return rng.normal(0, ERROR_SPREAD[parameter] * (1 + leads * growth), len(leads))
+
+
+def _format(parameter: str, values: np.ndarray) -> List:
+    if parameter.startswith("cloudcover"):
+        return [int(v) for v in np.clip(np.round(values), 0, 100)]
+    if parameter.startswith(("precipitation", "windspeed")):
+        values = np.clip(values, 0, None)
+    return [round(float(v), 1) for v in values]
+
+
+def _write(path: Path, header: List[str], rows) -> None:
+    """Same dialect as csv.DictWriter in storage.save.save_records."""
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate(data_dir: Path, location_count: int = 3, months: int = 1, start: datetime = START,
+             seed: int = 0) -> Dict[str, int]:
+    """Write the collector files of `location_count` locations for `months` months. Returns file counts."""
+    data_dir = Path(data_dir)
+    folders = {kind: data_dir / subfolder for kind, (subfolder, _) in CSV_LAYOUT.items()}
+    for folder in folders.values():
+        folder.mkdir(parents=True, exist_ok=True)
+
+    end = (pd.Timestamp(start) + pd.DateOffset(months=months)).to_pydatetime()
+    hours = int((end - start).total_seconds() // 3600)
+    times = pd.date_range(start, periods=hours + (DAILY_LEADS + 1) * 24, freq="h")
+    stamps = times.strftime("%Y-%m-%dT%H:%M")
+    counts = {"hourly": 0, "daily": 0, "actual": 0}
+    leads = np.arange(HOURLY_LEADS)
+    day_leads = np.arange(DAILY_LEADS)
+
+    for index, name in enumerate(location_names(location_count)):
+        rng = np.random.default_rng(seed * 1000 + index)
+        values = truth(times, rng)
+        daily = pd.DataFrame(values, index=times).resample("D")
+        daily_truth = {
+            "temperature_2m_min": daily["temperature_2m"].min().to_numpy(),
+            "temperature_2m_max": daily["temperature_2m"].max().to_numpy(),
+            "temperature_2m_mean": daily["temperature_2m"].mean().to_numpy(),
+            "precipitation_sum": daily["precipitation"].sum().to_numpy(),
+            "cloudcover_mean": daily["cloudcover"].mean().to_numpy(),
+            "windspeed_10m_max": daily["windspeed_10m"].max().to_numpy(),
+        }
+        days = daily["temperature_2m"].min().index.strftime("%Y-%m-%d")
+
+        for h in range(hours):
+            issued = times[h] + timedelta(minutes=COLLECT_MINUTE)
+            stamp = issued.strftime("%Y-%m-%d_%H-%M")
+
+            # Hourly run: 48 target hours from the start of the issue hour
+            columns = [stamps[h:h + HOURLY_LEADS]]
+            for p in HOURLY_PARAMS:
+                columns.append(_format(p, values[p][h:h + HOURLY_LEADS] + _forecast_error(p, leads, rng, HOURLY_GROWTH)))
+            _write(folders["hourly"] / f"hourly_{name}_{stamp}.csv", ["time"] + HOURLY_PARAMS, zip(*columns))
+            counts["hourly"] += 1
+
+            # current_weather snapshot of the last full observation interval
+            observed = issued.replace(minute=(COLLECT_MINUTE // OBSERVATION_MINUTES) * OBSERVATION_MINUTES)
+            fetched = issued + timedelta(seconds=int(rng.integers(1, 30)), microseconds=int(rng.integers(0, 10 ** 6)))
+            obs = observed.strftime("%Y-%m-%dT%H:%M")
+            hour = times[h].hour
+            row = [obs, OBSERVATION_MINUTES * 60,
+                   round(float(values["temperature_2m"][h]), 1), round(float(values["windspeed_10m"][h]), 1),
+                   int(rng.integers(0, 360)), int(6 <= hour < 20), int(rng.choice([0, 1, 2, 3, 61])),
+                   fetched.isoformat(), obs]
+            _write(folders["actual"] / f"actual_{name}_{stamp}.csv", ACTUAL_FIELDS, [row])
+            counts["actual"] += 1
+
+            # Daily run once a day, with the first collection of the day
+            if hour == 0:
+                d = h // 24
+                columns = [days[d:d + DAILY_LEADS]]
+                for p in DAILY_PARAMS:
+                    columns.append(_format(p, daily_truth[p][d:d + DAILY_LEADS]
+                                           + _forecast_error(p, day_leads, rng, DAILY_GROWTH)))
+                _write(folders["daily"] / f"forecast_{name}_{days[d]}.csv", ["time"] + DAILY_PARAMS, zip(*columns))
+                counts["daily"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Write a synthetic collector data directory")
+    parser.add_argument("--out", type=Path, required=True, help="data directory to create")
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--months", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.out, args.locations, args.months, seed=args.seed)
+    print(f"[INFO] Wrote {sum(counts.values())} files ({counts}) to {args.out} "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -9,6 +9,8 @@ CITY_COORDS: Dict[str, Tuple[float, float]] = {
 
 # API Endpoints
 OPEN_METEO_FORECAST_API = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_HISTORICAL_FORECAST_API = "https://historical-forecast-api.open-meteo.com/v1/forecast"
+OPEN_METEO_ARCHIVE_API = "https://archive-api.open-meteo.com/v1/archive"
 
 # Timezone to be used in queries
 TIMEZONE = "Europe/Ljubljana"
@@ -30,3 +32,13 @@ DAILY_PARAMS = [
     "cloudcover_mean",
     "windspeed_10m_max"
 ]
+
+# Open-Meteo request budgets (free tier). A request for several locations
+# counts as one call per location.
+OPEN_METEO_RATE_LIMITS = {
+    "minute": 600,
+    "hour": 5000,
+    "day": 10000,
+}
+# Hosts the budgets apply to (suffix match); anything else, e.g. a local stand-in server, is not limited
+RATE_LIMITED_HOSTS = ("open-meteo.com",)
@@ -1,7 +1,8 @@
 # evaluator/compare.py
 
 import pandas as pd
-from evaluator.metrics import evaluate_metrics
+from evaluator.metrics import accumulate_metrics, merge_accumulators, metric_results
+from telemetry import recorder
 
 def align_and_evaluate(
     forecast_df: pd.DataFrame,
@@ -10,44 +11,53 @@ def align_and_evaluate(
     parameters: list,
     metrics: list,
     city: str = None,
-    timestamp: str = None
+    timestamp: str = None,
+    accumulators: dict = None
 ) -> pd.DataFrame:
     """
     Align forecast and actual data by timestamp, and compute evaluation metrics for each parameter.
     Returns a dataframe with timestamp, parameter, and computed metric values.
+    If `accumulators` ({parameter: {metric: accumulator}}) is given, the pairs are also
+    folded into it, so results of several calls (shards, days, workers) can be merged.
     """
-    merged = pd.merge(
-        forecast_df,
-        actual_df,
-        on=timestamp_col,
-        suffixes=("_forecast", "_actual")
-    )
+    with recorder.stage("align", city=city) as stage:
+        merged = pd.merge(
+            forecast_df,
+            actual_df,
+            on=timestamp_col,
+            suffixes=("_forecast", "_actual")
+        )
+        stage.rows = len(merged)
 
     results = []
+    with recorder.stage("metrics", city=city) as stage:
+        for param in parameters:
+            print(f"working on parameter: {param}")
+            if f"{param}_forecast" in merged.columns and f"{param}_actual" in merged.columns:
+                actual_series = pd.to_numeric(merged[f"{param}_actual"], errors='coerce')
+                forecast_series = pd.to_numeric(merged[f"{param}_forecast"], errors='coerce')
+                if actual_series.empty or forecast_series.empty:
+                    print(f"[WARNING] No data for parameter {param} in city {city}")
+                    continue
+                valid_mask = actual_series.notna() & forecast_series.notna()
+                if valid_mask.sum() == 0:
+                    continue
 
-    for param in parameters:
-        print(f"working on parameter: {param}")
-        if f"{param}_forecast" in merged.columns and f"{param}_actual" in merged.columns:
-            actual_series = pd.to_numeric(merged[f"{param}_actual"], errors='coerce')
-            forecast_series = pd.to_numeric(merged[f"{param}_forecast"], errors='coerce')
-            if actual_series.empty or forecast_series.empty:
-                print(f"[WARNING] No data for parameter {param} in city {city}")
-                continue
-            valid_mask = actual_series.notna() & forecast_series.notna()
-            if valid_mask.sum() == 0:
-                continue
+                param_accumulators = accumulate_metrics(
+                    actual_series[valid_mask].to_numpy(),
+                    forecast_series[valid_mask].to_numpy(),
+                    metrics
+                )
+                eval_result = metric_results(param_accumulators)
+                if accumulators is not None:
+                    merge_accumulators(accumulators.setdefault(param, {}), param_accumulators)
 
-            eval_result = evaluate_metrics(
-                actual_series[valid_mask],
-                forecast_series[valid_mask],
-                metrics
-            )
-
-            results.append({
-                "parameter": param,
-                **eval_result,
-                "city": city,
-                "timestamp": timestamp
-            })
+                results.append({
+                    "parameter": param,
+                    **eval_result,
+                    "city": city,
+                    "timestamp": timestamp
+                })
+        stage.rows = len(merged)
     print(results)
     return pd.DataFrame(results)
@@ -0,0 +1,194 @@
+# evaluator/cube.py
+
+"""
+Materialised accuracy cube: additive error statistics (see
+evaluator.incremental.STAT_COLUMNS) per city x parameter x horizon x target
+day x issue hour, kept up to date incrementally and rolled up on demand.
+
+    python -m evaluator.cube --by horizon_hours --city Maribor --parameter temperature_2m \
+        --start 2025-05-01 --end 2025-05-31
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from evaluator.incremental import STAT_COLUMNS, empty_state, update_city
+from evaluator.kernel import group_codes, grouped_sums, metrics_from_sums
+
+CUBE_FILE = Path("data/results/accuracy_cube.npz")
+
+CUBE_DIMENSIONS = ["city", "parameter", "horizon_hours", "target_date", "issue_hour"]
+CUBE_METRICS = ("MAE", "RMSE", "MAPE", "BIAS", "VARIANCE")
+
+_STRING_DIMENSIONS = ("city", "parameter")
+
+
+def empty_cube() -> pd.DataFrame:
+    cube = pd.DataFrame({
+        "city": pd.Series(dtype=str),
+        "parameter": pd.Series(dtype=str),
+        "horizon_hours": pd.Series(dtype=np.int64),
+        "target_date": pd.Series(dtype="datetime64[s]"),
+        "issue_hour": pd.Series(dtype=np.int64),
+    })
+    for column in STAT_COLUMNS:
+        cube[column] = pd.Series(dtype=np.int64 if column.endswith("count") else np.float64)
+    return cube
+
+
+def cube_statistics(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Reduce forecast/actual pairs (evaluator.horizon.PAIR_COLUMNS) to cube cells."""
+    if pairs.empty:
+        return empty_cube()
+    pairs = pairs.assign(
+        target_date=pd.to_datetime(pairs["target_time"]).dt.normalize().astype("datetime64[s]"),
+        issue_hour=pd.to_datetime(pairs["forecast_generation_time"]).dt.hour.astype(np.int64),
+    )
+    codes, cells = group_codes(pairs, CUBE_DIMENSIONS)
+    sums = grouped_sums(
+        codes,
+        pairs["actual_value"].to_numpy(dtype=float),
+        pairs["forecast_value"].to_numpy(dtype=float),
+        len(cells),
+    )
+    for column in STAT_COLUMNS:
+        cells[column] = sums[column]
+    return cells[CUBE_DIMENSIONS + STAT_COLUMNS]
+
+
+def merge_cubes(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """Add two cubes cell by cell."""
+    frames = [df for df in (left, right) if not df.empty]
+    if not frames:
+        return empty_cube()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.groupby(CUBE_DIMENSIONS, sort=True)[STAT_COLUMNS].sum().reset_index()
+
+
+def load_cube(path: Path = CUBE_FILE) -> Tuple[Dict, pd.DataFrame]:
+    """(bookkeeping state, cube cells). Both live in one file so they can never disagree."""
+    path = Path(path)
+    if not path.exists():
+        return empty_state(), empty_cube()
+    with np.load(path, allow_pickle=False) as data:
+        state = json.loads(str(data["state"]))
+        cube = pd.DataFrame({
+            column: data[column].astype(str) if column in _STRING_DIMENSIONS else data[column]
+            for column in CUBE_DIMENSIONS + STAT_COLUMNS
+        })
+    return state, cube
+
+
+def save_cube(state: Dict, cube: pd.DataFrame, path: Path = CUBE_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    arrays = {
+        column: cube[column].to_numpy(dtype=str if column in _STRING_DIMENSIONS else None)
+        for column in CUBE_DIMENSIONS + STAT_COLUMNS
+    }
+    arrays["target_date"] = cube["target_date"].to_numpy(dtype="datetime64[s]")
+    state = {key: value for key, value in state.items() if key != "stats"}
+    np.savez(tmp, state=np.array(json.dumps(state)), **arrays)
+    os.replace(tmp, path)
+
+
+def update_cube(cities: List[str], parameters: List[str], path: Path = CUBE_FILE) -> pd.DataFrame:
+    """
+    Fold pairs for newly observed target hours into the cube and persist it.
+    Uses the same bookkeeping as the incremental horizon evaluation; a city
+    whose data arrived out of order is rebuilt.
+    """
+    state, cube = load_cube(path)
+    for city in cities:
+        new_cells = update_city(state, city, parameters, reduce=cube_statistics)
+        if new_cells is None:
+            print(f"[INFO] Out-of-order data for {city}, rebuilding its part of the accuracy cube")
+            state["cities"].pop(city, None)
+            cube = cube[cube["city"] != city]
+            new_cells = update_city(state, city, parameters, reduce=cube_statistics)
+        if not new_cells.empty:
+            print(f"[INFO] Folded {int(new_cells['count'].sum())} new pairs for {city} into the cube")
+        cube = merge_cubes(cube, new_cells)
+    save_cube(state, cube, path)
+    return cube
+
+
+def rollup(
+    cube: pd.DataFrame,
+    by: Optional[List[str]] = None,
+    start=None,
+    end=None,
+    metrics=CUBE_METRICS,
+    **filters,
+) -> pd.DataFrame:
+    """
+    Metrics for the cells with target days in start..end (inclusive) that match
+    `filters` (dimension=value or dimension=[values]), summed over every
+    dimension not in `by`. With no `by` the result is a single row.
+
+        rollup(cube, city="Maribor", parameter="temperature_2m", horizon_hours=6,
+               start="2025-05-01", end="2025-05-31")
+        rollup(cube, by=["city", "issue_hour"], parameter="temperature_2m")
+    """
+    by = list(by or [])
+    unknown = [d for d in by + list(filters) if d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions {unknown}, expected some of {CUBE_DIMENSIONS}")
+
+    mask = np.ones(len(cube), dtype=bool)
+    if start is not None:
+        mask &= (cube["target_date"] >= pd.Timestamp(start).normalize()).to_numpy()
+    if end is not None:
+        mask &= (cube["target_date"] <= pd.Timestamp(end).normalize()).to_numpy()
+    for dimension, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= cube[dimension].isin(list(values)).to_numpy()
+    cells = cube[mask]
+
+    if by:
+        codes, result = group_codes(cells, by)
+        n = len(result)
+    else:
+        codes, result, n = np.zeros(len(cells), dtype=np.intp), pd.DataFrame(index=[0]), 1
+    sums = {column: np.bincount(codes, weights=cells[column].to_numpy(dtype=float), minlength=n)
+            for column in STAT_COLUMNS}
+    for name, values in metrics_from_sums(sums, metrics).items():
+        result[name] = values
+    return result.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage import archive
+
+    parser = argparse.ArgumentParser(description="Update the accuracy cube and roll it up")
+    parser.add_argument("--by", nargs="*", default=["city", "parameter", "horizon_hours"],
+                        choices=CUBE_DIMENSIONS, help="dimensions to keep")
+    parser.add_argument("--start", help="first target day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last target day (YYYY-MM-DD)")
+    parser.add_argument("--city", nargs="+")
+    parser.add_argument("--parameter", nargs="+")
+    parser.add_argument("--horizon", type=int, nargs="+", dest="horizon_hours")
+    parser.add_argument("--issue-hour", type=int, nargs="+", dest="issue_hour")
+    parser.add_argument("--no-update", action="store_true", help="query the cube as it is")
+    args = parser.parse_args()
+
+    if args.no_update:
+        cube = load_cube()[1]
+    else:
+        archive.sync()
+        cube = update_cube(["Koper", "Ljubljana", "Maribor"],
+                           ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"])
+    filters = {d: getattr(args, d) for d in ("city", "parameter", "horizon_hours", "issue_hour")
+               if getattr(args, d)}
+    result = rollup(cube, args.by, args.start, args.end, **filters)
+    print(result.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
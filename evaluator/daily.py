@@ -0,0 +1,75 @@
+# evaluator/daily.py
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from evaluator.kernel import group_codes, grouped_metrics
+from telemetry import recorder
+
+DAILY_PAIR_COLUMNS = [
+    "city", "parameter", "lead_days", "forecast_value", "actual_value", "issue_date", "target_date",
+]
+LEAD_METRIC_COLUMNS = ["city", "parameter", "lead_days", "MAE", "RMSE", "MAPE", "BIAS", "count"]
+
+
+@recorder.timed("align_daily", rows=len)
+def build_daily_pairs(
+    forecasts: pd.DataFrame,
+    actuals: pd.DataFrame,
+    parameters: List[str],
+    min_lead: int = 1,
+    max_lead: int = 10,
+) -> pd.DataFrame:
+    """
+    Join the (issue date x lead day x parameter) matrix of daily forecast runs
+    (`city`, `issue_time`, `target_time`, one column per parameter) to daily
+    actuals (`city`, `target_date`, one column per parameter) in one merge.
+    Pairs with a missing value on either side are dropped.
+    """
+    if forecasts.empty or actuals.empty:
+        return pd.DataFrame(columns=DAILY_PAIR_COLUMNS)
+
+    present = [p for p in parameters if p in forecasts.columns]
+    long = forecasts.melt(
+        id_vars=["city", "issue_time", "target_time"],
+        value_vars=present,
+        var_name="parameter",
+        value_name="forecast_value",
+    )
+    long["issue_date"] = long["issue_time"].dt.normalize()
+    long["target_date"] = long["target_time"].dt.normalize()
+    long["lead_days"] = (long["target_date"] - long["issue_date"]).dt.days
+    long = long[long["lead_days"].between(min_lead, max_lead)]
+
+    observed = [p for p in parameters if p in actuals.columns]
+    long_actuals = actuals.assign(target_date=pd.to_datetime(actuals["target_date"]).dt.normalize()).melt(
+        id_vars=["city", "target_date"],
+        value_vars=observed,
+        var_name="parameter",
+        value_name="actual_value",
+    )
+
+    pairs = long.merge(long_actuals, on=["city", "target_date", "parameter"], how="inner")
+    pairs = pairs[pairs["forecast_value"].notna() & pairs["actual_value"].notna()]
+    return pairs[DAILY_PAIR_COLUMNS].reset_index(drop=True)
+
+
+@recorder.timed("metrics_daily", rows=len)
+def lead_metrics(pairs: pd.DataFrame) -> pd.DataFrame:
+    """MAE, RMSE, MAPE, bias and pair count per (city, parameter, lead day)."""
+    if pairs.empty:
+        return pd.DataFrame(columns=LEAD_METRIC_COLUMNS)
+    codes, grouped = group_codes(pairs, ["city", "parameter", "lead_days"])
+    order = np.lexsort((pairs["target_date"].to_numpy(dtype="datetime64[s]").astype(np.int64), codes))
+    metrics = grouped_metrics(
+        codes[order],
+        pairs["actual_value"].to_numpy(dtype=float)[order],
+        pairs["forecast_value"].to_numpy(dtype=float)[order],
+        n_groups=len(grouped),
+        metrics=("MAE", "RMSE", "MAPE", "BIAS"),
+    )
+    for name, values in metrics.items():
+        grouped[name] = values
+    return grouped[LEAD_METRIC_COLUMNS]
@@ -0,0 +1,137 @@
+# evaluator/daily_observations.py
+
+import json
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from storage import archive
+from evaluator.incremental import save_state
+
+STATE_FILE = Path("data/results/daily_observations_state.json")
+
+# current_weather fields that are aggregated per day
+OBSERVED_FIELDS = ["temperature", "windspeed"]
+
+# Daily forecast parameter -> (observed field, daily statistic). The current_weather
+# snapshots carry no precipitation or cloud cover, so those parameters stay unscored.
+DAILY_PARAMETERS = {
+    "temperature_2m_min": ("temperature", "min"),
+    "temperature_2m_max": ("temperature", "max"),
+    "temperature_2m_mean": ("temperature", "mean"),
+    "windspeed_10m_max": ("windspeed", "max"),
+}
+
+# Days with fewer observed hours are not used as daily actuals
+MIN_HOURS = 20
+
+
+def empty_state() -> Dict:
+    return {"cities": {}}
+
+
+def load_state(path: Path = STATE_FILE) -> Dict:
+    path = Path(path)
+    if not path.exists():
+        return empty_state()
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fold_day(day: Dict, rows: pd.DataFrame) -> None:
+    """Add observations of one day to its running count/sum/min/max per field."""
+    day["observed"] = sorted(set(day["observed"]) | {t.isoformat() for t in rows["target_time"]})
+    for field in OBSERVED_FIELDS:
+        values = rows[field].dropna().to_numpy(dtype=float) if field in rows else np.empty(0)
+        if not values.size:
+            continue
+        count, total, low, high = day["stats"].get(field, [0, 0.0, None, None])
+        day["stats"][field] = [
+            count + int(values.size),
+            total + float(values.sum()),
+            float(values.min()) if low is None else min(low, float(values.min())),
+            float(values.max()) if high is None else max(high, float(values.max())),
+        ]
+
+
+def update_city(state: Dict, city: str) -> bool:
+    """
+    Fold observations archived since the last run into the city's daily
+    aggregates. Every observation (api_time) is counted once, however often it
+    was fetched. Returns False when rows older than the watermark appeared
+    (e.g. from compacted files) and the city must be rebuilt.
+    """
+    city_state = state["cities"].setdefault(city, {"actual_watermark": None, "actual_rows": 0, "days": {}})
+
+    actual_rows = sum(b["rows"] for b in archive.list_batches("actual", city))
+    watermark = city_state["actual_watermark"]
+    issue_start = pd.Timestamp(watermark) + timedelta(seconds=1) if watermark else None
+    new_actuals = archive.query("actual", city, issue_start=issue_start)
+    if city_state["actual_rows"] + len(new_actuals) != actual_rows:
+        return False
+
+    if not new_actuals.empty:
+        rows = new_actuals.drop_duplicates(subset="target_time", keep="first")
+        rows = rows.assign(date=rows["target_time"].dt.strftime("%Y-%m-%d"))
+        for date, day_rows in rows.groupby("date", sort=True):
+            day = city_state["days"].setdefault(date, {"observed": [], "stats": {}})
+            seen = set(day["observed"])
+            day_rows = day_rows[~day_rows["target_time"].map(lambda t: t.isoformat() in seen)]
+            if not day_rows.empty:
+                _fold_day(day, day_rows)
+        city_state["actual_watermark"] = new_actuals["issue_time"].max().isoformat()
+
+    city_state["actual_rows"] = actual_rows
+    return True
+
+
+def update_state(state: Dict, cities: List[str]) -> Dict:
+    """Bring the daily aggregates up to date with the archive, city by city."""
+    for city in cities:
+        if not update_city(state, city):
+            print(f"[INFO] Out-of-order observations for {city}, rebuilding its daily aggregates")
+            state["cities"].pop(city, None)
+            update_city(state, city)
+    return state
+
+
+def daily_frame(state: Dict, start=None, end=None, min_hours: int = MIN_HOURS) -> pd.DataFrame:
+    """
+    Daily actuals from the aggregates: `city`, `target_date`, `hours_observed`,
+    `observations` and one column per entry of DAILY_PARAMETERS, for days in
+    start..end (inclusive) with at least `min_hours` observed hours.
+    """
+    start = str(pd.Timestamp(start).date()) if start is not None else None
+    end = str(pd.Timestamp(end).date()) if end is not None else None
+    records = []
+    for city, city_state in state["cities"].items():
+        for date, day in city_state["days"].items():
+            if (start and date < start) or (end and date > end):
+                continue
+            hours = len({t[:13] for t in day["observed"]})
+            if hours < min_hours:
+                continue
+            record = {"city": city, "target_date": pd.Timestamp(date), "hours_observed": hours,
+                      "observations": len(day["observed"])}
+            for parameter, (field, statistic) in DAILY_PARAMETERS.items():
+                stats = day["stats"].get(field)
+                if stats is None:
+                    record[parameter] = np.nan
+                elif statistic == "mean":
+                    record[parameter] = stats[1] / stats[0]
+                else:
+                    record[parameter] = stats[2] if statistic == "min" else stats[3]
+            records.append(record)
+    columns = ["city", "target_date", "hours_observed", "observations"] + list(DAILY_PARAMETERS)
+    return pd.DataFrame(records, columns=columns).sort_values(["city", "target_date"], ignore_index=True)
+
+
+def run_daily_aggregates(cities: List[str], start=None, end=None, min_hours: int = MIN_HOURS,
+                         path: Path = STATE_FILE) -> pd.DataFrame:
+    """Load the aggregates, fold in new observations, persist them and return the daily actuals."""
+    state = update_state(load_state(path), cities)
+    save_state(state, path)
+    return daily_frame(state, start, end, min_hours)
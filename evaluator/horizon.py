@@ -0,0 +1,136 @@
+# evaluator/horizon.py
+
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from evaluator.kernel import group_codes, grouped_metrics
+from telemetry import recorder
+
+# current_weather field names -> hourly forecast parameter names
+ACTUAL_RENAME = {
+    "temperature": "temperature_2m",
+    "windspeed": "windspeed_10m",
+}
+
+PAIR_COLUMNS = [
+    "city", "parameter", "horizon_hours", "forecast_value", "actual_value",
+    "forecast_generation_time", "target_time",
+]
+
+
+def prepare_actuals(actuals: pd.DataFrame, parameters: List[str]) -> pd.DataFrame:
+    """
+    Hourly observations from archived `actual` rows: the observation time is
+    floored to the hour, fields are renamed to forecast parameter names and
+    only the first observation (in fetch order) of every hour is kept.
+    """
+    df = actuals.rename(columns=ACTUAL_RENAME)
+    df["time"] = pd.to_datetime(df["target_time"]).dt.floor("h")
+    for p in parameters:
+        if p not in df.columns:
+            df[p] = np.nan
+    return df[["city", "time"] + list(parameters)].drop_duplicates(subset=["city", "time"]).reset_index(drop=True)
+
+
+def horizon_hours(seconds: np.ndarray) -> np.ndarray:
+    """Horizon of a forecast: seconds from issue to target time in whole hours, rounded half to even."""
+    return np.round(np.asarray(seconds) / 3600).astype(np.int64)
+
+
+def stack_forecasts(forecasts: pd.DataFrame, parameters: List[str]) -> pd.DataFrame:
+    """
+    Turn wide forecast runs (`city`, `issue_time`, `target_time`, one column per
+    parameter) into one long frame with a horizon column, one row per
+    (run, target time, parameter).
+    """
+    present = [p for p in parameters if p in forecasts.columns]
+    long = forecasts.melt(
+        id_vars=["city", "issue_time", "target_time"],
+        value_vars=present,
+        var_name="parameter",
+        value_name="forecast_value",
+    )
+    long["horizon_hours"] = horizon_hours((long["target_time"] - long["issue_time"]).dt.total_seconds().to_numpy())
+    return long
+
+
+def stack_actuals(actuals: pd.DataFrame, parameters: List[str]) -> pd.DataFrame:
+    """
+    Long frame of observations keyed by (`city`, `time`, `parameter`).
+    Expects one row per city and hour, i.e. duplicates already dropped.
+    """
+    present = [p for p in parameters if p in actuals.columns]
+    return actuals.melt(
+        id_vars=["city", "time"],
+        value_vars=present,
+        var_name="parameter",
+        value_name="actual_value",
+    )
+
+
+@recorder.timed("align_hourly", rows=len)
+def build_horizon_pairs(
+    forecasts: pd.DataFrame,
+    actuals: pd.DataFrame,
+    parameters: List[str],
+    min_horizon: int = 1,
+    max_horizon: int = 24,
+) -> pd.DataFrame:
+    """
+    Join every forecast value to the observation at its target hour in a
+    single merge. Pairs with a missing value on either side are dropped and,
+    when several runs hit the same (city, parameter, horizon, target time),
+    only the latest run is kept.
+    """
+    if forecasts.empty or actuals.empty:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    long_forecasts = stack_forecasts(forecasts, parameters)
+    long_forecasts = long_forecasts[long_forecasts["horizon_hours"].between(min_horizon, max_horizon)]
+    long_actuals = stack_actuals(actuals, parameters)
+
+    pairs = long_forecasts.merge(
+        long_actuals,
+        left_on=["city", "target_time", "parameter"],
+        right_on=["city", "time", "parameter"],
+        how="inner",
+    )
+    pairs["forecast_value"] = pd.to_numeric(pairs["forecast_value"], errors="coerce")
+    pairs["actual_value"] = pd.to_numeric(pairs["actual_value"], errors="coerce")
+    pairs = pairs[pairs["forecast_value"].notna() & pairs["actual_value"].notna()]
+    pairs = pairs.rename(columns={"issue_time": "forecast_generation_time"})
+
+    # Keep the latest forecast for a given target_time & horizon
+    pairs = pairs.sort_values(by="forecast_generation_time", ascending=False, kind="stable")
+    pairs = pairs.drop_duplicates(subset=["city", "parameter", "horizon_hours", "target_time"], keep="first")
+    return pairs[PAIR_COLUMNS].reset_index(drop=True)
+
+
+@recorder.timed("metrics_hourly", rows=len)
+def horizon_metrics(pairs: pd.DataFrame, evaluation_timestamp: Optional[str] = None) -> pd.DataFrame:
+    """
+    MAE, RMSE, MAPE and pair count per (city, parameter, horizon) in one
+    pass of the grouped kernel. MAPE skips pairs whose actual value is zero.
+    """
+    columns = ["city", "parameter", "horizon_hours", "MAE", "RMSE", "MAPE", "count", "evaluation_timestamp"]
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+
+    codes, grouped = group_codes(pairs, ["city", "parameter", "horizon_hours"])
+    # Reduce in (group, target time) order so the sums do not depend on how the
+    # pairs were produced (e.g. merged from parallel shards)
+    order = np.lexsort((pairs["target_time"].to_numpy(dtype="datetime64[s]").astype(np.int64), codes))
+    metrics = grouped_metrics(
+        codes[order],
+        pairs["actual_value"].to_numpy(dtype=float)[order],
+        pairs["forecast_value"].to_numpy(dtype=float)[order],
+        n_groups=len(grouped),
+        metrics=("MAE", "RMSE", "MAPE"),
+    )
+    for name, values in metrics.items():
+        grouped[name] = values
+    grouped["evaluation_timestamp"] = evaluation_timestamp or datetime.now().isoformat()
+    return grouped[columns]
@@ -0,0 +1,215 @@
+# evaluator/incremental.py
+
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage import archive
+from evaluator.horizon import PAIR_COLUMNS, build_horizon_pairs, prepare_actuals
+from evaluator.kernel import group_codes, grouped_sums
+
+STATE_FILE = Path("data/results/hourly_horizon_state.json")
+
+GROUP_COLUMNS = ["city", "parameter", "horizon_hours"]
+# Additive sufficient statistics per (city, parameter, horizon)
+STAT_COLUMNS = ["count", "sum_error", "sum_abs_error", "sum_sq_error", "mape_count", "mape_sum"]
+
+# A forecast issued at t contributes to targets in [t + 0.5h, t + 24.5h] (horizons 1..24)
+MIN_LEAD = timedelta(minutes=30)
+MAX_LEAD = timedelta(hours=24, minutes=30)
+
+
+def empty_state() -> Dict:
+    return {"cities": {}, "stats": []}
+
+
+def load_state(path: Path = STATE_FILE) -> Dict:
+    path = Path(path)
+    if not path.exists():
+        return empty_state()
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict, path: Path = STATE_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def pair_statistics(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Reduce forecast/actual pairs to additive statistics per (city, parameter, horizon)."""
+    if pairs.empty:
+        return pd.DataFrame(columns=GROUP_COLUMNS + STAT_COLUMNS)
+    codes, stats = group_codes(pairs, GROUP_COLUMNS)
+    # Same (group, target time) order as evaluator.horizon.horizon_metrics, so a
+    # single fold gives the same sums as the full evaluation
+    order = np.lexsort((pairs["target_time"].to_numpy(dtype="datetime64[s]").astype(np.int64), codes))
+    sums = grouped_sums(
+        codes[order],
+        pairs["actual_value"].to_numpy(dtype=float)[order],
+        pairs["forecast_value"].to_numpy(dtype=float)[order],
+        len(stats),
+    )
+    for column in STAT_COLUMNS:
+        stats[column] = sums[column]
+    return stats
+
+
+def merge_statistics(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """Add two statistics frames group by group."""
+    frames = [df for df in (left, right) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=GROUP_COLUMNS + STAT_COLUMNS)
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.groupby(GROUP_COLUMNS, sort=True)[STAT_COLUMNS].sum().reset_index()
+
+
+def statistics_to_metrics(stats: pd.DataFrame) -> pd.DataFrame:
+    """MAE, RMSE, MAPE, bias and count from sufficient statistics."""
+    df = stats[GROUP_COLUMNS].copy()
+    count = stats["count"].astype(float)
+    df["MAE"] = stats["sum_abs_error"] / count
+    df["RMSE"] = np.sqrt(stats["sum_sq_error"] / count)
+    mape_count = stats["mape_count"].astype(float).replace(0, np.nan)
+    df["MAPE"] = stats["mape_sum"] / mape_count * 100
+    df["bias"] = stats["sum_error"] / count
+    df["count"] = stats["count"].astype(int)
+    return df
+
+
+def _stats_frame(state: Dict) -> pd.DataFrame:
+    return pd.DataFrame(state["stats"], columns=GROUP_COLUMNS + STAT_COLUMNS)
+
+
+def _has_late_forecasts(new_issues: List[pd.Timestamp], batches: List[Dict], folded_hours: pd.DatetimeIndex,
+                        folded_floor: Optional[pd.Timestamp]) -> bool:
+    """
+    True if a newly seen forecast run covers target hours that were already
+    folded in: one of `folded_hours`, or any hour before `folded_floor`.
+    """
+    if folded_hours.empty and folded_floor is None:
+        return False
+    by_issue = {}
+    for b in batches:
+        by_issue.setdefault(b["issue_min"], b)
+    for issue in new_issues:
+        b = by_issue[int(issue.timestamp())]
+        lo = max(issue + MIN_LEAD, pd.Timestamp(b["target_min"], unit="s"))
+        hi = min(issue + MAX_LEAD, pd.Timestamp(b["target_max"], unit="s"))
+        if folded_floor is not None and lo < folded_floor:
+            return True
+        if ((folded_hours >= lo) & (folded_hours <= hi)).any():
+            return True
+    return False
+
+
+def update_city(state: Dict, city: str, parameters: List[str],
+                reduce: Callable[[pd.DataFrame], pd.DataFrame] = None) -> Optional[pd.DataFrame]:
+    """
+    Fold forecast/actual pairs for target hours that got their first
+    observation since the last run into the city's state. Returns the new
+    statistics (`reduce` of the new pairs, default `pair_statistics`), or None
+    when data arrived out of order (a forecast run or an observation older
+    than the watermark) and the city must be rebuilt.
+
+    The state stays bounded: folded hours and processed runs are kept only
+    for a window of MAX_LEAD before the observation watermark. Older hours
+    count as folded (`folded_floor`) and older runs only by their number
+    (`early_issues`), so anything arriving for them forces a rebuild.
+    """
+    reduce = reduce or pair_statistics
+    city_state = state["cities"].setdefault(city, {
+        "actual_watermark": None,
+        "actual_rows": 0,
+        "folded_floor": None,
+        "folded_hours": [],
+        "early_issues": 0,
+        "processed_issues": [],
+    })
+    folded_hours = pd.DatetimeIndex(pd.to_datetime(city_state["folded_hours"]))
+    folded_floor = city_state.get("folded_floor")
+    folded_floor = pd.Timestamp(folded_floor) if folded_floor else None
+    # A run issued before this reaches only hours before the floor
+    issue_floor = folded_floor - MAX_LEAD if folded_floor is not None else None
+
+    # Forecast runs we have not seen yet must not reach into already folded hours
+    forecast_batches = archive.list_batches("hourly", city)
+    processed = set(city_state["processed_issues"])
+    all_issues = sorted({pd.Timestamp(b["issue_min"], unit="s") for b in forecast_batches})
+    early = [i for i in all_issues if issue_floor is not None and i < issue_floor]
+    if len(early) != city_state.get("early_issues", 0):
+        return None
+    new_issues = [i for i in all_issues[len(early):] if i.isoformat() not in processed]
+    if _has_late_forecasts(new_issues, forecast_batches, folded_hours, folded_floor):
+        return None
+
+    # Observations are read from the watermark on; older rows showing up later force a rebuild
+    actual_rows = sum(b["rows"] for b in archive.list_batches("actual", city))
+    watermark = city_state["actual_watermark"]
+    issue_start = pd.Timestamp(watermark) + timedelta(seconds=1) if watermark else None
+    new_actuals = archive.query("actual", city, issue_start=issue_start)
+    if city_state["actual_rows"] + len(new_actuals) != actual_rows:
+        return None
+
+    stats = reduce(pd.DataFrame(columns=PAIR_COLUMNS))
+    if not new_actuals.empty:
+        hourly = prepare_actuals(new_actuals, parameters)
+        if folded_floor is not None and (hourly["time"] < folded_floor).any():
+            return None
+        hourly = hourly[~hourly["time"].isin(folded_hours)]
+        if not hourly.empty:
+            forecasts = archive.query(
+                "hourly", city, parameters=parameters,
+                issue_start=hourly["time"].min() - MAX_LEAD,
+                target_start=hourly["time"].min(),
+                target_end=hourly["time"].max(),
+            )
+            stats = reduce(build_horizon_pairs(forecasts, hourly, parameters))
+            folded_hours = folded_hours.append(pd.DatetimeIndex(hourly["time"])).sort_values()
+        watermark = new_actuals["issue_time"].max()
+        city_state["actual_watermark"] = watermark.isoformat()
+        # Observations fetched after the watermark are for later hours, so older folded hours can go
+        folded_floor = max(folded_floor, watermark - MAX_LEAD) if folded_floor is not None else watermark - MAX_LEAD
+        folded_hours = folded_hours[folded_hours >= folded_floor]
+        issue_floor = folded_floor - MAX_LEAD
+
+    early = [i for i in all_issues if issue_floor is not None and i < issue_floor]
+    city_state["actual_rows"] = actual_rows
+    city_state["folded_floor"] = folded_floor.isoformat() if folded_floor is not None else None
+    city_state["folded_hours"] = [t.isoformat() for t in folded_hours]
+    city_state["early_issues"] = len(early)
+    city_state["processed_issues"] = [i.isoformat() for i in all_issues[len(early):]]
+    return stats
+
+
+def update_state(state: Dict, cities: List[str], parameters: List[str]) -> Dict:
+    """Bring the persisted statistics up to date with the archive, city by city."""
+    stats = _stats_frame(state)
+    for city in cities:
+        new_stats = update_city(state, city, parameters)
+        if new_stats is None:
+            print(f"[INFO] Out-of-order data for {city}, rebuilding its horizon statistics")
+            state["cities"].pop(city, None)
+            stats = stats[stats["city"] != city]
+            new_stats = update_city(state, city, parameters)
+        if not new_stats.empty:
+            print(f"[INFO] Folded {int(new_stats['count'].sum())} new pairs for {city}")
+        stats = merge_statistics(stats, new_stats)
+    state["stats"] = stats.to_dict(orient="records")
+    return state
+
+
+def run_incremental(cities: List[str], parameters: List[str], path: Path = STATE_FILE) -> pd.DataFrame:
+    """Load the state, fold in new data, persist it and return metrics for all groups."""
+    state = update_state(load_state(path), cities, parameters)
+    save_state(state, path)
+    return statistics_to_metrics(_stats_frame(state))
@@ -0,0 +1,115 @@
+# evaluator/kernel.py
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+KERNEL_METRICS = ("MAE", "RMSE", "MAPE", "BIAS", "VARIANCE")
+
+
+def group_codes(df: pd.DataFrame, columns: List[str]) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Integer group code per row for the given key columns, plus the key values of
+    every group (row i of the keys frame belongs to code i, keys sorted).
+    """
+    grouped = df.groupby(columns, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    keys = grouped.size().index.to_frame(index=False)
+    return codes, keys
+
+
+def _pair_errors(codes: np.ndarray, actual: np.ndarray, forecast: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    (codes, errors, absolute errors, absolute percentage errors, mask of finite
+    percentage errors) of the pairs with a group and no NaN on either side.
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    errors = actual - np.asarray(forecast, dtype=np.float64)
+    valid = ~np.isnan(errors) & (codes >= 0)
+    if not valid.all():
+        codes, actual, errors = codes[valid], actual[valid], errors[valid]
+
+    abs_errors = np.abs(errors)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ape = abs_errors / np.abs(actual)
+    return codes, errors, abs_errors, ape, np.isfinite(ape)
+
+
+def grouped_sums(codes: np.ndarray, actual: np.ndarray, forecast: np.ndarray, n_groups: int) -> Dict[str, np.ndarray]:
+    """
+    Additive error statistics per group in one pass over the pairs: count,
+    sum_error, sum_abs_error, sum_sq_error, and mape_count/mape_sum over the
+    pairs with a non-zero actual. Pairs with a NaN on either side are skipped.
+    """
+    codes, errors, abs_errors, ape, mape_valid = _pair_errors(codes, actual, forecast)
+    return {
+        "count": np.bincount(codes, minlength=n_groups),
+        "sum_error": np.bincount(codes, weights=errors, minlength=n_groups),
+        "sum_abs_error": np.bincount(codes, weights=abs_errors, minlength=n_groups),
+        "sum_sq_error": np.bincount(codes, weights=errors * errors, minlength=n_groups),
+        "mape_count": np.bincount(codes[mape_valid], minlength=n_groups),
+        "mape_sum": np.bincount(codes[mape_valid], weights=ape[mape_valid], minlength=n_groups),
+    }
+
+
+def empty_sums(n_groups: int) -> Dict[str, np.ndarray]:
+    """Zero totals in the layout of `grouped_sums`."""
+    return {
+        name: np.zeros(n_groups, dtype=np.int64 if name.endswith("count") else np.float64)
+        for name in ("count", "sum_error", "sum_abs_error", "sum_sq_error", "mape_count", "mape_sum")
+    }
+
+
+def accumulate_sums(totals: Dict[str, np.ndarray], codes: np.ndarray, actual: np.ndarray, forecast: np.ndarray) -> None:
+    """
+    Add the statistics of `grouped_sums` for more pairs to `totals` in place.
+    Pairs are added one at a time in the given order, so totals built chunk by
+    chunk equal one `grouped_sums` call over all pairs in the same order.
+    """
+    codes, errors, abs_errors, ape, mape_valid = _pair_errors(np.asarray(codes, dtype=np.intp), actual, forecast)
+    np.add.at(totals["count"], codes, 1)
+    np.add.at(totals["sum_error"], codes, errors)
+    np.add.at(totals["sum_abs_error"], codes, abs_errors)
+    np.add.at(totals["sum_sq_error"], codes, errors * errors)
+    np.add.at(totals["mape_count"], codes[mape_valid], 1)
+    np.add.at(totals["mape_sum"], codes[mape_valid], ape[mape_valid])
+
+
+def grouped_metrics(
+    codes: np.ndarray,
+    actual: np.ndarray,
+    forecast: np.ndarray,
+    n_groups: int = None,
+    metrics: Sequence[str] = KERNEL_METRICS,
+) -> Dict[str, np.ndarray]:
+    """
+    All requested metrics for all groups at once, as arrays indexed by group
+    code, plus `count`. Groups without pairs get NaN. MAPE (in %) skips pairs
+    with a zero actual; VARIANCE is the population variance of the errors.
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    if n_groups is None:
+        n_groups = int(codes.max()) + 1 if codes.size else 0
+    sums = grouped_sums(codes, actual, forecast, n_groups)
+    return metrics_from_sums(sums, metrics)
+
+
+def metrics_from_sums(sums: Dict[str, np.ndarray], metrics: Sequence[str] = KERNEL_METRICS) -> Dict[str, np.ndarray]:
+    """Turn the output of `grouped_sums` (or sums of several of them) into metrics."""
+    count = np.asarray(sums["count"], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = np.where(count > 0, count, np.nan)
+        mean_error = sums["sum_error"] / n
+        mean_sq_error = sums["sum_sq_error"] / n
+        mape_n = np.where(sums["mape_count"] > 0, sums["mape_count"], np.nan)
+        available = {
+            "MAE": lambda: sums["sum_abs_error"] / n,
+            "RMSE": lambda: np.sqrt(mean_sq_error),
+            "MAPE": lambda: sums["mape_sum"] / mape_n * 100,
+            "BIAS": lambda: mean_error,
+            "VARIANCE": lambda: np.maximum(mean_sq_error - mean_error ** 2, 0.0),
+        }
+        result = {m: available[m]() for m in metrics if m in available}
+    result["count"] = np.asarray(sums["count"], dtype=np.int64)
+    return result
@@ -1,33 +1,292 @@
 # evaluator/metrics.py
 
+import copy
+from typing import Dict, Optional
+
 import numpy as np
 import pandas as pd
 
-def compue_mape_mape(actual: pd.Series, forecast: pd.Series) -> float:
-    """Mean Absolute Percentage Error"""
-    return np.mean(np.abs((actual - forecast) / actual)) * 100 if not actual.empty else np.nan
 
-def compute_mae(actual: pd.Series, forecast: pd.Series) -> float:
-    """Mean Absolute Error"""
-    return np.mean(np.abs(actual - forecast))
+def evaluate_metrics(actual: pd.Series, forecast: pd.Series, metrics: list) -> dict:
+    """Evaluate given metrics between actual and forecast series (or arrays)"""
+    return metric_results(accumulate_metrics(actual, forecast, metrics))
+
+
+# Streaming accumulators
+#
+# Each accumulator keeps a few additive statistics of the errors (actual - forecast)
+# instead of the pairs themselves. They can be fed numpy batches with `update`,
+# combined across shards or workers with `merge` and stored with `to_dict`.
+# Pairs where actual or forecast is missing are skipped.
+
+def _errors(actual, forecast) -> tuple:
+    """Finite-pair actual values and errors of a batch as float arrays."""
+    actual = np.asarray(actual, dtype=float)
+    forecast = np.asarray(forecast, dtype=float)
+    errors = actual - forecast
+    keep = ~np.isnan(errors)
+    return actual[keep], errors[keep]
+
+
+class Accumulator:
+    """Base class: additive state in `STATE` attributes, merged by summation."""
+
+    NAME = ""
+    STATE: tuple = ("count",)
+
+    def __init__(self):
+        for key in self.STATE:
+            setattr(self, key, 0 if key == "count" else 0.0)
+
+    def update(self, actual, forecast) -> "Accumulator":
+        raise NotImplementedError
+
+    def merge(self, other: "Accumulator") -> "Accumulator":
+        if type(other) is not type(self):
+            raise TypeError(f"Cannot merge {type(other).__name__} into {type(self).__name__}")
+        for key in self.STATE:
+            setattr(self, key, getattr(self, key) + getattr(other, key))
+        return self
+
+    def result(self) -> float:
+        raise NotImplementedError
+
+    def to_dict(self) -> dict:
+        return {"metric": self.NAME, **{key: getattr(self, key) for key in self.STATE}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Accumulator":
+        acc = cls()
+        for key in cls.STATE:
+            setattr(acc, key, data[key])
+        return acc
+
+
+class MAEAccumulator(Accumulator):
+    NAME = "MAE"
+    STATE = ("count", "sum_abs_error")
+
+    def update(self, actual, forecast):
+        _, errors = _errors(actual, forecast)
+        self.count += int(errors.size)
+        self.sum_abs_error += float(np.abs(errors).sum())
+        return self
+
+    def result(self) -> float:
+        return self.sum_abs_error / self.count if self.count else np.nan
+
+
+class RMSEAccumulator(Accumulator):
+    NAME = "RMSE"
+    STATE = ("count", "sum_sq_error")
+
+    def update(self, actual, forecast):
+        _, errors = _errors(actual, forecast)
+        self.count += int(errors.size)
+        self.sum_sq_error += float((errors ** 2).sum())
+        return self
+
+    def result(self) -> float:
+        return float(np.sqrt(self.sum_sq_error / self.count)) if self.count else np.nan
+
+
+class MAPEAccumulator(Accumulator):
+    """Mean absolute percentage error. Zero actuals give infinite terms."""
+
+    NAME = "MAPE"
+    STATE = ("count", "sum_ape")
+
+    def update(self, actual, forecast):
+        actual, errors = _errors(actual, forecast)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = np.abs(errors / actual)
+        terms = terms[~np.isnan(terms)]
+        self.count += int(terms.size)
+        self.sum_ape += float(terms.sum())
+        return self
+
+    def result(self) -> float:
+        return self.sum_ape / self.count * 100 if self.count else np.nan
+
+
+class BiasAccumulator(Accumulator):
+    """Mean error (actual - forecast); positive means the forecast was too low."""
 
+    NAME = "BIAS"
+    STATE = ("count", "sum_error")
 
-def compute_rmse(actual: pd.Series, forecast: pd.Series) -> float:
-    """Root Mean Squared Error"""
-    return np.sqrt(np.mean((actual - forecast) ** 2))
+    def update(self, actual, forecast):
+        _, errors = _errors(actual, forecast)
+        self.count += int(errors.size)
+        self.sum_error += float(errors.sum())
+        return self
 
+    def result(self) -> float:
+        return self.sum_error / self.count if self.count else np.nan
 
-METRIC_FUNCTIONS = {
-    "MAPE": compue_mape_mape,
-    "MAE": compute_mae,
-    "RMSE": compute_rmse,
+
+class VarianceAccumulator(Accumulator):
+    """
+    Population variance of the errors, kept as Welford's running mean and sum
+    of squared deviations; batches and shards are combined with Chan's formula.
+    """
+
+    NAME = "VARIANCE"
+    STATE = ("count", "mean", "m2")
+
+    def _combine(self, count: int, mean: float, m2: float) -> None:
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def update(self, actual, forecast):
+        _, errors = _errors(actual, forecast)
+        if errors.size:
+            mean = float(errors.mean())
+            self._combine(int(errors.size), mean, float(((errors - mean) ** 2).sum()))
+        return self
+
+    def merge(self, other):
+        if type(other) is not type(self):
+            raise TypeError(f"Cannot merge {type(other).__name__} into {type(self).__name__}")
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    def result(self) -> float:
+        return self.m2 / self.count if self.count else np.nan
+
+
+class QuantileSketch(Accumulator):
+    """
+    Mergeable quantile sketch of absolute errors with bounded relative error
+    (logarithmic buckets as in DDSketch): every reported quantile is within
+    `relative_accuracy` of the exact value. Absolute errors below
+    `MIN_VALUE` are counted in a zero bucket.
+    """
+
+    NAME = "QUANTILE"
+    MIN_VALUE = 1e-9
+
+    def __init__(self, q: float = 0.5, relative_accuracy: float = 0.01):
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        self.q = q
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.count = 0
+        self.zero_count = 0
+        self.buckets: dict = {}
+
+    def add(self, values) -> "QuantileSketch":
+        """Add non-negative values (NaN is ignored)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        small = values < self.MIN_VALUE
+        self.zero_count += int(small.sum())
+        self.count += int(values.size)
+        keys = np.ceil(np.log(values[~small]) / np.log(self.gamma)).astype(np.int64)
+        for key, n in zip(*np.unique(keys, return_counts=True)):
+            self.buckets[int(key)] = self.buckets.get(int(key), 0) + int(n)
+        return self
+
+    def update(self, actual, forecast):
+        _, errors = _errors(actual, forecast)
+        return self.add(np.abs(errors))
+
+    def merge(self, other):
+        if type(other) is not type(self) or other.relative_accuracy != self.relative_accuracy:
+            raise TypeError("Only sketches with the same relative accuracy can be merged")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        return self
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def result(self) -> float:
+        return self.quantile(self.q)
+
+    def to_dict(self) -> dict:
+        return {
+            "metric": self.NAME,
+            "q": self.q,
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "zero_count": self.zero_count,
+            "buckets": {str(k): n for k, n in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["q"], data["relative_accuracy"])
+        sketch.count = data["count"]
+        sketch.zero_count = data["zero_count"]
+        sketch.buckets = {int(k): n for k, n in data["buckets"].items()}
+        return sketch
+
+
+ACCUMULATORS = {
+    cls.NAME: cls
+    for cls in (MAEAccumulator, RMSEAccumulator, MAPEAccumulator, BiasAccumulator,
+                VarianceAccumulator, QuantileSketch)
 }
 
-def evaluate_metrics(actual: pd.Series, forecast: pd.Series, metrics: list) -> dict:
-    """Evaluate given metrics between actual and forecast series"""
-    results = {}
+
+def make_accumulator(metric: str) -> Optional[Accumulator]:
+    """
+    Accumulator for a metric name: MAE, RMSE, MAPE, BIAS, VARIANCE, or P<n>
+    for the n-th percentile of the absolute error (e.g. P90). None if unknown.
+    """
+    if metric in ACCUMULATORS and metric != QuantileSketch.NAME:
+        return ACCUMULATORS[metric]()
+    if metric.startswith("P") and metric[1:].replace(".", "", 1).isdigit():
+        return QuantileSketch(float(metric[1:]) / 100)
+    return None
+
+
+def accumulator_from_dict(data: dict) -> Accumulator:
+    """Restore an accumulator serialised with `to_dict`."""
+    return ACCUMULATORS[data["metric"]].from_dict(data)
+
+
+def accumulate_metrics(actual, forecast, metrics: list, accumulators: Optional[Dict[str, Accumulator]] = None) -> Dict[str, Accumulator]:
+    """Update (or create) one accumulator per known metric with a batch of pairs."""
+    accumulators = {} if accumulators is None else accumulators
     for metric in metrics:
-        func = METRIC_FUNCTIONS.get(metric)
-        if func:
-            results[metric] = func(actual, forecast)
-    return results
+        if metric not in accumulators:
+            acc = make_accumulator(metric)
+            if acc is None:
+                continue
+            accumulators[metric] = acc
+        accumulators[metric].update(actual, forecast)
+    return accumulators
+
+
+def merge_accumulators(left: Dict[str, Accumulator], right: Dict[str, Accumulator]) -> Dict[str, Accumulator]:
+    """Merge two {metric: accumulator} dicts into `left`; `right` is left unchanged."""
+    for metric, acc in right.items():
+        if metric in left:
+            left[metric].merge(acc)
+        else:
+            left[metric] = copy.deepcopy(acc)
+    return left
+
+
+def metric_results(accumulators: Dict[str, Accumulator]) -> dict:
+    return {metric: acc.result() for metric, acc in accumulators.items()}
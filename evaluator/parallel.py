@@ -0,0 +1,90 @@
+# evaluator/parallel.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage import archive
+from evaluator.horizon import PAIR_COLUMNS, build_horizon_pairs, horizon_metrics, prepare_actuals
+
+# Target-time span of one unit of work. Shards much shorter than the monthly
+# archive partitions spend most of their time re-reading the same partition.
+SHARD_DAYS = 30
+
+# (city, first target time, last target time), both inclusive
+Shard = Tuple[str, datetime, datetime]
+
+
+def plan_shards(cities: List[str], shard_days: int = SHARD_DAYS, root: Path = archive.ARCHIVE_DIR) -> List[Shard]:
+    """
+    Split the evaluation into (city, target-time range) shards covering every
+    archived observation. All forecast runs competing for the same target hour
+    end up in the same shard, so the keep-latest rule needs no coordination.
+    """
+    shards = []
+    step = timedelta(days=shard_days)
+    for city in cities:
+        batches = archive.list_batches("actual", city, root)
+        if not batches:
+            continue
+        first = np.datetime64(min(b["target_min"] for b in batches), "s").astype(datetime)
+        last = np.datetime64(max(b["target_max"] for b in batches), "s").astype(datetime)
+        start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+        while start <= last:
+            shards.append((city, start, start + step - timedelta(seconds=1)))
+            start += step
+    return shards
+
+
+def shard_pairs(shard: Shard, parameters: List[str], max_horizon: int = 24,
+                root: Path = archive.ARCHIVE_DIR) -> pd.DataFrame:
+    """Forecast/actual pairs whose target hour falls into one shard."""
+    city, start, end = shard
+    actuals = archive.query("actual", city, target_start=start, target_end=end, root=root)
+    if actuals.empty:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+    forecasts = archive.query(
+        "hourly", city, parameters=parameters,
+        issue_start=start - timedelta(hours=max_horizon + 1), issue_end=end,
+        target_start=start, target_end=end, root=root,
+    )
+    return build_horizon_pairs(forecasts, prepare_actuals(actuals, parameters), parameters,
+                               max_horizon=max_horizon)
+
+
+def evaluate_parallel(
+    cities: List[str],
+    parameters: List[str],
+    workers: Optional[int] = None,
+    shard_days: int = SHARD_DAYS,
+    evaluation_timestamp: Optional[str] = None,
+    root: Path = archive.ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """
+    Horizon metrics for all cities, with the pairs of each shard built in a
+    separate process. Shards are collected in plan order and reduced by
+    `horizon_metrics`, which is independent of pair order, so the result is
+    identical to the serial evaluation for any number of workers.
+    """
+    shards = plan_shards(cities, shard_days, root)
+    if not shards:
+        return horizon_metrics(pd.DataFrame(columns=PAIR_COLUMNS))
+
+    job = partial(shard_pairs, parameters=parameters, root=root)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        parts = [job(shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+            parts = list(pool.map(job, shards))
+
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return horizon_metrics(pd.DataFrame(columns=PAIR_COLUMNS))
+    return horizon_metrics(pd.concat(parts, ignore_index=True), evaluation_timestamp)
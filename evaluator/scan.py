@@ -0,0 +1,137 @@
+# evaluator/scan.py
+
+"""
+Horizon metrics straight from the memory-mapped forecast store
+(storage.forecast_store), in windows of target time. Only the runs and
+observed hours of one window are read at a time, so resident memory stays
+bounded however long the history is. Results equal
+`evaluator.horizon.horizon_metrics` over `build_horizon_pairs` of the whole
+archive: the same pairs are kept and each group is summed in target-time order.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from evaluator.kernel import accumulate_sums, empty_sums, metrics_from_sums
+from storage import forecast_store
+from storage.forecast_store import HOUR, CityStore
+from telemetry import recorder
+
+# Target-time span of one window; it holds about as many runs as hours
+WINDOW_DAYS = 30
+
+METRIC_COLUMNS = ["city", "parameter", "horizon_hours", "MAE", "RMSE", "MAPE", "count", "evaluation_timestamp"]
+
+
+def _scan_window(store: CityStore, order: np.ndarray, ordered_issue: np.ndarray, start: int, stop: int,
+                 columns: List[int], min_horizon: int, max_horizon: int):
+    """
+    (group codes, actual, forecast) of the pairs with a target time in
+    [start, stop), sorted by group and target time. Group code is
+    parameter index * number of horizons + horizon - min_horizon.
+    """
+    # A run issued at t reaches horizons min..max at targets in [t + min - 0.5h, t + max + 0.5h]
+    lo = np.searchsorted(ordered_issue, start - (max_horizon + 1) * HOUR, "left")
+    hi = np.searchsorted(ordered_issue, stop - (min_horizon - 1) * HOUR, "left")
+    runs = np.sort(order[lo:hi])
+    if not runs.size:
+        return None
+    cube = store.cube(runs)
+    issue = cube.issue_times.astype(np.int64)
+    block = cube.values
+    target = cube.target_grid().astype(np.int64)
+    horizon = cube.horizon_grid()
+    seen, observed = store.observations((start - store.origin) // HOUR, (stop - start) // HOUR)
+
+    run, offset = np.nonzero((target >= start) & (target < stop) & (horizon >= min_horizon) & (horizon <= max_horizon))
+    hour = (target[run, offset] - start) // HOUR
+    seen = seen[hour]
+    run, offset, hour = run[seen], offset[seen], hour[seen]
+    n_horizons = max_horizon - min_horizon + 1
+
+    codes, targets, issues, actual, forecast = [], [], [], [], []
+    for j, column in enumerate(columns):
+        if column < 0:
+            continue
+        f = block[run, offset, column]
+        a = observed[hour, column]
+        valid = ~np.isnan(f) & ~np.isnan(a)
+        codes.append(j * n_horizons + horizon[run[valid], offset[valid]] - min_horizon)
+        targets.append(target[run[valid], offset[valid]])
+        issues.append(issue[run[valid]])
+        actual.append(a[valid])
+        forecast.append(f[valid])
+    if not codes:
+        return None
+    codes, targets, issues = np.concatenate(codes), np.concatenate(targets), np.concatenate(issues)
+    if not codes.size:
+        return None
+
+    # Keep the latest run for every (group, target time)
+    ordering = np.lexsort((issues, targets, codes))
+    codes, targets = codes[ordering], targets[ordering]
+    last = np.append((codes[1:] != codes[:-1]) | (targets[1:] != targets[:-1]), True)
+    return (codes[last], np.concatenate(actual)[ordering][last], np.concatenate(forecast)[ordering][last])
+
+
+def scan_city(store: CityStore, parameters: List[str], min_horizon: int = 1, max_horizon: int = 24,
+              window_days: int = WINDOW_DAYS) -> dict:
+    """Error sums per (parameter, horizon) of one city, in the layout of kernel.grouped_sums."""
+    n_horizons = max_horizon - min_horizon + 1
+    sums = empty_sums(len(parameters) * n_horizons)
+    if not len(store) or not store.hours:
+        return sums
+    columns = [store.parameters.index(p) if p in store.parameters else -1 for p in parameters]
+    order = np.argsort(store.issue_times, kind="stable")
+    ordered_issue = store.issue_times[order]
+
+    step = window_days * 24 * HOUR
+    end = store.origin + store.hours * HOUR
+    for start in range(store.origin, end, step):
+        pairs = _scan_window(store, order, ordered_issue, start, min(start + step, end), columns,
+                             min_horizon, max_horizon)
+        if pairs is not None:
+            accumulate_sums(sums, *pairs)
+    return sums
+
+
+@recorder.timed("metrics_hourly_scan", rows=len)
+def scan_horizon_metrics(
+    cities: List[str],
+    parameters: List[str],
+    min_horizon: int = 1,
+    max_horizon: int = 24,
+    window_days: int = WINDOW_DAYS,
+    evaluation_timestamp: Optional[str] = None,
+    root=forecast_store.STORE_DIR,
+) -> pd.DataFrame:
+    """MAE, RMSE, MAPE and pair count per (city, parameter, horizon) from the synced store."""
+    frames = []
+    n_horizons = max_horizon - min_horizon + 1
+    for city in cities:
+        store = forecast_store.open_city(city, root)
+        if store is None:
+            print(f"[WARNING] No stored forecasts for {city}")
+            continue
+        with recorder.stage("scan_city", city=city) as stage:
+            sums = scan_city(store, parameters, min_horizon, max_horizon, window_days)
+            stage.rows = int(sums["count"].sum())
+        metrics = metrics_from_sums(sums, ("MAE", "RMSE", "MAPE"))
+        groups = np.flatnonzero(metrics["count"] > 0)
+        frames.append(pd.DataFrame({
+            "city": city,
+            "parameter": np.array(parameters, dtype=object)[groups // n_horizons],
+            "horizon_hours": (groups % n_horizons + min_horizon).astype(np.int64),
+            "MAE": metrics["MAE"][groups],
+            "RMSE": metrics["RMSE"][groups],
+            "MAPE": metrics["MAPE"][groups],
+            "count": metrics["count"][groups],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    result = pd.concat(frames, ignore_index=True)
+    result["evaluation_timestamp"] = evaluation_timestamp or datetime.now().isoformat()
+    return result[METRIC_COLUMNS]
@@ -1,7 +1,8 @@
 import time
 from datetime import datetime
-from fetcher.actual_data import fetch_current_weather
+from fetcher.actual_data import fetch_current_weather_batch
 from storage.save import save_records
+from storage import archive
 
 CITIES = ["Koper", "Ljubljana", "Maribor"]
 SAVE_FOLDER = "actual_data"
@@ -14,15 +15,18 @@ def continuously_fetch_weather_data():
         date_str = now.date().isoformat()
         time_str = now.strftime("%H:%M")
 
+        batch = fetch_current_weather_batch(CITIES)
         for city in CITIES:
             try:
-                result = fetch_current_weather(city)
+                result = batch[city]
                 if "current_weather" in result:
                     record = result["current_weather"]
                     record["fetched_time"] = now.isoformat()
                     record["api_time"] = record.get("time")  # original timestamp from Open-Meteo
                     filename = f"actual_{city}_{date_str}_{time_str.replace(':', '-')}.csv"
                     save_records(filename, [record], subfolder=SAVE_FOLDER)
+                    archive.append_records("actual", city, [record], time_col="api_time",
+                                           issue_col="fetched_time", source=filename)
                     print(f"[{now:%Y-%m-%d %H:%M}] Saved weather for {city}")
             except Exception as e:
                 print(f"[ERROR] Failed to fetch data for {city}: {e}")
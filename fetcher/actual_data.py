@@ -1,6 +1,8 @@
 from pathlib import Path
-import requests
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from fetcher.http import get_json
+from fetcher.batch import fetch_batch
 
 # Directory for storing actual measurements
 Path("data/actual_data").mkdir(parents=True, exist_ok=True)
@@ -15,7 +17,7 @@ CITY_COORDS: Dict[str, Tuple[float, float]] = {
 # Open-Meteo current weather endpoint (same as forecast with `current_weather=true`)
 CURRENT_WEATHER_API = "https://api.open-meteo.com/v1/forecast"
 
-def fetch_current_weather(city: str) -> Dict:
+def fetch_current_weather(city: str, cache_mode: Optional[str] = None) -> Dict:
     """
     Fetch current weather data for a given city.
     Returns temperature, windspeed, etc. at current time.
@@ -30,7 +32,20 @@ def fetch_current_weather(city: str) -> Dict:
         "current_weather": True,
         "timezone": "Europe/Ljubljana"
     }
-    response = requests.get(CURRENT_WEATHER_API, params=params, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return get_json(CURRENT_WEATHER_API, params, cache_mode=cache_mode)
+
+
+def fetch_current_weather_batch(cities: Optional[List[str]] = None,
+                                api_url: str = CURRENT_WEATHER_API,
+                                cache_mode: Optional[str] = None) -> Dict[str, Dict]:
+    """Batched variant of `fetch_current_weather`. Returns {city: payload}."""
+    cities = list(CITY_COORDS) if cities is None else cities
+    unsupported = [c for c in cities if c not in CITY_COORDS]
+    if unsupported:
+        raise ValueError(f"Cities {unsupported} are not supported.")
+    params = {
+        "current_weather": True,
+        "timezone": "Europe/Ljubljana"
+    }
+    return fetch_batch(params, {c: CITY_COORDS[c] for c in cities}, api_url=api_url, cache_mode=cache_mode)
 
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from config import CITY_COORDS, OPEN_METEO_FORECAST_API
+from fetcher.batch import MAX_LOCATIONS_PER_REQUEST, chunk_locations, fetch_chunk_async
+from fetcher.http import REQUEST_TIMEOUT, get_session
+
+# Maximum number of requests in flight at once
+DEFAULT_CONCURRENCY = 8
+
+
+async def fetch_batch_async(
+    params: Dict,
+    locations: Optional[Dict[str, Tuple[float, float]]] = None,
+    api_url: str = OPEN_METEO_FORECAST_API,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    cache_mode: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """
+    Concurrent variant of `fetcher.batch.fetch_batch`: every chunk of locations
+    is requested at the same time, at most `semaphore` requests in flight,
+    over the shared connection pool. Each attempt is given up after `timeout`
+    seconds and retried within the request budget (fetcher.ratelimit.send_async);
+    chunks that still fail are reported and left out.
+    """
+    locations = CITY_COORDS if locations is None else locations
+    semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    session = get_session()
+
+    async def one_chunk(names):
+        async with semaphore:
+            try:
+                return await fetch_chunk_async(params, names, locations, api_url, session, timeout, cache_mode)
+            except Exception as e:
+                print(f"[ERROR] Batch request for {', '.join(names)} failed: {e!r}")
+                return {}
+
+    results: Dict[str, Dict] = {}
+    chunks = await asyncio.gather(*(one_chunk(n) for n in chunk_locations(locations, max_locations)))
+    for chunk in chunks:
+        results.update(chunk)
+    return results
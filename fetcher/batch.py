@@ -0,0 +1,108 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from config import CITY_COORDS, OPEN_METEO_FORECAST_API
+from fetcher.http import get_json, get_json_async, REQUEST_TIMEOUT
+
+# Open-Meteo accepts comma-separated coordinate lists; keep each request well below
+# the location and URL length limits of the API.
+MAX_LOCATIONS_PER_REQUEST = 50
+MAX_COORDINATE_CHARS = 1500
+
+
+def _format_coord(value: float) -> str:
+    return f"{value:.4f}"
+
+
+def chunk_locations(
+    locations: Dict[str, Tuple[float, float]],
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    max_chars: int = MAX_COORDINATE_CHARS,
+) -> Iterator[List[str]]:
+    """
+    Split location names into chunks that respect both the maximum number of
+    locations per request and the total length of the coordinate lists.
+    """
+    chunk: List[str] = []
+    chars = 0
+    for name, (lat, lon) in locations.items():
+        size = len(_format_coord(lat)) + len(_format_coord(lon)) + 2
+        if chunk and (len(chunk) >= max_locations or chars + size > max_chars):
+            yield chunk
+            chunk, chars = [], 0
+        chunk.append(name)
+        chars += size
+    if chunk:
+        yield chunk
+
+
+def fetch_chunk(
+    params: Dict,
+    names: List[str],
+    locations: Dict[str, Tuple[float, float]],
+    api_url: str = OPEN_METEO_FORECAST_API,
+    session: Optional[requests.Session] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    cache_mode: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """One request for a chunk of locations. Returns {name: payload}, raising on failure."""
+    payload = get_json(api_url, chunk_query(params, names, locations), session=session,
+                       timeout=timeout, cache_mode=cache_mode)
+    return split_chunk_payload(payload, names)
+
+
+async def fetch_chunk_async(
+    params: Dict,
+    names: List[str],
+    locations: Dict[str, Tuple[float, float]],
+    api_url: str = OPEN_METEO_FORECAST_API,
+    session: Optional[requests.Session] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    cache_mode: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """`fetch_chunk` for coroutines, each attempt limited to `timeout` seconds."""
+    payload = await get_json_async(api_url, chunk_query(params, names, locations), session=session,
+                                   timeout=timeout, cache_mode=cache_mode)
+    return split_chunk_payload(payload, names)
+
+
+def chunk_query(params: Dict, names: List[str], locations: Dict[str, Tuple[float, float]]) -> Dict:
+    """Query parameters of one request: `params` plus the coordinate lists of the chunk."""
+    query = dict(params)
+    query["latitude"] = ",".join(_format_coord(locations[n][0]) for n in names)
+    query["longitude"] = ",".join(_format_coord(locations[n][1]) for n in names)
+    return query
+
+
+def split_chunk_payload(payload, names: List[str]) -> Dict[str, Dict]:
+    """Map the response of a chunk request back to location names."""
+    # A single location comes back as an object, several as a list in request order
+    payloads = payload if isinstance(payload, list) else [payload]
+    if len(payloads) != len(names):
+        raise ValueError(f"Expected {len(names)} results, got {len(payloads)}")
+    return dict(zip(names, payloads))
+
+
+def fetch_batch(
+    params: Dict,
+    locations: Optional[Dict[str, Tuple[float, float]]] = None,
+    api_url: str = OPEN_METEO_FORECAST_API,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+    session: Optional[requests.Session] = None,
+    cache_mode: Optional[str] = None,
+) -> Dict[str, Dict]:
+    """
+    Fetch the same query for many locations with as few requests as possible.
+    `params` holds everything except the coordinates. Returns one payload per
+    location name, in the same shape a single-location request returns.
+    A failing chunk is reported and its locations are left out of the result.
+    """
+    locations = CITY_COORDS if locations is None else locations
+    results: Dict[str, Dict] = {}
+    for names in chunk_locations(locations, max_locations):
+        try:
+            results.update(fetch_chunk(params, names, locations, api_url, session, cache_mode=cache_mode))
+        except Exception as e:
+            print(f"[ERROR] Batch request for {', '.join(names)} failed: {e}")
+    return results
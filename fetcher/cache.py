@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+# On-disk cache of API responses, one JSON file per canonical request
+CACHE_DIR = Path("data") / "cache" / "http"
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# Forecast models behind the API are refreshed hourly, current conditions every 15 minutes;
+# cached responses expire at the next such boundary.
+MODEL_UPDATE_MINUTES = 60
+CURRENT_UPDATE_MINUTES = 15
+
+# use: serve fresh entries, otherwise fetch and store
+# only: serve any cached entry regardless of age, never touch the network
+# refresh: always fetch and overwrite the entry
+# bypass: neither read nor write the cache
+CACHE_MODES = ("use", "only", "refresh", "bypass")
+DEFAULT_MODE = os.environ.get("FORECAST_CACHE_MODE", "use")
+
+_lock = threading.Lock()
+
+
+class CacheMiss(LookupError):
+    """Raised in cache-only mode when a request has no cached response."""
+
+
+def _canonical_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return ",".join(_canonical_value(v) for v in value)
+    return str(value)
+
+
+def cache_key(url: str, params: Dict) -> str:
+    """Stable key for a request: the URL plus sorted, normalised query parameters."""
+    canonical = "&".join(f"{k}={_canonical_value(params[k])}" for k in sorted(params))
+    return hashlib.sha256(f"{url}?{canonical}".encode()).hexdigest()
+
+
+def expires_at(params: Dict, now: Optional[datetime] = None) -> datetime:
+    """Next model update boundary after `now` for this kind of request."""
+    now = now or datetime.now()
+    current = params.get("current_weather") or params.get("current")
+    minutes = CURRENT_UPDATE_MINUTES if current else MODEL_UPDATE_MINUTES
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    step = timedelta(minutes=minutes)
+    return midnight + step * ((now - midnight) // step + 1)
+
+
+def _entry_path(key: str, cache_dir: Path) -> Path:
+    return Path(cache_dir) / f"{key}.json"
+
+
+def read_entry(key: str, cache_dir: Path = CACHE_DIR, allow_expired: bool = False):
+    """Cached payload or None. A hit refreshes the entry's LRU position."""
+    path = _entry_path(key, cache_dir)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not allow_expired and datetime.fromisoformat(entry["expires"]) <= datetime.now():
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return entry["payload"]
+
+
+def write_entry(key: str, payload, expires: datetime, cache_dir: Path = CACHE_DIR,
+                max_bytes: int = MAX_CACHE_BYTES) -> None:
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"expires": expires.isoformat(), "payload": payload}, f)
+    os.replace(tmp, path)
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir: Path = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES) -> int:
+    """Delete least recently used entries until the cache fits in `max_bytes`. Returns entries removed."""
+    with _lock:
+        entries = []
+        total = 0
+        for path in Path(cache_dir).glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def _cached(url: str, params: Dict, mode: Optional[str], cache_dir: Path):
+    """(mode, key, cached payload or None) of a request; raises CacheMiss in cache-only mode."""
+    mode = mode or DEFAULT_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+    if mode == "bypass":
+        return mode, None, None
+
+    key = cache_key(url, params)
+    if mode in ("use", "only"):
+        payload = read_entry(key, cache_dir, allow_expired=(mode == "only"))
+        if payload is not None:
+            return mode, key, payload
+        if mode == "only":
+            raise CacheMiss(f"No cached response for {url} {params}")
+    return mode, key, None
+
+
+def cached_fetch(url: str, params: Dict, fetch: Callable[[], object], mode: Optional[str] = None,
+                 cache_dir: Path = CACHE_DIR):
+    """Serve a request according to the cache mode; `fetch` performs the network call."""
+    mode, key, payload = _cached(url, params, mode, cache_dir)
+    if payload is not None:
+        return payload
+    payload = fetch()
+    if mode != "bypass":
+        write_entry(key, payload, expires_at(params), cache_dir)
+    return payload
+
+
+async def cached_fetch_async(url: str, params: Dict, fetch: Callable[[], Awaitable], mode: Optional[str] = None,
+                             cache_dir: Path = CACHE_DIR):
+    """`cached_fetch` with a coroutine `fetch`."""
+    mode, key, payload = _cached(url, params, mode, cache_dir)
+    if payload is not None:
+        return payload
+    payload = await fetch()
+    if mode != "bypass":
+        write_entry(key, payload, expires_at(params), cache_dir)
+    return payload
@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional, Tuple
+
+from config import CITY_COORDS, OPEN_METEO_FORECAST_API, TIMEZONE, HOURLY_PARAMS, DAILY_PARAMS
+from fetcher.http import get_json
+from fetcher.batch import fetch_batch
+
+
+def combined_params(hourly_days: int = 2, daily_days: int = 10) -> Dict:
+    """
+    Query parameters asking for the hourly forecast, the daily forecast and the
+    current weather in one request. The API has a single `forecast_days`, so the
+    longer range is requested and the hourly block is trimmed in `split_payload`.
+    """
+    return {
+        "hourly": ",".join(HOURLY_PARAMS),
+        "daily": ",".join(DAILY_PARAMS),
+        "current_weather": True,
+        "forecast_days": max(hourly_days, daily_days),
+        "timezone": TIMEZONE,
+    }
+
+
+def fetch_combined(city: str, hourly_days: int = 2, daily_days: int = 10,
+                   cache_mode: Optional[str] = None) -> Dict:
+    """Fetch hourly, daily and current data for one city in a single request."""
+    if city not in CITY_COORDS:
+        raise ValueError(f"City '{city}' is not supported.")
+
+    lat, lon = CITY_COORDS[city]
+    params = combined_params(hourly_days, daily_days)
+    params.update({"latitude": lat, "longitude": lon})
+    return get_json(OPEN_METEO_FORECAST_API, params, cache_mode=cache_mode)
+
+
+def fetch_combined_batch(cities: Optional[List[str]] = None, hourly_days: int = 2, daily_days: int = 10,
+                         api_url: str = OPEN_METEO_FORECAST_API,
+                         cache_mode: Optional[str] = None) -> Dict[str, Dict]:
+    """Combined request for many cities, batched like `fetcher.batch.fetch_batch`."""
+    cities = list(CITY_COORDS) if cities is None else cities
+    unsupported = [c for c in cities if c not in CITY_COORDS]
+    if unsupported:
+        raise ValueError(f"Cities {unsupported} are not supported.")
+    params = combined_params(hourly_days, daily_days)
+    return fetch_batch(params, {c: CITY_COORDS[c] for c in cities}, api_url=api_url, cache_mode=cache_mode)
+
+
+def block_to_records(block: Dict, variables: List[str], limit: Optional[int] = None) -> List[Dict]:
+    """Turn an Open-Meteo `hourly`/`daily` block into one record per time step."""
+    times = block.get("time", [])[:limit]
+    records = [{"time": t} for t in times]
+    for key in variables:
+        for i, val in enumerate(block.get(key, [])[:len(records)]):
+            records[i][key] = val
+    return records
+
+
+def block_columns(block: Dict, variables: List[str], limit: Optional[int] = None) -> Dict[str, list]:
+    """
+    Columnar counterpart of `block_to_records`: the block's own `time` and
+    variable arrays (first `limit` steps), without building a record per step.
+    Variables missing from the block are left out, short arrays are padded with None.
+    """
+    times = block.get("time", [])[:limit]
+    columns = {"time": times}
+    for key in variables:
+        if key in block:
+            values = block[key][:len(times)]
+            columns[key] = values + [None] * (len(times) - len(values))
+    return columns
+
+
+def split_payload(payload: Dict, hourly_days: int = 2) -> Tuple[Dict[str, list], Dict[str, list], Optional[Dict]]:
+    """
+    Split a combined response into the columns the separate fetchers produce:
+    (hourly columns, daily columns, current_weather record or None).
+    """
+    hourly = block_columns(payload.get("hourly", {}), HOURLY_PARAMS, limit=hourly_days * 24)
+    daily = block_columns(payload.get("daily", {}), DAILY_PARAMS)
+    current = payload.get("current_weather")
+    return hourly, daily, dict(current) if current else None
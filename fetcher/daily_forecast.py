@@ -1,6 +1,8 @@
 from pathlib import Path
-import requests
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
+
+from fetcher.http import get_json
+from fetcher.batch import fetch_batch
 
 # Directory to save daily forecast files
 Path("data/daily_forecasts").mkdir(parents=True, exist_ok=True)
@@ -15,7 +17,16 @@ CITY_COORDS: Dict[str, Tuple[float, float]] = {
 # Open-Meteo daily forecast endpoint
 DAILY_FORECAST_API = "https://api.open-meteo.com/v1/forecast"
 
-def fetch_daily_forecast(city: str, days: int = 10) -> Dict:
+DAILY_VARIABLES = [
+    "temperature_2m_min",
+    "temperature_2m_max",
+    "temperature_2m_mean",
+    "precipitation_sum",
+    "cloudcover_mean",
+    "windspeed_10m_max"
+]
+
+def fetch_daily_forecast(city: str, days: int = 10, cache_mode: Optional[str] = None) -> Dict:
     """Fetch daily forecast data for the next `days` days for a given city."""
     if city not in CITY_COORDS:
         raise ValueError(f"City '{city}' is not supported.")
@@ -24,17 +35,24 @@ def fetch_daily_forecast(city: str, days: int = 10) -> Dict:
     params = {
         "latitude": lat,
         "longitude": lon,
-        "daily": ",".join([
-            "temperature_2m_min",
-            "temperature_2m_max",
-            "temperature_2m_mean",
-            "precipitation_sum",
-            "cloudcover_mean",
-            "windspeed_10m_max"
-        ]),
+        "daily": ",".join(DAILY_VARIABLES),
+        "forecast_days": days,
+        "timezone": "Europe/Ljubljana"
+    }
+    return get_json(DAILY_FORECAST_API, params, cache_mode=cache_mode)
+
+
+def fetch_daily_forecasts(cities: Optional[List[str]] = None, days: int = 10,
+                          api_url: str = DAILY_FORECAST_API,
+                          cache_mode: Optional[str] = None) -> Dict[str, Dict]:
+    """Batched variant of `fetch_daily_forecast`. Returns {city: payload}."""
+    cities = list(CITY_COORDS) if cities is None else cities
+    unsupported = [c for c in cities if c not in CITY_COORDS]
+    if unsupported:
+        raise ValueError(f"Cities {unsupported} are not supported.")
+    params = {
+        "daily": ",".join(DAILY_VARIABLES),
         "forecast_days": days,
         "timezone": "Europe/Ljubljana"
     }
-    response = requests.get(DAILY_FORECAST_API, params=params, timeout=10)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return fetch_batch(params, {c: CITY_COORDS[c] for c in cities}, api_url=api_url, cache_mode=cache_mode)
@@ -0,0 +1,181 @@
+"""
+Historical forecasts and observations for backfilling the archive.
+
+Forecasts come from the Open-Meteo historical-forecast endpoint and hourly
+observations from the archive (reanalysis) endpoint. Both are requested per
+(kind, date window, chunk of locations) and turned into the records the
+collectors write, grouped by day:
+
+    hourly  -> one forecast run per day, issued at 00:00 (see `hourly_runs`)
+    actual  -> one day of hourly observations (see `observation_days`)
+
+History does not change, so its requests skip the HTTP cache (fetcher.cache),
+whose entries expire with the next model update.
+"""
+
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+from config import HOURLY_PARAMS, OPEN_METEO_ARCHIVE_API, OPEN_METEO_HISTORICAL_FORECAST_API, TIMEZONE
+from fetcher.batch import MAX_LOCATIONS_PER_REQUEST, chunk_locations, chunk_query, split_chunk_payload
+from fetcher.combined import block_to_records
+from fetcher.http import REQUEST_TIMEOUT, get_json, get_json_async
+from fetcher.stub_server import recording_name
+
+KINDS = ("hourly", "actual")
+HISTORY_APIS = {"hourly": OPEN_METEO_HISTORICAL_FORECAST_API, "actual": OPEN_METEO_ARCHIVE_API}
+
+# Days per request; long enough to keep the request count low, short enough
+# that an interrupted backfill loses little work
+CHUNK_DAYS = 7
+
+# Archive variable -> column of the current_weather records written by the collectors
+OBSERVED_VARIABLES = {
+    "temperature_2m": "temperature",
+    "windspeed_10m": "windspeed",
+    "winddirection_10m": "winddirection",
+    "weathercode": "weathercode",
+}
+
+# Cache mode of history requests: the responses are written to the CSV folders instead
+CACHE_MODE = "bypass"
+
+# (kind, first day, last day, location names), days inclusive
+Chunk = Tuple[str, date, date, Tuple[str, ...]]
+
+
+def chunk_id(kind: str, city: str, first: date, last: date) -> str:
+    """Checkpoint key of one city within a chunk."""
+    return f"{kind}:{city}:{first}:{last}"
+
+
+def plan_chunks(
+    kinds: List[str],
+    locations: Dict[str, Tuple[float, float]],
+    start: date,
+    end: date,
+    chunk_days: int = CHUNK_DAYS,
+    done: Optional[Set[str]] = None,
+    max_locations: int = MAX_LOCATIONS_PER_REQUEST,
+) -> List[Chunk]:
+    """
+    Split kinds x start..end x locations into requests. Cities whose part of a
+    window is in `done` are left out, so a resumed backfill only asks for the rest.
+    """
+    done = done or set()
+    chunks = []
+    for kind in kinds:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind '{kind}', expected one of {KINDS}")
+        first = start
+        while first <= end:
+            last = min(first + timedelta(days=chunk_days - 1), end)
+            pending = {
+                name: coords for name, coords in locations.items()
+                if chunk_id(kind, name, first, last) not in done
+            }
+            for names in chunk_locations(pending, max_locations):
+                chunks.append((kind, first, last, tuple(names)))
+            first = last + timedelta(days=1)
+    return chunks
+
+
+def history_params(kind: str, first: date, last: date) -> Dict:
+    variables = HOURLY_PARAMS if kind == "hourly" else list(OBSERVED_VARIABLES)
+    return {
+        "hourly": ",".join(variables),
+        "start_date": first.isoformat(),
+        "end_date": last.isoformat(),
+        "timezone": TIMEZONE,
+    }
+
+
+def fetch_history_chunk(
+    chunk: Chunk,
+    locations: Dict[str, Tuple[float, float]],
+    api_url: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    record_dir: Optional[Path] = None,
+) -> Dict[str, Dict]:
+    """
+    One request for a chunk. Returns {name: payload}, raising on failure.
+    With `record_dir` the raw response is also saved there, in the form the
+    stand-in server (`fetcher.stub_server --recordings`) replays.
+    """
+    api_url, query = _chunk_request(chunk, locations, api_url)
+    payload = get_json(api_url, query, session=session, timeout=timeout, cache_mode=CACHE_MODE)
+    return _chunk_payloads(chunk, api_url, query, payload, record_dir)
+
+
+async def fetch_history_chunk_async(
+    chunk: Chunk,
+    locations: Dict[str, Tuple[float, float]],
+    api_url: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    record_dir: Optional[Path] = None,
+) -> Dict[str, Dict]:
+    """`fetch_history_chunk` for coroutines, each attempt limited to `timeout` seconds."""
+    api_url, query = _chunk_request(chunk, locations, api_url)
+    payload = await get_json_async(api_url, query, session=session, timeout=timeout, cache_mode=CACHE_MODE)
+    return _chunk_payloads(chunk, api_url, query, payload, record_dir)
+
+
+def _chunk_request(chunk: Chunk, locations: Dict[str, Tuple[float, float]],
+                   api_url: Optional[str]) -> Tuple[str, Dict]:
+    kind, first, last, names = chunk
+    return api_url or HISTORY_APIS[kind], chunk_query(history_params(kind, first, last), list(names), locations)
+
+
+def _chunk_payloads(chunk: Chunk, api_url: str, query: Dict, payload, record_dir: Optional[Path]) -> Dict[str, Dict]:
+    if record_dir is not None:
+        path = Path(record_dir) / recording_name(api_url, query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload), encoding="utf-8")
+    return split_chunk_payload(payload, list(chunk[3]))
+
+
+def _by_day(records: List[Dict], keys: List[str]) -> Tuple[Dict[str, List[Dict]], int]:
+    """Group records by day, dropping time steps without any value. Returns (days, dropped)."""
+    days: Dict[str, List[Dict]] = {}
+    dropped = 0
+    for record in records:
+        if all(record.get(key) is None for key in keys):
+            dropped += 1
+            continue
+        days.setdefault(record["time"][:10], []).append(record)
+    return days, dropped
+
+
+def hourly_runs(payload: Dict) -> Tuple[Dict[str, List[Dict]], int]:
+    """
+    Hourly forecast records per day. The endpoint stitches the first hours of
+    successive model runs and reports no issue time, so each day is stored as
+    a run issued at its midnight, in the separate `historical` archive kind.
+    """
+    records = block_to_records(payload.get("hourly", {}), HOURLY_PARAMS)
+    return _by_day(records, HOURLY_PARAMS)
+
+
+def observation_days(payload: Dict) -> Tuple[Dict[str, List[Dict]], int]:
+    """
+    Hourly observations per day, as current_weather records. Like a collected
+    observation, each is stamped with its own time as `fetched_time` and
+    `api_time`, so it lands in the archive partition of its month.
+    """
+    block = payload.get("hourly", {})
+    records = [
+        {"time": record["time"], **{OBSERVED_VARIABLES[k]: record.get(k) for k in OBSERVED_VARIABLES}}
+        for record in block_to_records(block, list(OBSERVED_VARIABLES))
+    ]
+    days, dropped = _by_day(records, list(OBSERVED_VARIABLES.values()))
+    for day_records in days.values():
+        for record in day_records:
+            record["fetched_time"] = record["time"]
+            record["api_time"] = record["time"]
+    return days, dropped
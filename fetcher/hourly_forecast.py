@@ -1,6 +1,8 @@
 from pathlib import Path
-import requests
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from fetcher.http import get_json
+from fetcher.batch import fetch_batch
 
 # Directory to save hourly forecast files
 Path("data/hourly_forecasts").mkdir(parents=True, exist_ok=True)
@@ -15,7 +17,14 @@ CITY_COORDS: Dict[str, Tuple[float, float]] = {
 # Open-Meteo hourly forecast endpoint
 HOURLY_FORECAST_API = "https://api.open-meteo.com/v1/forecast"
 
-def fetch_hourly_forecast(city: str, days: int = 2) -> Dict:
+HOURLY_VARIABLES = [
+    "temperature_2m",
+    "precipitation",
+    "cloudcover",
+    "windspeed_10m"
+]
+
+def fetch_hourly_forecast(city: str, days: int = 2, cache_mode: Optional[str] = None) -> Dict:
     """
     Fetch hourly forecast data for the next `days` days for a given city.
     Default is 2 days (i.e., 48 hourly entries).
@@ -27,16 +36,28 @@ def fetch_hourly_forecast(city: str, days: int = 2) -> Dict:
     params = {
         "latitude": lat,
         "longitude": lon,
-        "hourly": ",".join([
-            "temperature_2m",
-            "precipitation",
-            "cloudcover",
-            "windspeed_10m"
-        ]),
+        "hourly": ",".join(HOURLY_VARIABLES),
+        "forecast_days": days,
+        "timezone": "Europe/Ljubljana"
+    }
+    return get_json(HOURLY_FORECAST_API, params, cache_mode=cache_mode)
+
+
+def fetch_hourly_forecasts(cities: Optional[List[str]] = None, days: int = 2,
+                           api_url: str = HOURLY_FORECAST_API,
+                           cache_mode: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Batched variant of `fetch_hourly_forecast`: one request per chunk of
+    cities instead of one per city. Returns {city: payload}.
+    """
+    cities = list(CITY_COORDS) if cities is None else cities
+    unsupported = [c for c in cities if c not in CITY_COORDS]
+    if unsupported:
+        raise ValueError(f"Cities {unsupported} are not supported.")
+    params = {
+        "hourly": ",".join(HOURLY_VARIABLES),
         "forecast_days": days,
         "timezone": "Europe/Ljubljana"
     }
-    response = requests.get(HOURLY_FORECAST_API, params=params, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return fetch_batch(params, {c: CITY_COORDS[c] for c in cities}, api_url=api_url, cache_mode=cache_mode)
 
@@ -0,0 +1,54 @@
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fetcher.cache import cached_fetch, cached_fetch_async
+from fetcher.ratelimit import send, send_async
+
+# Size of the shared connection pool (per host)
+POOL_SIZE = 16
+REQUEST_TIMEOUT = 10
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session so all fetchers reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_json(url: str, params: Dict, session: Optional[requests.Session] = None,
+             timeout: float = REQUEST_TIMEOUT, cache_mode: Optional[str] = None):
+    """
+    GET a JSON document, raising for HTTP errors. Responses go through the
+    on-disk cache; `cache_mode` is one of `fetcher.cache.CACHE_MODES`
+    (default from the FORECAST_CACHE_MODE environment variable, else "use").
+    """
+    def fetch():
+        response = send(session or get_session(), url, params, timeout)
+        response.raise_for_status()
+        return response.json()
+
+    return cached_fetch(url, params, fetch, mode=cache_mode)
+
+
+async def get_json_async(url: str, params: Dict, session: Optional[requests.Session] = None,
+                         timeout: float = REQUEST_TIMEOUT, cache_mode: Optional[str] = None):
+    """`get_json` for coroutines; every attempt is limited to `timeout` seconds (ratelimit.send_async)."""
+    async def fetch():
+        response = await send_async(session or get_session(), url, params, timeout)
+        response.raise_for_status()
+        return response.json()
+
+    return await cached_fetch_async(url, params, fetch, mode=cache_mode)
@@ -0,0 +1,258 @@
+"""
+Client-side request budgets and retries for the Open-Meteo API.
+
+Each budget (calls per minute, hour, day; config.OPEN_METEO_RATE_LIMITS) is a
+token bucket that refills continuously, so when a cycle asks for more than
+the quota allows its requests are spread over the window instead of failing.
+Requests are also paced at the rate of the shortest window (a call every
+0.1 s at 600 per minute), so a full bucket is never sent as one burst.
+The bucket levels live in a small state file guarded by a file lock, so the
+collector, backfills and one-off scripts share one budget.
+
+Failed attempts (429, 5xx, connection errors, timeouts) are retried with
+jittered exponential backoff; a Retry-After header overrides the backoff, and
+after a 429 every thread and process waits it out before the next request.
+`send_async` also limits each attempt's wall time to the request timeout.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from config import OPEN_METEO_RATE_LIMITS, RATE_LIMITED_HOSTS
+from telemetry import recorder
+
+try:
+    import fcntl
+except ImportError:  # Windows: the budget is shared between threads only
+    fcntl = None
+
+STATE_FILE = Path("data") / "cache" / "ratelimit.json"
+WINDOW_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+MAX_RETRIES = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+# Upper bound for one backoff or Retry-After wait
+MAX_DELAY = 60.0
+# Longest a request waits for budget before it is given up
+MAX_WAIT = 120.0
+
+
+class RateLimitExceeded(RuntimeError):
+    """The budget does not allow the request within MAX_WAIT seconds."""
+
+
+class RateLimiter:
+    """
+    Token buckets for the budgets in `limits` ({window: calls}), shared by all
+    threads of the process and, through `state_file`, by other processes.
+    """
+
+    def __init__(self, limits: Dict[str, int], state_file: Optional[Path] = STATE_FILE,
+                 max_wait: float = MAX_WAIT, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.limits = dict(limits)
+        self.state_file = Path(state_file) if state_file is not None else None
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._state: Dict = {}
+
+    @contextmanager
+    def _locked_state(self):
+        """Current bucket state under the thread lock (and the file lock), written back on exit."""
+        with self._lock:
+            if self.state_file is None:
+                yield self._state
+                return
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.state_file.open("a+", encoding="utf-8") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+
+    def _refill(self, state: Dict, now: float) -> Dict[str, float]:
+        """Bucket levels at `now`: each refills at limit / window per second up to the limit."""
+        updated = state.get("updated", now)
+        levels = state.setdefault("tokens", {})
+        for window, limit in self.limits.items():
+            level = levels.get(window, limit) + (now - updated) * limit / WINDOW_SECONDS[window]
+            levels[window] = min(float(limit), level)
+        state["updated"] = now
+        return levels
+
+    def _spacing(self, cost: float) -> float:
+        """Seconds the next request waits after one of `cost` calls: the rate of the shortest window."""
+        if not self.limits:
+            return 0.0
+        window = min(self.limits, key=WINDOW_SECONDS.get)
+        limit = self.limits[window]
+        return min(cost, limit) * WINDOW_SECONDS[window] / limit
+
+    def acquire(self, cost: float = 1) -> float:
+        """Block until `cost` calls fit every budget and take them. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._locked_state() as state:
+                now = self.clock()
+                levels = self._refill(state, now)
+                wait = max(state.get("paused_until", 0), state.get("next_send", 0)) - now
+                for window, limit in self.limits.items():
+                    need = min(cost, limit) - levels[window]
+                    if need > 0:
+                        wait = max(wait, need * WINDOW_SECONDS[window] / limit)
+                if wait <= 0:
+                    for window, limit in self.limits.items():
+                        levels[window] -= min(cost, limit)
+                    state["next_send"] = now + self._spacing(cost)
+                    return waited
+            if waited + wait > self.max_wait:
+                raise RateLimitExceeded(f"Request budget exhausted, next call possible in {wait:.0f}s")
+            self.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request back for `seconds` (after the server answered 429)."""
+        with self._locked_state() as state:
+            state["paused_until"] = max(state.get("paused_until", 0), self.clock() + seconds)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(url: str) -> Optional[RateLimiter]:
+    """The shared limiter of a rate-limited host, None for other hosts."""
+    host = urlsplit(url).hostname or ""
+    if not any(host == h or host.endswith("." + h) for h in RATE_LIMITED_HOSTS):
+        return None
+    with _limiters_lock:
+        if "open-meteo" not in _limiters:
+            _limiters["open-meteo"] = RateLimiter(OPEN_METEO_RATE_LIMITS)
+        return _limiters["open-meteo"]
+
+
+def request_cost(params: Dict) -> int:
+    """Open-Meteo counts a multi-location request as one call per location."""
+    latitude = params.get("latitude", "")
+    return max(1, len(str(latitude).split(","))) if latitude != "" else 1
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry `attempt` + 1."""
+    return random.uniform(0, min(MAX_DELAY, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delay or HTTP date), None if absent or malformed."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(url: str, limiter: Optional[RateLimiter], attempt: int,
+                 response: Optional[requests.Response], error: Optional[Exception]) -> Optional[float]:
+    """
+    Seconds to wait before the next attempt, None when `response` is the answer
+    to return. The failed attempt is reported, and a 429 pauses the shared budget.
+    """
+    if error is not None:
+        delay = backoff(attempt)
+        reason = type(error).__name__
+    else:
+        if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+            return None
+        after = retry_after(response)
+        delay = min(MAX_DELAY, after) if after is not None else backoff(attempt)
+        reason = f"HTTP {response.status_code}"
+    print(f"[WARNING] {reason} from {urlsplit(url).netloc}, retry {attempt + 1}/{MAX_RETRIES} "
+          f"in {delay:.1f}s")
+    if reason == "HTTP 429" and limiter is not None:
+        # Everyone waits; the next acquire() sleeps until the pause is over
+        limiter.pause(delay)
+        return 0.0
+    return delay
+
+
+def send(session: requests.Session, url: str, params: Dict, timeout: float) -> requests.Response:
+    """
+    GET within the host's budget, retrying 429/5xx answers and connection errors.
+    Returns the last response; the caller decides what a non-2xx status means.
+    """
+    limiter = limiter_for(url)
+    cost = request_cost(params)
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            limiter.acquire(cost)
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                recorder.request(url, None, time.perf_counter() - started, retries=attempt)
+                raise
+            error = e
+        recorder.request(url, response, time.perf_counter() - started, retries=attempt)
+        delay = _retry_delay(url, limiter, attempt, response, error)
+        if delay is None:
+            return response
+        time.sleep(delay)
+
+
+async def send_async(session: requests.Session, url: str, params: Dict, timeout: float) -> requests.Response:
+    """
+    `send` for coroutines. Each attempt runs in a worker thread and is given up
+    after `timeout` seconds of wall time, which also bounds a server that keeps
+    the connection alive with a slow trickle (the requests timeout only limits
+    connecting and each read). A thread cannot be cancelled: the abandoned
+    request finishes or times out in the background and its answer is dropped.
+    """
+    limiter = limiter_for(url)
+    cost = request_cost(params)
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            await asyncio.to_thread(limiter.acquire, cost)
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = await asyncio.wait_for(
+                asyncio.to_thread(session.get, url, params=params, timeout=timeout), timeout)
+        except (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                recorder.request(url, None, time.perf_counter() - started, retries=attempt)
+                raise
+            error = e
+        recorder.request(url, response, time.perf_counter() - started, retries=attempt)
+        delay = _retry_delay(url, limiter, attempt, response, error)
+        if delay is None:
+            return response
+        await asyncio.sleep(delay)
@@ -0,0 +1,158 @@
+"""
+Local stand-in for the Open-Meteo forecast, historical-forecast and archive endpoints.
+
+Serves deterministic synthetic payloads with the same shape as the real API
+(including comma-separated coordinate lists returning a list of results), so
+fetchers can be exercised without network access:
+
+    python -m fetcher.stub_server --port 8080
+    # then point api_url at http://127.0.0.1:8080/v1/forecast (or /v1/archive)
+
+With `--recordings DIR` responses recorded from the real API (see
+`run_backfill.py --record`) are replayed for the requests they were recorded
+for; other requests still get synthetic payloads.
+"""
+
+import json
+import threading
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from fetcher.cache import cache_key
+
+FORECAST_PATH = "/v1/forecast"
+ARCHIVE_PATH = "/v1/archive"
+PATHS = (FORECAST_PATH, ARCHIVE_PATH)
+
+
+def recording_name(url: str, params: Dict) -> str:
+    """File name of a recorded response; depends on the URL path only, not the host."""
+    return f"{cache_key(urlparse(url).path, params)}.json"
+
+
+def _rng(lat: float, lon: float, variable: str) -> np.random.Generator:
+    seed = zlib.crc32(f"{lat:.4f},{lon:.4f},{variable}".encode())
+    return np.random.default_rng(seed)
+
+
+def _series(lat: float, lon: float, variable: str, n: int) -> List[float]:
+    values = _rng(lat, lon, variable).normal(15.0, 5.0, n)
+    if "precipitation" in variable:
+        values = np.clip(values - 15.0, 0.0, None)
+    elif "cloudcover" in variable:
+        values = np.clip(values * 5.0, 0.0, 100.0)
+    elif "windspeed" in variable:
+        values = np.abs(values)
+    return [round(float(v), 1) for v in values]
+
+
+def build_payload(lat: float, lon: float, query: Dict[str, str], now: datetime) -> Dict:
+    """Synthetic Open-Meteo response for one location (start_date/end_date or forecast_days from today)."""
+    if query.get("start_date") and query.get("end_date"):
+        start = datetime.strptime(query["start_date"], "%Y-%m-%d")
+        days = (datetime.strptime(query["end_date"], "%Y-%m-%d") - start).days + 1
+    else:
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        days = int(query.get("forecast_days", 7))
+    payload = {
+        "latitude": lat,
+        "longitude": lon,
+        "timezone": query.get("timezone", "GMT"),
+    }
+    if query.get("hourly"):
+        variables = query["hourly"].split(",")
+        times = [(start + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(days * 24)]
+        payload["hourly"] = {"time": times, **{v: _series(lat, lon, v, len(times)) for v in variables}}
+    if query.get("daily"):
+        variables = query["daily"].split(",")
+        times = [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+        payload["daily"] = {"time": times, **{v: _series(lat, lon, v, len(times)) for v in variables}}
+    if query.get("current_weather", "").lower() == "true":
+        observed = now.replace(minute=(now.minute // 15) * 15, second=0, microsecond=0)
+        payload["current_weather"] = {
+            "time": observed.strftime("%Y-%m-%dT%H:%M"),
+            "interval": 900,
+            "temperature": _series(lat, lon, "temperature", 1)[0],
+            "windspeed": _series(lat, lon, "windspeed", 1)[0],
+            "winddirection": 180,
+            "is_day": int(6 <= observed.hour < 20),
+            "weathercode": 2,
+        }
+    return payload
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in PATHS:
+            self.send_error(404)
+            return
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        recordings = self.server.recordings
+        if recordings is not None and (recordings / recording_name(url.path, query)).exists():
+            self.server.requests_served += 1
+            self._send_json((recordings / recording_name(url.path, query)).read_bytes())
+            return
+        try:
+            lats = [float(x) for x in query["latitude"].split(",")]
+            lons = [float(x) for x in query["longitude"].split(",")]
+        except (KeyError, ValueError):
+            self.send_error(400, "latitude and longitude are required")
+            return
+        if len(lats) != len(lons):
+            self.send_error(400, "latitude and longitude lists differ in length")
+            return
+
+        self.server.requests_served += 1
+        now = datetime.now()
+        results = [build_payload(lat, lon, query, now) for lat, lon in zip(lats, lons)]
+        self._send_json(json.dumps(results if len(results) > 1 else results[0]).encode())
+
+    def _send_json(self, body: bytes) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0,
+                      recordings: Optional[Path] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stand-in server in a background thread. Returns (server, forecast URL)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.requests_served = 0
+    server.recordings = Path(recordings) if recordings is not None else None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub_url(server)
+
+
+def stub_url(server: ThreadingHTTPServer, path: str = FORECAST_PATH) -> str:
+    """URL of one of the stand-in endpoints (FORECAST_PATH or ARCHIVE_PATH)."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{path}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local Open-Meteo stand-in server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--recordings", type=Path, help="directory of recorded responses to replay")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(port=args.port, recordings=args.recordings)
+    print(f"[INFO] Serving stand-in forecasts at {url} and {stub_url(server, ARCHIVE_PATH)}. "
+          f"Press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
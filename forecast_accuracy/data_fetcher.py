@@ -1,5 +1,6 @@
-import requests
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
+
+from fetcher.http import get_json
 
 OPEN_METEO_API_URL = "https://api.open-meteo.com/v1/forecast"
 
@@ -24,7 +25,8 @@ def _get_coords(city: str) -> Tuple[float, float]:
     return coords
 
 
-def fetch_forecast(city: str, days: int = 7, hourly_params: List[str] = None) -> Dict:
+def fetch_forecast(city: str, days: int = 7, hourly_params: List[str] = None,
+                   cache_mode: Optional[str] = None) -> Dict:
     """Fetch hourly weather forecast for the next `days` days."""
     lat, lon = _get_coords(city)
     params_to_fetch = hourly_params if hourly_params is not None else DEFAULT_HOURLY_FORECAST_PARAMETERS
@@ -35,12 +37,10 @@ def fetch_forecast(city: str, days: int = 7, hourly_params: List[str] = None) ->
         "forecast_days": days,
         "timezone": "Europe/Ljubljana",
     }
-    response = requests.get(OPEN_METEO_API_URL, params=params, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return get_json(OPEN_METEO_API_URL, params, cache_mode=cache_mode)
 
 
-def fetch_current(city: str) -> Dict:
+def fetch_current(city: str, cache_mode: Optional[str] = None) -> Dict:
     """Fetch current weather for a city."""
     lat, lon = _get_coords(city)
     params = {
@@ -49,6 +49,4 @@ def fetch_current(city: str) -> Dict:
         "current_weather": True,
         "timezone": "Europe/Ljubljana",
     }
-    response = requests.get(OPEN_METEO_API_URL, params=params, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return get_json(OPEN_METEO_API_URL, params, cache_mode=cache_mode)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from config import CITY_COORDS
+from fetcher.aio import DEFAULT_CONCURRENCY
+from fetcher.history import (
+    CHUNK_DAYS, HISTORY_APIS, KINDS, Chunk, chunk_id, fetch_history_chunk_async, hourly_runs, observation_days,
+    plan_chunks,
+)
+from fetcher.http import REQUEST_TIMEOUT, get_session
+from storage.layout import CSV_LAYOUT, compacted_name
+from storage.save import save_records
+from storage import archive
+from telemetry import recorder
+
+CITIES = ["Koper", "Ljubljana", "Maribor"]
+CHECKPOINT_FILE = Path("data") / "results" / "backfill_checkpoint.json"
+# Archive kind of each backfilled kind. Historical forecasts have no issue time, so
+# they are not stored as hourly runs, whose horizons the evaluations measure.
+ARCHIVE_KINDS = {"hourly": "historical", "actual": "actual"}
+
+
+def load_checkpoint(path: Path = CHECKPOINT_FILE) -> Set[str]:
+    """Ids of the (kind, city, window) parts that were written completely."""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    with path.open("r", encoding="utf-8") as f:
+        return set(json.load(f)["done"])
+
+
+def save_checkpoint(done: Set[str], path: Path = CHECKPOINT_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def backfill_filename(kind: str, city: str, day: str) -> str:
+    if kind == "hourly":
+        return f"{CSV_LAYOUT['historical'][1]}_{city}_{day}.csv"
+    return compacted_name(city, day)
+
+
+def store_days(kind: str, city: str, days: Dict[str, List[Dict]]) -> int:
+    """
+    Write one collector-style file per day and add it to the archive. Days that
+    already have a file are left alone, so collected data is never overwritten.
+    """
+    archive_kind = ARCHIVE_KINDS[kind]
+    subfolder = CSV_LAYOUT[archive_kind][0]
+    written = 0
+    for day, records in sorted(days.items()):
+        filename = backfill_filename(kind, city, day)
+        path = Path("data") / subfolder / filename
+        if path.exists():
+            continue
+        save_records(filename, records, subfolder=subfolder)
+        archive.ingest_csv(archive_kind, path)
+        written += 1
+    return written
+
+
+@recorder.timed("backfill_store")
+def store_chunk(chunk: Chunk, payloads: Dict[str, Dict]) -> Dict[str, bool]:
+    """Write the payload of every city in the chunk. Returns {city: window complete}."""
+    kind, first, last, names = chunk
+    expected = {(first + timedelta(days=d)).isoformat() for d in range((last - first).days + 1)}
+    complete = {}
+    for city in names:
+        if city not in payloads:
+            complete[city] = False
+            continue
+        if kind == "hourly":
+            days, dropped = hourly_runs(payloads[city])
+        else:
+            days, dropped = observation_days(payloads[city])
+        store_days(kind, city, days)
+        # Days without values (e.g. observations newer than the archive) are fetched again next time
+        complete[city] = not dropped and set(days) == expected
+    return complete
+
+
+async def backfill(
+    start: date,
+    end: date,
+    kinds: List[str] = KINDS,
+    cities: Optional[List[str]] = None,
+    chunk_days: int = CHUNK_DAYS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = REQUEST_TIMEOUT,
+    api_urls: Optional[Dict[str, str]] = None,
+    record_dir: Optional[Path] = None,
+    checkpoint: Path = CHECKPOINT_FILE,
+) -> Dict[str, int]:
+    """
+    Fetch kinds x start..end x cities in chunks, at most `concurrency` requests
+    in flight. Files are written one chunk at a time, and the checkpoint is
+    updated after each chunk, so an interrupted run resumes where it stopped.
+    """
+    cities = CITIES if cities is None else cities
+    locations = {c: CITY_COORDS[c] for c in cities}
+    api_urls = {**HISTORY_APIS, **(api_urls or {})}
+    done = load_checkpoint(checkpoint)
+    chunks = plan_chunks(list(kinds), locations, start, end, chunk_days, done)
+    stats = {"chunks": len(chunks), "complete": 0, "incomplete": 0, "failed": 0}
+    if not chunks:
+        return stats
+    print(f"[INFO] Backfilling {len(chunks)} chunks ({start} .. {end})")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    session = get_session()
+
+    async def one_chunk(chunk: Chunk) -> None:
+        kind, first, last, names = chunk
+        async with semaphore:
+            try:
+                payloads = await fetch_history_chunk_async(chunk, locations, api_urls[kind], session,
+                                                           timeout, record_dir)
+            except Exception as e:
+                print(f"[ERROR] {kind} {first}..{last} for {', '.join(names)} failed: {e!r}")
+                stats["failed"] += 1
+                return
+        # Chunks are stored one at a time: they share the CSV folders and the checkpoint
+        async with write_lock:
+            try:
+                complete = await asyncio.to_thread(store_chunk, chunk, payloads)
+            except Exception as e:
+                print(f"[ERROR] Could not store {kind} {first}..{last}: {e}")
+                stats["failed"] += 1
+                return
+            done.update(chunk_id(kind, city, first, last) for city, ok in complete.items() if ok)
+            save_checkpoint(done, checkpoint)
+        stats["complete" if all(complete.values()) else "incomplete"] += 1
+
+    await asyncio.gather(*(one_chunk(chunk) for chunk in chunks))
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parse_date = lambda s: datetime.strptime(s, "%Y-%m-%d").date()
+    parser = argparse.ArgumentParser(description="Backfill historical forecasts and observations")
+    parser.add_argument("--start", type=parse_date, required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_date, help="last day, default yesterday")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--cities", nargs="+", choices=list(CITY_COORDS), default=CITIES)
+    parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS, help="days per request")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="maximum number of requests in flight")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="per-request timeout in seconds")
+    parser.add_argument("--forecast-api", help="historical-forecast endpoint, e.g. a local stand-in server")
+    parser.add_argument("--archive-api", help="observation archive endpoint, e.g. a local stand-in server")
+    parser.add_argument("--record", type=Path, help="also save raw responses here for fetcher.stub_server")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_FILE)
+    args = parser.parse_args()
+
+    urls = {k: v for k, v in (("hourly", args.forecast_api), ("actual", args.archive_api)) if v}
+    stats = asyncio.run(backfill(
+        args.start, args.end or datetime.now().date() - timedelta(days=1), args.kinds, args.cities,
+        args.chunk_days, args.concurrency, args.timeout, urls, args.record, args.checkpoint,
+    ))
+    print(f"[INFO] {stats['complete']} chunks complete, {stats['incomplete']} incomplete, "
+          f"{stats['failed']} failed of {stats['chunks']}")
+    if stats["incomplete"] or stats["failed"]:
+        print("[INFO] Run the same command again to fetch the remaining chunks.")
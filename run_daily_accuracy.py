@@ -1,8 +1,12 @@
 from pathlib import Path
 import pandas as pd
 from datetime import datetime, timedelta
-from storage.load import load_records
+from storage.load import load_files
+from storage import archive
+from evaluator.daily import build_daily_pairs, lead_metrics
+from evaluator.daily_observations import run_daily_aggregates
 from evaluator.metrics import evaluate_metrics
+from telemetry import recorder
 
 
 for subdir in ["data", "data/daily_forecasts", "data/actual_data"]:
@@ -13,55 +17,117 @@ actual_dir = Path("data/actual_data")
     
 cities = ["Koper", "Ljubljana", "Maribor"]
 metrics = ["MAE", "RMSE"]
+parameters = ["temperature_2m_min", "temperature_2m_max", "temperature_2m_mean",
+              "precipitation_sum", "cloudcover_mean", "windspeed_10m_max"]
+max_lead_days = 10
+lead_result_file = Path("data") / "results" / "daily_lead_accuracy.csv"
 
+def load_daily_actuals(start, end) -> pd.DataFrame:
+    """
+    Daily actuals of every city for target dates start..end: the incrementally
+    maintained aggregates of the hourly observations, overridden by explicit
+    actual_{city}_{date}.csv files where those exist.
+    """
+    aggregated = run_daily_aggregates(cities, start, end)
+    paths = [
+        actual_dir / f"actual_{city}_{day.date()}.csv"
+        for city in cities
+        for day in pd.date_range(start, end, freq="D")
+    ]
+    files = load_files([p for p in paths if p.exists()], {p: "float64" for p in parameters}, with_source=True)
+    names = files.pop("source").str.removesuffix(".csv").str.split("_")
+    files["city"] = names.str[1]
+    files["target_date"] = pd.to_datetime(names.str[2])
+
+    frames = [df for df in (files, aggregated.drop(columns=["hours_observed", "observations"])) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=["city", "target_date"] + parameters)
+    actuals = pd.concat(frames, ignore_index=True)
+    return actuals.drop_duplicates(subset=["city", "target_date"], keep="first").reset_index(drop=True)
+
+
+@recorder.timed("daily_accuracy")
 def run_daily_accuracy_evaluation():
     today = datetime.now().date()
-    results = []
+    archive.sync()
+    actuals = load_daily_actuals(today, today)
 
+    results = []
     for city in cities:
-        actual_filename = f"actual_{city}_{today}.csv"
-        actual_data = load_records(actual_filename, "actual_data")
-        if not actual_data:
+        city_actuals = actuals[actuals["city"] == city]
+        if city_actuals.empty:
             print(f"[WARNING] Missing actual data for {city} on {today}")
             continue
 
-        for day_offset in range(1, 11):  # 1 to 10 days ago
-            forecast_date = today - timedelta(days=day_offset)
-            forecast_filename = f"forecast_{city}_{forecast_date}.csv"
-            forecast_data = load_records(forecast_filename, "daily_forecasts")
-            if not forecast_data:
-                continue
-
-            row_forecast = next((row for row in forecast_data if row.get("time") == str(today)), None)
-            if not row_forecast:
-                continue
-
-            for param in ["temperature_2m_min", "temperature_2m_max", "temperature_2m_mean",
-                          "precipitation_sum", "cloudcover_mean", "windspeed_10m_max"]:
-                try:
-                    actual_val = float(actual_data[0].get(param, 0))
-                    forecast_val = float(row_forecast.get(param, 0))
-                except (ValueError, TypeError):
-                    continue
-
-                eval_result = evaluate_metrics(
-                    pd.Series([actual_val]),
-                    pd.Series([forecast_val]),
-                    metrics
-                )
-
-                results.append({
-                    "city": city,
-                    "target_date": str(today),
-                    "forecast_made_on": str(forecast_date),
-                    "parameter": param,
-                    **eval_result
-                })
+        # Forecasts issued 1 to 10 days ago for today, newest first
+        forecasts = archive.query(
+            "daily", city, parameters=parameters,
+            issue_start=today - timedelta(days=max_lead_days), issue_end=today - timedelta(days=1),
+            target_start=today, target_end=today,
+        )
+        pairs = build_daily_pairs(forecasts, city_actuals, parameters, max_lead=max_lead_days)
+        pairs["parameter"] = pd.Categorical(pairs["parameter"], categories=parameters, ordered=True)
+        pairs = pairs.sort_values(["issue_date", "parameter"], ascending=[False, True])
+
+        for row in pairs.itertuples(index=False):
+            results.append({
+                "city": city,
+                "target_date": str(today),
+                "forecast_made_on": str(row.issue_date.date()),
+                "parameter": row.parameter,
+                **evaluate_metrics([row.actual_value], [row.forecast_value], metrics)
+            })
 
     df_results = pd.DataFrame(results)
     output_path = Path("data") / "daily_accuracy_results.csv"
     df_results.to_csv(output_path, index=False)
     print(f"[INFO] Saved daily accuracy results to {output_path}")
 
+
+@recorder.timed("daily_accuracy_backfill")
+def run_daily_accuracy_backfill(start, end):
+    """
+    Score every daily forecast run against the actuals of target dates start..end
+    and write metrics per city, parameter and lead day (1..10 days ahead).
+    """
+    archive.sync()
+    actuals = load_daily_actuals(start, end)
+    if actuals.empty:
+        print(f"[WARNING] No daily actual data between {start} and {end}")
+        return
+
+    forecasts = pd.concat([
+        archive.query(
+            "daily", city, parameters=parameters,
+            issue_start=start - timedelta(days=max_lead_days), issue_end=end,
+            target_start=start, target_end=end,
+        )
+        for city in cities
+    ], ignore_index=True)
+    pairs = build_daily_pairs(forecasts, actuals, parameters, max_lead=max_lead_days)
+    metrics_df = lead_metrics(pairs)
+    if metrics_df.empty:
+        print("[INFO] No forecast/actual pairs to score.")
+        return
+
+    metrics_df["start_date"] = str(start)
+    metrics_df["end_date"] = str(end)
+    lead_result_file.parent.mkdir(parents=True, exist_ok=True)
+    metrics_df.to_csv(lead_result_file, index=False, float_format="%.3f")
+    print(f"[INFO] Scored {len(pairs)} pairs, saved lead-time accuracy to {lead_result_file}")
+
+
 if __name__ == "__main__":
-    run_daily_accuracy_evaluation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Daily forecast accuracy")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="first target date of a backfill (YYYY-MM-DD)")
+    parser.add_argument("--end", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="last target date of a backfill, default yesterday")
+    args = parser.parse_args()
+
+    if args.start:
+        run_daily_accuracy_backfill(args.start, args.end or datetime.now().date() - timedelta(days=1))
+    else:
+        run_daily_accuracy_evaluation()
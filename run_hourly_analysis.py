@@ -1,13 +1,15 @@
 from pathlib import Path
 from datetime import datetime, timedelta
 import pandas as pd
-import numpy as np
-from typing import Dict # Added for type hinting
 
 from storage.load import load_records
-# Original align_and_evaluate might not be directly used in the new approach,
-# but its metric calculation logic can be adapted.
-# from evaluator.compare import align_and_evaluate
+from storage import archive, manifest
+from evaluator.horizon import build_horizon_pairs, horizon_metrics, prepare_actuals
+from evaluator.incremental import run_incremental
+from evaluator.parallel import SHARD_DAYS, evaluate_parallel
+from evaluator.scan import scan_horizon_metrics
+from storage import forecast_store
+from telemetry import recorder
 
 CITIES = ["Koper", "Ljubljana", "Maribor"]
 PARAMETERS = ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"]
@@ -32,179 +34,50 @@ def parse_forecast_filename(filename_str: str) -> datetime:
     time_str = parts[-1].replace('-', ':') # Convert HH-MM to HH:MM
     return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
 
-def calculate_metrics(series_actual: pd.Series, series_forecast: pd.Series) -> Dict[str, float]:
-    """Calculates MAE, RMSE, and MAPE between two series."""
-    if series_actual.empty or series_forecast.empty:
-        return {"MAE": np.nan, "RMSE": np.nan, "MAPE": np.nan}
-        
-    errors = series_actual - series_forecast
-    mae = errors.abs().mean()
-    rmse = np.sqrt((errors**2).mean())
-    
-    # Ensure series_actual does not contain zeros where division occurs for MAPE
-    # Replace 0 with a very small number or handle as NaN if actual is 0
-    safe_actual = series_actual.replace(0, np.nan) # Or a small epsilon if preferred
-    mape_terms = (errors.abs() / safe_actual.abs())
-    
-    # Filter out inf/NaN from division by zero or near-zero actuals
-    mape = mape_terms[np.isfinite(mape_terms)].mean() * 100 
-    if pd.isna(mape): # If all terms were NaN (e.g. all actuals were 0)
-        mape = np.nan 
-        
-    return {"MAE": mae, "RMSE": rmse, "MAPE": mape}
-
+@recorder.timed("hourly_horizon_evaluation")
 def run_hourly_horizon_accuracy_evaluation():
     """
     Evaluates forecast accuracy for different forecast horizons (1h, 2h, ..., 24h ahead).
     """
     all_results = []
 
+    # Pick up collector files that have not been archived yet
+    archive.sync()
+
     # Pre-load and process all actual data for efficiency
     actual_data_all_cities = {}
     for city in CITIES:
-        actual_files = sorted(Path("data", ACTUAL_FOLDER).glob(f"actual_{city}_*.csv"))
-        city_actual_records = []
-        for f_path in actual_files:
-            try:
-                recs = load_records(f_path.name, ACTUAL_FOLDER)
-                if recs:
-                    city_actual_records.extend(recs)
-            except Exception as e:
-                print(f"[WARNING] Could not load actual data from {f_path.name}: {e}")
-        
-        if not city_actual_records:
+        df_actual_city = archive.query("actual", city)
+        if df_actual_city.empty:
             print(f"[WARNING] No actual data found for {city}")
             actual_data_all_cities[city] = pd.DataFrame() # Empty DataFrame
             continue
 
-        df_actual_city = pd.DataFrame(city_actual_records)
-        # Ensure 'api_time' exists before trying to convert
-        if "api_time" not in df_actual_city.columns:
-            print(f"[WARNING] 'api_time' column missing in actual data for {city}. Skipping this city for actuals.")
-            actual_data_all_cities[city] = pd.DataFrame()
-            continue
-            
-        df_actual_city["time"] = pd.to_datetime(df_actual_city["api_time"]).dt.floor("h")
-        df_actual_city = df_actual_city.rename(
-            columns={
-                "temperature": "temperature_2m", # Standard Open-Meteo name
-                "windspeed": "windspeed_10m",    # Standard Open-Meteo name
-                "precipitation": "precipitation", # Assuming it's already named this or needs mapping
-                "cloudcover": "cloudcover"      # Assuming it's already named this or needs mapping
-            }
-        )
-        # Ensure all PARAMETERS are present, add them with NaN if missing, before selecting
-        for p in PARAMETERS:
-            if p not in df_actual_city.columns:
-                df_actual_city[p] = np.nan
-
-        relevant_actual_cols = ["time"] + PARAMETERS
-        if "time" in df_actual_city.columns : # ensure time column exists after processing
-            actual_data_all_cities[city] = df_actual_city[relevant_actual_cols].drop_duplicates(subset=['time']).set_index("time")
-        else:
-             actual_data_all_cities[city] = pd.DataFrame()
+        actual_data_all_cities[city] = prepare_actuals(df_actual_city, PARAMETERS)
         print(f"[INFO] Loaded and preprocessed all actual data for {city}")
 
+    evaluation_timestamp = datetime.now().isoformat()
+
     for city in CITIES:
         df_actual_city = actual_data_all_cities.get(city)
         if df_actual_city is None or df_actual_city.empty:
             print(f"[INFO] Skipping {city} due to no preprocessed actual data.")
             continue
 
-        forecast_files = sorted(Path("data", FORECAST_FOLDER).glob(f"hourly_{city}_*.csv"))
-        
-        city_horizon_comparisons = []
-
-        for forecast_file_path in forecast_files:
-            try:
-                forecast_generation_time = parse_forecast_filename(forecast_file_path.name)
-                
-                raw_forecast_data = load_records(forecast_file_path.name, FORECAST_FOLDER)
-                if not raw_forecast_data: # Handles None or empty list from load_records
-                    print(f"[INFO] No data in forecast file {forecast_file_path.name}")
-                    continue
-                forecast_df = pd.DataFrame(raw_forecast_data)
-                if forecast_df.empty:
-                    continue
-                
-                forecast_df["time"] = pd.to_datetime(forecast_df["time"])
-                print(f"[INFO] Processing forecast {forecast_file_path.name} generated at {forecast_generation_time}")
-
-                for _, forecast_row in forecast_df.iterrows():
-                    predicted_time = forecast_row["time"]
-                    horizon_timedelta = predicted_time - forecast_generation_time
-                    horizon_hours = int(round(horizon_timedelta.total_seconds() / 3600))
-
-                    if not (1 <= horizon_hours <= 24): # Focus on 1 to 24 hours ahead
-                        continue
-
-                    if predicted_time in df_actual_city.index:
-                        actual_row_series = df_actual_city.loc[predicted_time]
-                        # If loc returns a DataFrame due to duplicate index, take the first row
-                        if isinstance(actual_row_series, pd.DataFrame):
-                            if not actual_row_series.empty:
-                                actual_row_series = actual_row_series.iloc[0]
-                            else:
-                                continue # No actual data for this specific duplicate index case
-                                
-                        for param in PARAMETERS:
-                            if param in forecast_row and param in actual_row_series and \
-                               pd.notna(forecast_row[param]) and pd.notna(actual_row_series[param]):
-                                city_horizon_comparisons.append({
-                                    "city": city,
-                                    "parameter": param,
-                                    "horizon_hours": horizon_hours,
-                                    "forecast_value": forecast_row[param],
-                                    "actual_value": actual_row_series[param],
-                                    "forecast_generation_time": forecast_generation_time,
-                                    "target_time": predicted_time
-                                })
-            except Exception as e:
-                print(f"[ERROR] Could not process forecast file {forecast_file_path.name} for {city}: {e}")
-        
-        if not city_horizon_comparisons:
+        # All forecast runs of the city stacked into one frame, joined to actuals in one merge
+        city_forecasts = archive.query("hourly", city, parameters=PARAMETERS)
+        print(f"[INFO] Processing {city_forecasts['issue_time'].nunique()} forecasts for {city}")
+        df_comparisons = build_horizon_pairs(city_forecasts, df_actual_city, PARAMETERS)
+
+        if df_comparisons.empty:
             print(f"[INFO] No valid comparisons found for {city} to calculate horizon accuracy.")
             continue
 
-        df_comparisons = pd.DataFrame(city_horizon_comparisons)
-        
-        # Ensure 'actual_value' and 'forecast_value' are numeric before grouping and metric calculation
-        df_comparisons['actual_value'] = pd.to_numeric(df_comparisons['actual_value'], errors='coerce')
-        df_comparisons['forecast_value'] = pd.to_numeric(df_comparisons['forecast_value'], errors='coerce')
-        
-        # Ensure no duplicate comparisons for the same target_time, parameter, and horizon from different forecast files
-        # This can happen if multiple forecasts cover the same target hour with the same horizon.
-        # We should ideally pick one, e.g., the one generated closest to the target time, or average.
-        # For simplicity now, we'll group and if there are multiple, metrics will be on all of them.
-        # A more sophisticated approach might filter df_comparisons before grouping.
-        # Example: sort by forecast_generation_time and drop duplicates keeping the latest forecast for a given target_time & horizon
-        df_comparisons = df_comparisons.sort_values(by='forecast_generation_time', ascending=False)
-        df_comparisons = df_comparisons.drop_duplicates(subset=['city', 'parameter', 'horizon_hours', 'target_time'], keep='first')
-
-
-        grouped = df_comparisons.groupby(["city", "parameter", "horizon_hours"])
-        
-        for (c, p, h), group_data in grouped:
-            if group_data.empty or len(group_data) < 1: # Ensure there's data to calculate
-                print(f"[INFO] Insufficient data for {c}, {p}, horizon {h}h. Count: {len(group_data)}")
-                metrics_calculated = {"MAE": np.nan, "RMSE": np.nan, "MAPE": np.nan} # Store NaN if no data
-            else:
-                metrics_calculated = calculate_metrics(group_data["actual_value"], group_data["forecast_value"])
-
-            all_results.append({
-                "city": c,
-                "parameter": p,
-                "horizon_hours": h,
-                "MAE": metrics_calculated["MAE"],
-                "RMSE": metrics_calculated["RMSE"],
-                "MAPE": metrics_calculated["MAPE"],
-                "count": len(group_data), # Number of data points used for this metric
-                "evaluation_timestamp": datetime.now().isoformat()
-            })
+        all_results.append(horizon_metrics(df_comparisons, evaluation_timestamp))
         print(f"[INFO] Calculated horizon-based accuracy for {city}")
 
     if all_results:
-        final_df = pd.DataFrame(all_results)
+        final_df = pd.concat(all_results, ignore_index=True)
         final_df = final_df.sort_values(by=["city", "parameter", "horizon_hours"])
         final_df.to_csv(HORIZON_RESULT_FILE, index=False, float_format='%.3f') # Format floats
         print(f"[INFO] Horizon-based accuracy results saved to {HORIZON_RESULT_FILE}")
@@ -212,6 +85,63 @@ def run_hourly_horizon_accuracy_evaluation():
         print("[INFO] No results to save for horizon-based accuracy.")
 
 
+@recorder.timed("hourly_horizon_incremental")
+def run_hourly_horizon_accuracy_incremental():
+    """
+    Same results as `run_hourly_horizon_accuracy_evaluation`, but only pairs for
+    target hours observed since the last run are scored; running sums are
+    kept in `evaluator.incremental.STATE_FILE`.
+    """
+    archive.sync()
+    metrics_df = run_incremental(CITIES, PARAMETERS)
+    if metrics_df.empty:
+        print("[INFO] No results to save for horizon-based accuracy.")
+        return
+
+    metrics_df["evaluation_timestamp"] = datetime.now().isoformat()
+    final_df = metrics_df[["city", "parameter", "horizon_hours", "MAE", "RMSE", "MAPE", "count", "evaluation_timestamp"]]
+    final_df = final_df.sort_values(by=["city", "parameter", "horizon_hours"])
+    final_df.to_csv(HORIZON_RESULT_FILE, index=False, float_format='%.3f')
+    print(f"[INFO] Horizon-based accuracy results saved to {HORIZON_RESULT_FILE}")
+
+
+@recorder.timed("hourly_horizon_parallel")
+def run_hourly_horizon_accuracy_parallel(workers: int = None, shard_days: int = SHARD_DAYS):
+    """
+    Same results as `run_hourly_horizon_accuracy_evaluation`, with the work split
+    into (city, target-time range) shards evaluated by a pool of worker processes.
+    """
+    archive.sync()
+    final_df = evaluate_parallel(CITIES, PARAMETERS, workers=workers, shard_days=shard_days,
+                                 evaluation_timestamp=datetime.now().isoformat())
+    if final_df.empty:
+        print("[INFO] No results to save for horizon-based accuracy.")
+        return
+
+    final_df = final_df.sort_values(by=["city", "parameter", "horizon_hours"])
+    final_df.to_csv(HORIZON_RESULT_FILE, index=False, float_format='%.3f')
+    print(f"[INFO] Horizon-based accuracy results saved to {HORIZON_RESULT_FILE}")
+
+
+@recorder.timed("hourly_horizon_scan")
+def run_hourly_horizon_accuracy_scan():
+    """
+    Same results as `run_hourly_horizon_accuracy_evaluation`, computed from the
+    memory-mapped forecast store in windows of target time, so memory stays
+    bounded however long the archived history is.
+    """
+    archive.sync()
+    forecast_store.sync(CITIES)
+    final_df = scan_horizon_metrics(CITIES, PARAMETERS, evaluation_timestamp=datetime.now().isoformat())
+    if final_df.empty:
+        print("[INFO] No results to save for horizon-based accuracy.")
+        return
+
+    final_df = final_df.sort_values(by=["city", "parameter", "horizon_hours"])
+    final_df.to_csv(HORIZON_RESULT_FILE, index=False, float_format='%.3f')
+    print(f"[INFO] Horizon-based accuracy results saved to {HORIZON_RESULT_FILE}")
+
+
 # The old function for single latest forecast evaluation.
 # You can remove or comment it out if it's no longer needed.
 def run_hourly_accuracy_evaluation_old():
@@ -220,8 +150,9 @@ def run_hourly_accuracy_evaluation_old():
 
     for city in CITIES:
         # Najdi najnovejšo napoved in meritve
-        forecast_files = sorted(Path("data", FORECAST_FOLDER).glob(f"hourly_{city}_*.csv"), reverse=True)
-        actual_files = sorted(Path("data", ACTUAL_FOLDER).glob(f"actual_{city}_{today}_*.csv")) # Original logic for "today"
+        latest_forecast = manifest.latest("hourly", city)
+        forecast_files = [latest_forecast] if latest_forecast else []
+        actual_files = manifest.files("actual", city, issue_start=today, issue_end=datetime.combine(today, datetime.max.time())) # Original logic for "today"
 
         if not forecast_files:
             print(f"[WARNING] No forecast files found for {city}")
@@ -309,7 +240,27 @@ def run_hourly_accuracy_evaluation_old():
 
 
 if __name__ == "__main__":
-    run_hourly_horizon_accuracy_evaluation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hourly forecast accuracy by horizon")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fold in only data that arrived since the last run")
+    parser.add_argument("--mmap", action="store_true",
+                        help="scan the memory-mapped forecast store with bounded memory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="evaluate shards in this many processes (0 = one per CPU)")
+    parser.add_argument("--shard-days", type=int, default=SHARD_DAYS,
+                        help="target-time span of one parallel shard in days")
+    args = parser.parse_args()
+
+    if args.incremental:
+        run_hourly_horizon_accuracy_incremental()
+    elif args.mmap:
+        run_hourly_horizon_accuracy_scan()
+    elif args.workers is not None:
+        run_hourly_horizon_accuracy_parallel(args.workers or None, args.shard_days)
+    else:
+        run_hourly_horizon_accuracy_evaluation()
     # If you still need the old functionality, you can call it too:
     # print("\n--- Running old single-point accuracy evaluation (if enabled) ---")
     # run_hourly_accuracy_evaluation_old()
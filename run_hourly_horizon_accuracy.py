@@ -1,10 +1,13 @@
 import re
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 
-from storage.load import load_records
+from storage import archive
+from evaluator.horizon import build_horizon_pairs, horizon_metrics, prepare_actuals
 from evaluator.metrics import evaluate_metrics
+from evaluator.incremental import run_incremental
+from telemetry import recorder
 
 CITIES = ["Koper", "Ljubljana", "Maribor"]
 PARAMETERS = ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"]
@@ -12,6 +15,10 @@ METRICS = ["MAE", "RMSE"]
 FORECAST_FOLDER = "hourly_forecasts"
 ACTUAL_FOLDER = "actual_data"
 RESULT_FILE = "data/results/hourly_horizon_accuracy.csv"
+# Whole-history metrics of --incremental, kept apart from the latest-run metrics above
+CUMULATIVE_RESULT_FILE = "data/results/hourly_horizon_accuracy_cumulative.csv"
+# Backfilled historical forecasts (run_backfill.py) by hour of the day, see --historical
+HISTORICAL_RESULT_FILE = "data/results/historical_forecast_accuracy.csv"
 
 for sub_folder in ["data", "data/hourly_forecasts", "data/results"]:
     Path(sub_folder).mkdir(parents=True, exist_ok=True)
@@ -24,33 +31,34 @@ def parse_generation_time(filename: str) -> datetime:
     time_part = time_part.replace("-", ":")
     return datetime.fromisoformat(f"{date_part} {time_part}")
 
+@recorder.timed("latest_horizon_evaluation")
 def run_hourly_horizon_accuracy():
     today = datetime.now().date()
     results = []
 
+    archive.sync()
+
     for city in CITIES:
-        forecast_files = sorted(Path("data", FORECAST_FOLDER).glob(f"hourly_{city}_*.csv"), reverse=True)
-        actual_files = sorted(Path("data", ACTUAL_FOLDER).glob(f"actual_{city}_{today}_*.csv"))
+        generation_time = archive.latest_issue_time("hourly", city)
+        actual_df = archive.query(
+            "actual", city,
+            issue_start=datetime.combine(today, datetime.min.time()),
+            issue_end=datetime.combine(today, datetime.max.time()),
+        )
 
-        if not forecast_files or not actual_files:
+        if generation_time is None or actual_df.empty:
             print(f"[WARNING] Missing forecast or actual data for {city}")
             continue
 
-        forecast_path = forecast_files[0]
-        generation_time = parse_generation_time(forecast_path.name)
-        forecast_df = pd.DataFrame(load_records(forecast_path.name, FORECAST_FOLDER))
-        forecast_df["time"] = pd.to_datetime(forecast_df["time"])
+        forecast_df = archive.query("hourly", city, parameters=PARAMETERS,
+                                    issue_start=generation_time, issue_end=generation_time)
+        forecast_df = forecast_df.rename(columns={"target_time": "time"})
         forecast_df["horizon"] = ((forecast_df["time"] - generation_time).dt.total_seconds() / 3600).round().astype(int)
         forecast_df = forecast_df[forecast_df["horizon"].between(1, 24)]
         forecast_df = forecast_df.rename(columns={p: f"{p}_forecast" for p in PARAMETERS})
 
-        actual_records = []
-        for f in actual_files:
-            recs = load_records(f.name, ACTUAL_FOLDER)
-            if recs:
-                actual_records.extend(recs)
-        actual_df = pd.DataFrame(actual_records)
-        actual_df["time"] = pd.to_datetime(actual_df["api_time"]).dt.floor("h")
+        actual_df["time"] = actual_df["target_time"].dt.floor("h")
+        actual_df = actual_df.drop(columns=["city", "issue_time", "target_time"])
         actual_df = actual_df.rename(columns={"temperature": "temperature_2m", "windspeed": "windspeed_10m"})
         actual_df = actual_df.rename(columns={p: f"{p}_actual" for p in PARAMETERS if p in actual_df.columns})
 
@@ -82,5 +90,61 @@ def run_hourly_horizon_accuracy():
         df.to_csv(RESULT_FILE, index=False)
         print(f"[INFO] Results saved to {RESULT_FILE}")
 
+@recorder.timed("latest_horizon_incremental")
+def run_hourly_horizon_accuracy_incremental():
+    """Horizon accuracy over the whole history from the incrementally updated statistics."""
+    archive.sync()
+    df = run_incremental(CITIES, PARAMETERS)
+    if df.empty:
+        return
+    df = df.sort_values(by=["city", "horizon_hours", "parameter"])
+    df[["city", "horizon_hours", "parameter"] + METRICS].to_csv(CUMULATIVE_RESULT_FILE, index=False)
+    print(f"[INFO] Results saved to {CUMULATIVE_RESULT_FILE}")
+
+@recorder.timed("historical_accuracy")
+def run_historical_accuracy(start, end):
+    """
+    Accuracy of the backfilled historical forecasts (archive kind `historical`)
+    for target dates start..end, per city, parameter and hour of the day. They
+    are stitched from the first hours of successive model runs, so they have
+    no horizon: each day is stored as a run issued at its midnight.
+    """
+    archive.sync()
+    window = {"target_start": datetime.combine(start, datetime.min.time()),
+              "target_end": datetime.combine(end, datetime.max.time())}
+    forecasts = pd.concat([archive.query("historical", city, parameters=PARAMETERS, **window) for city in CITIES],
+                          ignore_index=True)
+    actuals = pd.concat([archive.query("actual", city, **window) for city in CITIES], ignore_index=True)
+    # Hours since the midnight "issue" are the hours of the day
+    pairs = build_horizon_pairs(forecasts, prepare_actuals(actuals, PARAMETERS), PARAMETERS,
+                                min_horizon=0, max_horizon=23)
+    df = horizon_metrics(pairs).rename(columns={"horizon_hours": "hour"})
+    if df.empty:
+        print(f"[WARNING] No historical forecast/actual pairs between {start} and {end}")
+        return
+    df["start_date"] = str(start)
+    df["end_date"] = str(end)
+    df.to_csv(HISTORICAL_RESULT_FILE, index=False, float_format="%.3f")
+    print(f"[INFO] Scored {len(pairs)} historical pairs, saved to {HISTORICAL_RESULT_FILE}")
+
 if __name__ == "__main__":
-    run_hourly_horizon_accuracy()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Accuracy of the latest hourly forecast by horizon")
+    parser.add_argument("--incremental", action="store_true",
+                        help="score the whole history from incrementally updated statistics")
+    parser.add_argument("--historical", action="store_true",
+                        help="score the backfilled historical forecasts by hour of the day")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="first target date of --historical (YYYY-MM-DD), default 30 days ago")
+    parser.add_argument("--end", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="last target date of --historical, default yesterday")
+    args = parser.parse_args()
+
+    if args.historical:
+        end = args.end or datetime.now().date() - timedelta(days=1)
+        run_historical_accuracy(args.start or end - timedelta(days=29), end)
+    elif args.incremental:
+        run_hourly_horizon_accuracy_incremental()
+    else:
+        run_hourly_horizon_accuracy()
@@ -1,79 +1,139 @@
-import threading
-import time
+import asyncio
 from datetime import datetime
 
-from fetcher.actual_data import fetch_current_weather
-from fetcher.hourly_forecast import fetch_hourly_forecast
-from fetcher.daily_forecast import fetch_daily_forecast
-from storage.save import save_records
+from config import CITY_COORDS
+from fetcher.aio import DEFAULT_CONCURRENCY, fetch_batch_async
+from fetcher.hourly_forecast import HOURLY_VARIABLES
+from fetcher.daily_forecast import DAILY_VARIABLES
+from fetcher.combined import block_columns, combined_params, split_payload
+from fetcher.http import REQUEST_TIMEOUT
+from scheduler.ticks import next_tick
+from storage.save import save_columns, save_records
+from storage import archive
+from telemetry import recorder
 
 CITIES = ["Koper", "Ljubljana", "Maribor"]
-INTERVAL_MINUTES = 60  # how often to repeat
-TIMESTAMP = lambda: datetime.now().strftime("%Y-%m-%d_%H-%M")
+HOURLY_KEYS = ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"]
+DAILY_KEYS = ["temperature_2m_min", "temperature_2m_max", "temperature_2m_mean",
+              "precipitation_sum", "cloudcover_mean", "windspeed_10m_max"]
+INTERVAL_MINUTES = 60  # how often to repeat, aligned to the wall clock
+TIMEZONE = "Europe/Ljubljana"
 
-def fetch_actual_loop():
-    while True:
-        now = datetime.now()
-        date_str = now.date().isoformat()
-        time_str = now.strftime("%H-%M")
-        for city in CITIES:
-            try:
-                result = fetch_current_weather(city)
-                if "current_weather" in result:
-                    record = result["current_weather"]
-                    record["fetched_time"] = now.isoformat()
-                    record["api_time"] = record.get("time")
-                    filename = f"actual_{city}_{date_str}_{time_str}.csv"
-                    save_records(filename, [record], subfolder="actual_data")
-                    print(f"[ACTUAL] {city} @ {time_str} saved.")
-            except Exception as e:
-                print(f"[ERROR] actual {city}: {e}")
-        time.sleep(INTERVAL_MINUTES * 60)
+HOURLY_QUERY = {"hourly": ",".join(HOURLY_VARIABLES), "forecast_days": 2, "timezone": TIMEZONE}
+DAILY_QUERY = {"daily": ",".join(DAILY_VARIABLES), "forecast_days": 10, "timezone": TIMEZONE}
+CURRENT_QUERY = {"current_weather": True, "timezone": TIMEZONE}
 
-def fetch_hourly_loop():
-    while True:
-        stamp = TIMESTAMP()
-        for city in CITIES:
+def store_actual(city: str, record: dict, now: datetime) -> None:
+    date_str = now.date().isoformat()
+    time_str = now.strftime("%H-%M")
+    record["fetched_time"] = now.isoformat()
+    record["api_time"] = record.get("time")
+    filename = f"actual_{city}_{date_str}_{time_str}.csv"
+    save_records(filename, [record], subfolder="actual_data")
+    archive.append_records("actual", city, [record], time_col="api_time",
+                           issue_col="fetched_time", source=filename)
+    print(f"[ACTUAL] {city} @ {time_str} saved.")
+
+def store_hourly(city: str, columns: dict, stamp: str) -> None:
+    save_columns(f"hourly_{city}_{stamp}.csv", columns, subfolder="hourly_forecasts")
+    archive.append_columns("hourly", city, columns,
+                           issue_time=datetime.strptime(stamp, "%Y-%m-%d_%H-%M"),
+                           source=f"hourly_{city}_{stamp}.csv")
+    print(f"[HOURLY] {city} @ {stamp} saved.")
+
+def store_daily(city: str, columns: dict, today) -> None:
+    save_columns(f"forecast_{city}_{today}.csv", columns, subfolder="daily_forecasts")
+    archive.append_columns("daily", city, columns, issue_time=today,
+                           source=f"forecast_{city}_{today}.csv", replace=True)
+    print(f"[DAILY] {city} @ {today} saved.")
+
+def store_separate(city: str, hourly: dict, daily: dict, current: dict, now: datetime) -> None:
+    """Write the results of the three separate queries for one city."""
+    if city in current and "current_weather" in current[city]:
+        store_actual(city, current[city]["current_weather"], now)
+    if city in hourly:
+        store_hourly(city, block_columns(hourly[city]["hourly"], HOURLY_KEYS), now.strftime("%Y-%m-%d_%H-%M"))
+    if city in daily:
+        store_daily(city, block_columns(daily[city]["daily"], DAILY_KEYS), now.date())
+
+def store_combined(city: str, payload: dict, now: datetime) -> None:
+    hourly, daily, current = split_payload(payload, hourly_days=2)
+    if current:
+        store_actual(city, current, now)
+    store_hourly(city, hourly, now.strftime("%Y-%m-%d_%H-%M"))
+    store_daily(city, daily, now.date())
+
+async def collect_cycle(cities: list, semaphore: asyncio.Semaphore, timeout: float, combined: bool) -> None:
+    """
+    Fetch every city once. All batched requests of the cycle run concurrently
+    (bounded by the semaphore); files are written off the event loop.
+    """
+    now = datetime.now()
+    locations = {c: CITY_COORDS[c] for c in cities}
+
+    with recorder.stage("fetch_cycle", combined=combined):
+        if combined:
+            params = combined_params(hourly_days=2, daily_days=10)
+            payloads = await fetch_batch_async(params, locations, semaphore=semaphore, timeout=timeout)
+            jobs = [(city, store_combined, (city, payloads[city], now)) for city in cities if city in payloads]
+        else:
+            hourly, daily, current = await asyncio.gather(
+                fetch_batch_async(HOURLY_QUERY, locations, semaphore=semaphore, timeout=timeout),
+                fetch_batch_async(DAILY_QUERY, locations, semaphore=semaphore, timeout=timeout),
+                fetch_batch_async(CURRENT_QUERY, locations, semaphore=semaphore, timeout=timeout),
+            )
+            jobs = [(city, store_separate, (city, hourly, daily, current, now)) for city in cities]
+
+    with recorder.stage("store_cycle", combined=combined):
+        for city, store, args in jobs:
             try:
-                data = fetch_hourly_forecast(city, days=2)
-                records = []
-                times = data.get("hourly", {}).get("time", [])
-                for key in ["temperature_2m", "precipitation", "cloudcover", "windspeed_10m"]:
-                    for i, val in enumerate(data["hourly"].get(key, [])):
-                        if i >= len(records):
-                            records.append({"time": times[i]})
-                        records[i][key] = val
-                save_records(f"hourly_{city}_{stamp}.csv", records, subfolder="hourly_forecasts")
-                print(f"[HOURLY] {city} @ {stamp} saved.")
+                await asyncio.to_thread(store, *args)
             except Exception as e:
-                print(f"[ERROR] hourly {city}: {e}")
-        time.sleep(INTERVAL_MINUTES * 60)
+                print(f"[ERROR] {city}: {e}")
+
+    received = payloads if combined else current
+    missing = [c for c in cities if c not in received]
+    if missing:
+        print(f"[WARNING] No data this cycle for: {', '.join(missing)}")
 
-def fetch_daily_loop():
+async def collect_forever(cities: list, interval_minutes: int = INTERVAL_MINUTES,
+                          concurrency: int = DEFAULT_CONCURRENCY, timeout: float = REQUEST_TIMEOUT,
+                          combined: bool = False) -> None:
+    """
+    Run one collection cycle on every wall-clock tick (e.g. :00 and :30 for a
+    30 minute interval). A cycle that overruns skips the ticks it missed
+    instead of drifting.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
     while True:
-        today = datetime.now().date()
-        for city in CITIES:
-            try:
-                data = fetch_daily_forecast(city, days=10)
-                records = []
-                times = data.get("daily", {}).get("time", [])
-                for key in ["temperature_2m_min", "temperature_2m_max", "temperature_2m_mean",
-                            "precipitation_sum", "cloudcover_mean", "windspeed_10m_max"]:
-                    for i, val in enumerate(data["daily"].get(key, [])):
-                        if i >= len(records):
-                            records.append({"time": times[i]})
-                        records[i][key] = val
-                save_records(f"forecast_{city}_{today}.csv", records, subfolder="daily_forecasts")
-                print(f"[DAILY] {city} @ {today} saved.")
-            except Exception as e:
-                print(f"[ERROR] daily {city}: {e}")
-        time.sleep(INTERVAL_MINUTES * 60)
+        tick = next_tick(datetime.now(), interval_minutes)
+        print(f"[INFO] Next collection cycle at {tick:%Y-%m-%d %H:%M}")
+        await asyncio.sleep((tick - datetime.now()).total_seconds())
+        started = datetime.now()
+        await collect_cycle(cities, semaphore, timeout, combined)
+        recorder.flush()
+        print(f"[INFO] Cycle for {len(cities)} cities took {(datetime.now() - started).total_seconds():.1f}s")
 
 if __name__ == "__main__":
-    threading.Thread(target=fetch_actual_loop, daemon=True).start()
-    threading.Thread(target=fetch_hourly_loop, daemon=True).start()
-    threading.Thread(target=fetch_daily_loop, daemon=True).start()
+    import argparse
 
-    print("[INFO] Forecast and actual fetch loops started. Press Ctrl+C to stop.")
-    while True:
-        time.sleep(10)
+    parser = argparse.ArgumentParser(description="Collect forecasts and actual weather")
+    parser.add_argument("--combined", action="store_true",
+                        help="fetch hourly, daily and current data with a single request per batch")
+    parser.add_argument("--interval", type=int, default=INTERVAL_MINUTES,
+                        help="minutes between cycles, aligned to the wall clock")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="maximum number of requests in flight")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="per-request timeout in seconds")
+    parser.add_argument("--once", action="store_true", help="run a single cycle immediately and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        asyncio.run(collect_cycle(CITIES, asyncio.Semaphore(args.concurrency), args.timeout, args.combined))
+    else:
+        print("[INFO] Forecast and actual collector started. Press Ctrl+C to stop.")
+        try:
+            asyncio.run(collect_forever(CITIES, args.interval, args.concurrency, args.timeout, args.combined))
+        except KeyboardInterrupt:
+            pass
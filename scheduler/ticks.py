@@ -0,0 +1,12 @@
+from datetime import datetime, timedelta
+
+
+def next_tick(now: datetime, interval_minutes: int) -> datetime:
+    """
+    Next wall-clock time aligned to the interval, counted from midnight.
+    With 30 minutes the ticks fall exactly on :00 and :30.
+    """
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    step = timedelta(minutes=interval_minutes)
+    elapsed = now - midnight
+    return midnight + step * (elapsed // step + 1)
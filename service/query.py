@@ -0,0 +1,289 @@
+"""
+Local read-only HTTP/JSON service for the accuracy results.
+
+Result files are parsed once and parsed again only when their size or
+modification time changes. Responses are cached in memory (bounded LRU); the
+cache key includes the version of the files a response was built from, so a
+changed file never serves stale data.
+
+    python -m service.query --port 8765
+
+    GET /results                                   datasets, their columns and row counts
+    GET /results/horizon?city=Koper&horizon=1,2,3  filtered rows
+    GET /results/horizon?parameter=temperature_2m&group_by=horizon
+                                                   aggregated over the other columns
+    GET /cube?by=issue_hour&city=Maribor&start=2025-05-01&end=2025-05-31
+                                                   roll-up of evaluator.cube
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from evaluator.cube import CUBE_FILE, empty_cube, load_cube, rollup
+
+RESULT_FILES = {
+    "horizon": Path("data/results/hourly_horizon_accuracy_results.csv"),
+    "hourly": Path("data/results/hourly_accuracy_results.csv"),
+    "daily": Path("data/daily_accuracy_results.csv"),
+    "lead": Path("data/results/daily_lead_accuracy.csv"),
+}
+CACHE_ENTRIES = 256
+
+# `horizon` filters and groups whichever lead column a dataset has
+HORIZON_COLUMNS = ("horizon_hours", "lead_days")
+FILTER_COLUMNS = ("city", "parameter", "horizon")
+
+
+class NotFound(LookupError):
+    """Unknown route or dataset."""
+
+
+def _version(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ResultStore:
+    """Parsed result files, re-read only when a file changed on disk."""
+
+    def __init__(self, files: Dict[str, Path] = None, cube_file: Path = CUBE_FILE):
+        self.files = dict(RESULT_FILES if files is None else files)
+        self.cube_file = Path(cube_file)
+        self._loaded: Dict[str, Tuple[Optional[Tuple[int, int]], object]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, path: Path, parse) -> Tuple[Optional[Tuple[int, int]], object]:
+        version = _version(path)
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached is None or cached[0] != version:
+                cached = (version, parse(path) if version else None)
+                self._loaded[name] = cached
+            return cached
+
+    def frame(self, name: str) -> Tuple[Optional[Tuple[int, int]], pd.DataFrame]:
+        if name not in self.files:
+            raise NotFound(f"Unknown dataset '{name}'")
+        version, df = self._get(name, self.files[name], _read_results)
+        return version, df if df is not None else pd.DataFrame()
+
+    def cube(self) -> Tuple[Optional[Tuple[int, int]], pd.DataFrame]:
+        version, data = self._get("__cube__", self.cube_file, lambda p: load_cube(p)[1])
+        return version, data if data is not None else empty_cube()
+
+
+def _read_results(path: Path) -> pd.DataFrame:
+    try:
+        return pd.read_csv(path)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _split(value: str) -> List[str]:
+    return [v for v in value.split(",") if v]
+
+
+def _horizon_column(df: pd.DataFrame) -> Optional[str]:
+    return next((c for c in HORIZON_COLUMNS if c in df.columns), None)
+
+
+def filter_results(df: pd.DataFrame, query: Dict[str, str]) -> pd.DataFrame:
+    """Rows matching the city/parameter/horizon filters (comma-separated values)."""
+    mask = np.ones(len(df), dtype=bool)
+    for key in FILTER_COLUMNS:
+        if key not in query:
+            continue
+        column = _horizon_column(df) if key == "horizon" else key
+        if column not in df.columns:
+            raise ValueError(f"Dataset has no '{key}' column")
+        values = _split(query[key])
+        if pd.api.types.is_numeric_dtype(df[column]):
+            values = [float(v) for v in values]
+        mask &= df[column].isin(values).to_numpy()
+    return df[mask]
+
+
+def aggregate_results(df: pd.DataFrame, group_by: List[str]) -> pd.DataFrame:
+    """
+    Combine rows per group. MAE, MAPE and bias are averaged weighted by `count`
+    (1 per row if there is none), RMSE as the root of the weighted mean square.
+    Every metric is averaged over the rows where it is not NaN; MAPE is weighted
+    by `mape_count` (pairs with a non-zero actual) when the dataset has it.
+    """
+    group_by = [(_horizon_column(df) or g) if g == "horizon" else g for g in group_by]
+    missing = [g for g in group_by if g not in df.columns]
+    if missing:
+        raise ValueError(f"Cannot group by {missing}")
+    weights = df["count"].astype(float) if "count" in df.columns else pd.Series(1.0, index=df.index)
+    parts = pd.DataFrame({"count": weights})
+    for column in group_by:
+        parts[column] = df[column]
+    metrics = [m for m in ("MAE", "MAPE", "BIAS", "bias", "RMSE") if m in df.columns]
+    for m in metrics:
+        weight = df["mape_count"].astype(float) if m == "MAPE" and "mape_count" in df.columns else weights
+        weight = weight.where(df[m].notna(), 0.0)
+        values = df[m] ** 2 if m == "RMSE" else df[m]
+        parts[m] = values.fillna(0.0) * weight
+        parts[f"{m}_weight"] = weight
+
+    sums = parts.groupby(group_by, sort=True).sum() if group_by else parts.sum().to_frame().T
+    result = sums[[]].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for m in metrics:
+            mean = sums[m] / sums[f"{m}_weight"].where(sums[f"{m}_weight"] > 0)
+            result[m] = np.sqrt(mean) if m == "RMSE" else mean
+    result["count"] = sums["count"].astype(np.int64)
+    return result.reset_index() if group_by else result.reset_index(drop=True)
+
+
+def _rows_json(df: pd.DataFrame) -> str:
+    return df.to_json(orient="records", date_format="iso")
+
+
+class QueryService:
+    """Builds (and caches) the JSON body for a request path and query."""
+
+    def __init__(self, store: ResultStore = None, cache: LRUCache = None):
+        self.store = store or ResultStore()
+        self.cache = cache or LRUCache()
+
+    def handle(self, path: str, query: Dict[str, str]) -> bytes:
+        parts = [p for p in path.split("/") if p]
+        if parts == ["results"]:
+            return self._datasets()
+        if len(parts) == 2 and parts[0] == "results":
+            version, df = self.store.frame(parts[1])
+            return self._cached(("results", parts[1], version), df, query, self._results)
+        if parts == ["cube"]:
+            version, cube = self.store.cube()
+            return self._cached(("cube", version), cube, query, self._cube)
+        raise NotFound(f"Not found: {path}")
+
+    def _cached(self, route: tuple, df: pd.DataFrame, query: Dict[str, str], build) -> bytes:
+        """`route` names the data and its file version, so changed files miss the cache."""
+        key = route + (tuple(sorted(query.items())),)
+        body = self.cache.get(key)
+        if body is None:
+            body = build(route, df, query).encode()
+            self.cache.put(key, body)
+        return body
+
+    def _datasets(self) -> bytes:
+        datasets = []
+        for name in self.store.files:
+            version, df = self.store.frame(name)
+            datasets.append({"name": name, "available": version is not None,
+                             "rows": len(df), "columns": list(df.columns)})
+        return json.dumps({"datasets": datasets}).encode()
+
+    def _results(self, route: tuple, df: pd.DataFrame, query: Dict[str, str]) -> str:
+        df = filter_results(df, query)
+        if "group_by" in query:
+            df = aggregate_results(df, _split(query["group_by"]))
+        return f'{{"dataset": {json.dumps(route[1])}, "rows": {_rows_json(df)}}}'
+
+    def _cube(self, route: tuple, cube: pd.DataFrame, query: Dict[str, str]) -> str:
+        filters = {}
+        for key, column in (("city", "city"), ("parameter", "parameter"),
+                            ("horizon", "horizon_hours"), ("issue_hour", "issue_hour")):
+            if key in query:
+                values = _split(query[key])
+                filters[column] = [int(v) for v in values] if column in ("horizon_hours", "issue_hour") else values
+        by = ["horizon_hours" if d == "horizon" else d for d in _split(query.get("by", ""))]
+        result = rollup(cube, by, query.get("start"), query.get("end"), **filters)
+        return f'{{"rows": {_rows_json(result)}}}'
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = self.server.service.handle(url.path, query)
+        except NotFound as e:
+            self._send(404, json.dumps({"error": str(e)}).encode())
+            return
+        except ValueError as e:
+            self._send(400, json.dumps({"error": str(e)}).encode())
+            return
+        except Exception as e:
+            print(f"[ERROR] {self.path}: {e!r}")
+            self._send(500, json.dumps({"error": "Internal error"}).encode())
+            return
+        self._send(200, body)
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_query_server(host: str = "127.0.0.1", port: int = 0,
+                       service: QueryService = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the service in a background thread. Returns (server, base URL)."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.service = service or QueryService()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read-only query service for the accuracy results")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-entries", type=int, default=CACHE_ENTRIES,
+                        help="maximum number of cached responses")
+    args = parser.parse_args()
+
+    server, url = start_query_server(args.host, args.port, QueryService(cache=LRUCache(args.cache_entries)))
+    print(f"[INFO] Serving accuracy results at {url}. Press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,587 @@
+import argparse
+from pathlib import Path
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from storage import manifest
+from storage.layout import is_compacted, parse_csv_name
+from storage.load import ACTUAL_SCHEMA, DAILY_SCHEMA, HOURLY_SCHEMA, load_files
+from telemetry import recorder
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not locked against each other
+    fcntl = None
+
+# Root of the partitioned columnar archive:
+#   data/archive/{kind}/{city}/{YYYY-MM}/{column}.bin + _meta.json
+# A partition rewritten without its superseded rows gets a new generation of
+# column files, {column}.{generation}.bin, named in _meta.json.
+ARCHIVE_DIR = Path("data") / "archive"
+
+KINDS = ("hourly", "daily", "actual", "historical")
+
+# Every partition holds two int64 time columns (datetime64[s]) followed by float64 value columns.
+TIME_COLUMNS = ("issue_time", "target_time")
+TIME_DTYPE = "<i8"
+VALUE_DTYPE = "<f8"
+META_FILE = "_meta.json"
+# Taken by every writer of a partition (see _partition_lock)
+LOCK_FILE = "_lock"
+# A partition is rewritten without its superseded rows once they outnumber the live ones
+MAX_SUPERSEDED_SHARE = 0.5
+
+TimeLike = Union[str, datetime, np.datetime64, pd.Timestamp, None]
+
+
+def _partition_dir(kind: str, city: str, month: str, root: Path = ARCHIVE_DIR) -> Path:
+    if kind not in KINDS:
+        raise ValueError(f"Unknown archive kind '{kind}'")
+    return Path(root) / kind / city / month
+
+
+def _to_seconds(values) -> np.ndarray:
+    """Convert any datetime-like array to int64 seconds since the epoch."""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def _scalar_seconds(value: TimeLike) -> Optional[int]:
+    if value is None:
+        return None
+    return int(pd.Timestamp(value).to_datetime64().astype("datetime64[s]").astype(np.int64))
+
+
+def _read_meta(part: Path) -> Dict:
+    path = part / META_FILE
+    if not path.exists():
+        return {"rows": 0, "columns": {}, "batches": []}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(part: Path, meta: Dict) -> None:
+    """Write the partition metadata atomically; it is the commit point of an append."""
+    tmp = part / (META_FILE + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, part / META_FILE)
+
+
+def _column_path(part: Path, column: str, generation: int = 0) -> Path:
+    return part / (f"{column}.{generation}.bin" if generation else f"{column}.bin")
+
+
+def _append_column(part: Path, column: str, dtype: str, committed_rows: int, values: np.ndarray,
+                   generation: int = 0) -> None:
+    """
+    Append values to a column file. Bytes beyond the committed row count
+    (left behind by an interrupted append) are truncated first.
+    """
+    path = _column_path(part, column, generation)
+    itemsize = np.dtype(dtype).itemsize
+    with path.open("ab") as f:
+        f.truncate(committed_rows * itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def _partition_lock(part: Path):
+    """
+    Exclusive lock of one partition, shared by every process that writes to
+    it, held from reading its metadata to committing the new one.
+    """
+    f = (part / LOCK_FILE).open("a")
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    return f
+
+
+def _frame_columns(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """(issue seconds, target seconds, {value column: float64}) of a frame to append."""
+    issue = _to_seconds(df["issue_time"])
+    target = _to_seconds(df["target_time"])
+    # Only numeric columns are archived; text columns (e.g. a duplicated timestamp) are dropped.
+    values = {}
+    for c in df.columns:
+        if c in TIME_COLUMNS:
+            continue
+        converted = pd.to_numeric(df[c], errors="coerce")
+        if converted.isna().all() and df[c].notna().any():
+            continue
+        values[c] = converted.to_numpy(dtype=np.float64)
+    return issue, target, values
+
+
+def append_batches(
+    kind: str,
+    city: str,
+    df: pd.DataFrame,
+    sources: Sequence[str],
+    replace: bool = False,
+    root: Path = ARCHIVE_DIR,
+) -> int:
+    """
+    Append rows of one city that come from several sources (`sources[i]` is
+    the source of row i) with one write per partition. Every source is
+    recorded as its own batch, with the same rules as `append_frame`.
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+    issue, target, values = _frame_columns(df)
+    codes, names = pd.factorize(np.asarray(sources, dtype=object))
+    months = issue.astype("datetime64[s]").astype("datetime64[M]")
+
+    written = 0
+    for month in np.unique(months):
+        part = _partition_dir(kind, city, str(month), root)
+        part.mkdir(parents=True, exist_ok=True)
+        # Rows of the month, grouped by source in order of appearance
+        rows_of_month = np.flatnonzero(months == month)
+        rows_of_month = rows_of_month[np.argsort(codes[rows_of_month], kind="stable")]
+        groups = np.split(rows_of_month, np.flatnonzero(np.diff(codes[rows_of_month])) + 1)
+        with _partition_lock(part):
+            meta = _read_meta(part)
+            rows = meta["rows"]
+            selected = []
+            n = 0
+            for group in groups:
+                source = names[codes[group[0]]]
+                previous = [b for b in meta["batches"] if source and b["source"] == source and not b.get("superseded")]
+                if previous and not replace:
+                    continue
+                for b in previous:
+                    b["superseded"] = True
+                meta["batches"].append({
+                    "source": source,
+                    "start": rows + n,
+                    "rows": len(group),
+                    "issue_min": int(issue[group].min()),
+                    "issue_max": int(issue[group].max()),
+                    "target_min": int(target[group].min()),
+                    "target_max": int(target[group].max()),
+                })
+                selected.append(group)
+                n += len(group)
+            if not selected:
+                continue
+
+            take = np.concatenate(selected)
+            columns = meta["columns"]
+            generation = meta.get("generation", 0)
+            for col in TIME_COLUMNS:
+                columns.setdefault(col, TIME_DTYPE)
+            _append_column(part, "issue_time", TIME_DTYPE, rows, issue[take], generation)
+            _append_column(part, "target_time", TIME_DTYPE, rows, target[take], generation)
+
+            # New columns are back-filled with NaN, missing ones padded with NaN.
+            for col in values:
+                if col not in columns:
+                    columns[col] = VALUE_DTYPE
+                    _append_column(part, col, VALUE_DTYPE, 0, np.full(rows, np.nan), generation)
+            for col, dtype in columns.items():
+                if col in TIME_COLUMNS:
+                    continue
+                _append_column(part, col, dtype, rows, values[col][take] if col in values else np.full(n, np.nan),
+                               generation)
+
+            meta["rows"] = rows + n
+            _write_meta(part, meta)
+            written += n
+            superseded = sum(b["rows"] for b in meta["batches"] if b.get("superseded"))
+            if superseded > MAX_SUPERSEDED_SHARE * meta["rows"]:
+                _drop_superseded(part, meta)
+
+    return written
+
+
+def _drop_superseded(part: Path, meta: Dict) -> None:
+    """
+    Rewrite a partition without its superseded batches, into the next
+    generation of column files; the metadata switches to it on commit.
+    Readers that read the previous metadata keep reading the previous
+    generation, which is deleted by the rewrite after this one.
+    """
+    generation = meta.get("generation", 0)
+    mask = _live_mask(meta)
+    for col, dtype in meta["columns"].items():
+        values = _read_column(part, col, dtype, meta["rows"], generation)[mask]
+        _append_column(part, col, dtype, 0, values, generation + 1)
+    batches, start = [], 0
+    for b in meta["batches"]:
+        if not b.get("superseded"):
+            batches.append({**b, "start": start})
+            start += b["rows"]
+    _write_meta(part, {**meta, "rows": start, "batches": batches, "generation": generation + 1})
+    for col in meta["columns"]:
+        for old in range(generation):
+            _column_path(part, col, old).unlink(missing_ok=True)
+
+
+def append_frame(
+    kind: str,
+    city: str,
+    df: pd.DataFrame,
+    source: str = "",
+    replace: bool = False,
+    root: Path = ARCHIVE_DIR,
+) -> int:
+    """
+    Append a frame with `issue_time`, `target_time` and numeric value columns
+    to the archive. Rows are split into monthly partitions by issue time.
+    A non-empty `source` is recorded per partition and appending the same
+    source twice is a no-op, unless `replace` is set: then the new rows are
+    appended and the earlier batch of that source is hidden from queries
+    (used for files that are rewritten in place, e.g. the daily forecast).
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+    return append_batches(kind, city, df, [source] * len(df), replace=replace, root=root)
+
+
+def append_records(
+    kind: str,
+    city: str,
+    records: Iterable[Dict],
+    issue_time: TimeLike = None,
+    time_col: str = "time",
+    issue_col: Optional[str] = None,
+    source: str = "",
+    replace: bool = False,
+    root: Path = ARCHIVE_DIR,
+) -> int:
+    """
+    Append records as written by `storage.save.save_records`.
+    The target time is taken from `time_col`; the issue time is either the
+    fixed `issue_time` of a forecast run or the per-row `issue_col`.
+    """
+    df = pd.DataFrame(list(records))
+    if df.empty:
+        return 0
+    df["target_time"] = pd.to_datetime(df.pop(time_col))
+    if issue_col is not None:
+        df["issue_time"] = pd.to_datetime(df.pop(issue_col))
+    else:
+        df["issue_time"] = pd.Timestamp(issue_time)
+    return append_frame(kind, city, df, source=source, replace=replace, root=root)
+
+
+def append_columns(
+    kind: str,
+    city: str,
+    columns: Dict[str, Sequence],
+    issue_time: TimeLike,
+    time_col: str = "time",
+    source: str = "",
+    replace: bool = False,
+    root: Path = ARCHIVE_DIR,
+) -> int:
+    """
+    Columnar counterpart of `append_records` for one forecast run, as written by
+    `storage.save.save_columns`: the time column is parsed straight into
+    datetime64 and every other column into float64 (None becomes NaN).
+    """
+    target = np.array(columns[time_col], dtype="datetime64[s]")
+    if not len(target):
+        return 0
+    df = pd.DataFrame({
+        "issue_time": np.full(len(target), pd.Timestamp(issue_time).to_datetime64().astype("datetime64[s]")),
+        "target_time": target,
+    })
+    for key, values in columns.items():
+        if key != time_col:
+            df[key] = np.array(values, dtype=np.float64)
+    return append_frame(kind, city, df, source=source, replace=replace, root=root)
+
+
+def list_partitions(kind: str, city: Optional[str] = None, root: Path = ARCHIVE_DIR) -> List[Path]:
+    """List partition directories for a kind (and optionally a city), oldest month first."""
+    base = Path(root) / kind
+    if not base.exists():
+        return []
+    cities = [base / city] if city else sorted(p for p in base.iterdir() if p.is_dir())
+    parts = []
+    for city_dir in cities:
+        if city_dir.exists():
+            parts.extend(sorted(p for p in city_dir.iterdir() if (p / META_FILE).exists()))
+    return parts
+
+
+def list_cities(kind: str, root: Path = ARCHIVE_DIR) -> List[str]:
+    base = Path(root) / kind
+    if not base.exists():
+        return []
+    return sorted(p.name for p in base.iterdir() if p.is_dir())
+
+
+def list_batches(kind: str, city: str, root: Path = ARCHIVE_DIR) -> List[Dict]:
+    """Metadata of every live append batch for a kind and city, oldest partition first."""
+    return [
+        b
+        for part in list_partitions(kind, city, root)
+        for b in _read_meta(part)["batches"]
+        if not b.get("superseded")
+    ]
+
+
+def list_sources(kind: str, city: str, root: Path = ARCHIVE_DIR) -> List[str]:
+    """All source names appended for a kind and city."""
+    return [b["source"] for b in list_batches(kind, city, root) if b["source"]]
+
+
+def latest_issue_time(kind: str, city: str, root: Path = ARCHIVE_DIR) -> Optional[datetime]:
+    """Most recent issue time for a kind and city, read from partition metadata only."""
+    for part in reversed(list_partitions(kind, city, root)):
+        batches = [b for b in _read_meta(part)["batches"] if not b.get("superseded")]
+        if batches:
+            latest = max(b["issue_max"] for b in batches)
+            return np.datetime64(latest, "s").astype(datetime)
+    return None
+
+
+def _read_column(part: Path, column: str, dtype: str, rows: int, generation: int = 0) -> np.ndarray:
+    return np.fromfile(_column_path(part, column, generation), dtype=dtype, count=rows)
+
+
+def _live_mask(meta: Dict) -> np.ndarray:
+    """Rows of a partition that are not hidden by a superseded batch."""
+    mask = np.ones(meta["rows"], dtype=bool)
+    for b in meta["batches"]:
+        if b.get("superseded"):
+            mask[b["start"]:b["start"] + b["rows"]] = False
+    return mask
+
+
+def partition_meta(part: Path) -> Dict:
+    """Row count, column types and batches of one partition."""
+    return _read_meta(part)
+
+
+def read_partition(
+    part: Path,
+    columns: Sequence[str],
+    meta: Optional[Dict] = None,
+    batches: Optional[Sequence[int]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Rows of one partition that queries see, as {column: array}, optionally
+    only those of the given batch indexes. Times stay int64 seconds; columns
+    the partition does not have are NaN. Pass the `meta` read earlier to get
+    exactly the rows it describes.
+    """
+    meta = meta or _read_meta(part)
+    rows = meta["rows"]
+    mask = _live_mask(meta)
+    if batches is not None:
+        selected = np.zeros(rows, dtype=bool)
+        for i in batches:
+            b = meta["batches"][i]
+            selected[b["start"]:b["start"] + b["rows"]] = True
+        mask &= selected
+    data = {}
+    for col in columns:
+        if col in meta["columns"]:
+            data[col] = _read_column(part, col, meta["columns"][col], rows, meta.get("generation", 0))[mask]
+        else:
+            data[col] = np.full(int(mask.sum()), np.nan)
+    return data
+
+
+def _overlaps(meta: Dict, key: str, start: Optional[int], end: Optional[int]) -> bool:
+    batches = [b for b in meta["batches"] if not b.get("superseded")]
+    if not batches:
+        return False
+    lo = min(b[f"{key}_min"] for b in batches)
+    hi = max(b[f"{key}_max"] for b in batches)
+    return (start is None or hi >= start) and (end is None or lo <= end)
+
+
+@recorder.timed("archive_query", rows=len)
+def query(
+    kind: str,
+    city: Optional[str] = None,
+    parameters: Optional[Sequence[str]] = None,
+    issue_start: TimeLike = None,
+    issue_end: TimeLike = None,
+    target_start: TimeLike = None,
+    target_end: TimeLike = None,
+    root: Path = ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """
+    Range query over the archive. Time windows are inclusive on both ends.
+    Partitions whose issue/target range lies outside the windows are skipped
+    without reading any column data. Returns a frame with `city`,
+    `issue_time`, `target_time` and the requested parameter columns, sorted
+    by city, issue time and target time.
+    """
+    i_lo, i_hi = _scalar_seconds(issue_start), _scalar_seconds(issue_end)
+    t_lo, t_hi = _scalar_seconds(target_start), _scalar_seconds(target_end)
+
+    frames = []
+    for part in list_partitions(kind, city, root):
+        meta = _read_meta(part)
+        rows = meta["rows"]
+        if not rows or not _overlaps(meta, "issue", i_lo, i_hi) or not _overlaps(meta, "target", t_lo, t_hi):
+            continue
+
+        generation = meta.get("generation", 0)
+        issue = _read_column(part, "issue_time", TIME_DTYPE, rows, generation)
+        target = _read_column(part, "target_time", TIME_DTYPE, rows, generation)
+        mask = _live_mask(meta)
+        if i_lo is not None:
+            mask &= issue >= i_lo
+        if i_hi is not None:
+            mask &= issue <= i_hi
+        if t_lo is not None:
+            mask &= target >= t_lo
+        if t_hi is not None:
+            mask &= target <= t_hi
+        if not mask.any():
+            continue
+
+        value_cols = [c for c in meta["columns"] if c not in TIME_COLUMNS]
+        if parameters is not None:
+            value_cols = [c for c in parameters if c in meta["columns"]]
+        data = {
+            "city": part.parent.name,
+            "issue_time": issue[mask].astype("datetime64[s]"),
+            "target_time": target[mask].astype("datetime64[s]"),
+        }
+        for col in value_cols:
+            data[col] = _read_column(part, col, meta["columns"][col], rows, generation)[mask]
+        frames.append(pd.DataFrame(data))
+
+    columns = ["city", "issue_time", "target_time"] + list(parameters or [])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if parameters is not None:
+        for p in parameters:
+            if p not in df.columns:
+                df[p] = np.nan
+        df = df[columns]
+    return df.sort_values(["city", "issue_time", "target_time"], kind="stable").reset_index(drop=True)
+
+
+# Column types used when ingesting the collector CSV files of each kind
+CSV_SCHEMAS = {"hourly": HOURLY_SCHEMA, "daily": DAILY_SCHEMA, "actual": ACTUAL_SCHEMA, "historical": HOURLY_SCHEMA}
+
+
+def ingest_csv(kind: str, path: Path, root: Path = ARCHIVE_DIR) -> int:
+    """Append one collector CSV file to the archive (no-op if already ingested)."""
+    path = Path(path)
+    df = load_files([path], CSV_SCHEMAS[kind])
+    return _append_csv_frame(kind, path.name, df, root)
+
+
+def _append_csv_frame(kind: str, filename: str, df: pd.DataFrame, root: Path = ARCHIVE_DIR) -> int:
+    """Map the columns of one parsed collector file onto the archive layout and append it."""
+    if df.empty:
+        return 0
+    city = parse_csv_name(kind, filename)["city"]
+    df = _csv_frame(kind, df, [filename] * len(df))
+    if kind == "actual" and is_compacted(filename):
+        # A compacted file repeats observations that may already be archived from its source files
+        known = query(kind, city, target_start=df["target_time"].min(), target_end=df["target_time"].max(),
+                      root=root)
+        df = df[~df["target_time"].isin(known["target_time"])]
+    return append_frame(kind, city, df, source=filename, root=root)
+
+
+def _csv_frame(kind: str, df: pd.DataFrame, sources: Sequence[str]) -> pd.DataFrame:
+    """
+    Archive layout (`issue_time`, `target_time`, values) of parsed collector
+    rows, where `sources[i]` is the file name of row i.
+    """
+    if kind == "actual":
+        return df.drop(columns="time").rename(columns={"fetched_time": "issue_time", "api_time": "target_time"})
+    df = df.rename(columns={"time": "target_time"})
+    sources = pd.Series(np.asarray(sources, dtype=object), index=df.index)
+    issue_times = {name: parse_csv_name(kind, name)["issue_time"] for name in sources.unique()}
+    df["issue_time"] = pd.to_datetime(sources.map(issue_times))
+    return df
+
+
+def ingest_folder(kind: str, data_dir: Path = Path("data"), root: Path = ARCHIVE_DIR) -> int:
+    """
+    Ingest collector CSV files of one kind that are not in the archive yet.
+    Files are listed from the manifest (storage.manifest) and only their
+    names are compared: already ingested files are never opened.
+    """
+    manifest.ensure(data_dir)
+    known: Dict[str, set] = {}
+    new_files = []
+    for path in manifest.files(kind, data_dir=data_dir):
+        city = parse_csv_name(kind, path.name)["city"]
+        if city not in known:
+            known[city] = set(list_sources(kind, city, root))
+        if path.name not in known[city] and path.exists():
+            new_files.append(path)
+    if not new_files:
+        return 0
+
+    # All new files are parsed together; fall back to one file at a time if any is malformed.
+    try:
+        parsed = load_files(new_files, CSV_SCHEMAS[kind], with_source=True)
+    except Exception:
+        parsed = None
+    written = 0
+    if parsed is None:
+        for path in new_files:
+            try:
+                written += ingest_csv(kind, path, root)
+            except Exception as e:
+                print(f"[WARNING] Could not ingest {path.name} into archive: {e}")
+        return written
+
+    # One append per city and partition; compacted files follow one by one, since they
+    # are checked against the observations already archived (including this sync's)
+    compacted = [path for path in new_files if kind == "actual" and is_compacted(path.name)]
+    sources = parsed.pop("source")
+    regular = ~sources.isin({path.name for path in compacted})
+    if regular.any():
+        names = sources[regular]
+        cities = {name: parse_csv_name(kind, name)["city"] for name in names.unique()}
+        frame = _csv_frame(kind, parsed[regular], names)
+        for city, rows in frame.groupby(names.map(cities), sort=False).indices.items():
+            try:
+                written += append_batches(kind, city, frame.iloc[rows], names.iloc[rows], root=root)
+            except Exception as e:
+                print(f"[WARNING] Could not ingest {kind} files of {city} into archive: {e}")
+    for path in compacted:
+        rows = (sources == path.name).to_numpy()
+        if not rows.any():
+            continue
+        try:
+            written += _append_csv_frame(kind, path.name, parsed[rows], root)
+        except Exception as e:
+            print(f"[WARNING] Could not ingest {path.name} into archive: {e}")
+    return written
+
+
+def sync(data_dir: Path = Path("data"), root: Path = ARCHIVE_DIR, repair: bool = False) -> None:
+    """
+    Bring the archive up to date with every collector CSV folder. The folders
+    themselves are listed (manifest.repair) once per manifest.REPAIR_SECONDS,
+    or on every call with `repair`.
+    """
+    manifest.repair(data_dir, max_age=None if repair else manifest.REPAIR_SECONDS)
+    for kind in KINDS:
+        with recorder.stage("archive_ingest", kind=kind) as stage:
+            written = ingest_folder(kind, data_dir, root)
+            stage.rows = written
+        if written:
+            print(f"[INFO] Archived {written} new {kind} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest collector CSV files into the archive")
+    parser.add_argument("--repair", action="store_true",
+                        help="list the data folders for files that bypassed storage.save")
+    args = parser.parse_args()
+    sync(repair=args.repair)
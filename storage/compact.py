@@ -0,0 +1,175 @@
+"""
+Compaction of the single-row actual_*.csv files written by the collectors.
+
+Every fetch leaves one file per city (actual_{city}_{YYYY-MM-DD}_{HH-MM}.csv).
+Files of a closed period are merged into
+
+    actual_{city}_{YYYY-MM-DD}_compacted.csv   (period "day")
+    actual_{city}_{YYYY-MM}_compacted.csv      (period "month")
+
+Compacting a period again (e.g. after late files arrived) writes the next
+generation, actual_{city}_{period}_{n}_compacted.csv, and removes the previous
+one: the archive ingests each file name once, and skips the rows it already
+holds from the earlier generation. Explicit daily actuals
+(actual_{city}_{YYYY-MM-DD}.csv, see run_daily_accuracy) are left alone.
+
+with repeated fetches of the same observation (`api_time`) reduced to the first
+fetch. The current day/month is never touched, so the collectors can keep
+writing. Each compacted file is written to a temporary name and moved into
+place atomically before its source files are removed; readers see either the
+sources, or the compacted file (briefly both, which the archive deduplicates).
+
+    python -m storage.compact --period month
+"""
+
+import csv
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage import manifest
+from storage.layout import compacted_generation, compacted_name, is_compacted, is_daily_actual, parse_csv_name
+
+ACTUAL_DIR = Path("data") / "actual_data"
+PERIODS = ("day", "month")
+
+# Files modified more recently than this may still be being written
+SETTLE_SECONDS = 120
+
+
+def _period_key(day: str, period: str) -> str:
+    return day if period == "day" else day[:7]
+
+
+def _read_rows(path: Path) -> List[Dict]:
+    with path.open("r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def plan_compaction(period: str = "day", actual_dir: Path = ACTUAL_DIR,
+                    today: Optional[date] = None) -> Dict[tuple, List[Path]]:
+    """
+    Group the files that can be compacted by (city, period key). Only closed
+    periods are included, and a group is only worth compacting when it holds
+    more than one file or a file that is not compacted yet.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+    today = today or datetime.now().date()
+    current = _period_key(today.isoformat(), period)
+    settled_before = time.time() - SETTLE_SECONDS
+
+    groups: Dict[tuple, List[Path]] = {}
+    for path in sorted(Path(actual_dir).glob("actual_*.csv")):
+        # Only collector snapshots and earlier compacted files
+        if is_daily_actual(path.name):
+            continue
+        try:
+            city = parse_csv_name("actual", path.name)["city"]
+        except (ValueError, IndexError):
+            continue
+        day = path.stem.split("_")[2]
+        key = _period_key(day, period)
+        if len(key) != len(current) or key >= current:
+            continue
+        try:
+            if path.stat().st_mtime > settled_before:
+                continue
+        except FileNotFoundError:
+            continue
+        groups.setdefault((city, key), []).append(path)
+
+    return {
+        group: paths for group, paths in groups.items()
+        if len(paths) > 1 or not is_compacted(paths[0].name)
+    }
+
+
+def merge_rows(paths: List[Path]) -> List[Dict]:
+    """
+    Rows of all files ordered by fetch time, keeping the first fetch of every
+    `api_time`. Columns missing in older files are left empty.
+    """
+    rows = []
+    for path in paths:
+        rows.extend(_read_rows(path))
+    rows.sort(key=lambda r: r.get("fetched_time") or "")
+
+    seen = set()
+    merged = []
+    for row in rows:
+        key = row.get("api_time") or row.get("time")
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(row)
+
+    fieldnames = []
+    for row in merged:
+        for name in row:
+            if name not in fieldnames:
+                fieldnames.append(name)
+    merged = [{name: row.get(name, "") for name in fieldnames} for row in merged]
+    merged.sort(key=lambda r: r.get("api_time") or r.get("time") or "")
+    return merged
+
+
+def _next_generation(paths: List[Path]) -> int:
+    """0 for a first compaction, else one past the compacted files being merged again."""
+    generations = [compacted_generation(path.name) for path in paths if is_compacted(path.name)]
+    return max(generations) + 1 if generations else 0
+
+
+def compact_group(city: str, period_key: str, paths: List[Path], actual_dir: Path = ACTUAL_DIR) -> int:
+    """Write one compacted file for the group and delete its sources. Returns rows written."""
+    actual_dir = Path(actual_dir)
+    target = actual_dir / compacted_name(city, period_key, _next_generation(paths))
+    rows = merge_rows(paths)
+    if not rows:
+        return 0
+
+    # Hidden temporary name, so the actual_*.csv globs of readers never see a partial file
+    tmp = actual_dir / f".{target.name}.{os.getpid()}.tmp"
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, target)
+    manifest.record_file("actual", target, actual_dir.parent)
+
+    sources = [path for path in paths if path != target]
+    for path in sources:
+        path.unlink(missing_ok=True)
+    manifest.forget("actual", [path.name for path in sources], actual_dir.parent)
+    return len(rows)
+
+
+def compact_actuals(period: str = "day", actual_dir: Path = ACTUAL_DIR,
+                    today: Optional[date] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Compact every closed period. Returns counts of files read, files written and rows kept."""
+    stats = {"files": 0, "compacted": 0, "rows": 0}
+    for (city, key), paths in sorted(plan_compaction(period, actual_dir, today).items()):
+        stats["files"] += len(paths)
+        if dry_run:
+            print(f"[INFO] Would compact {len(paths)} files into {compacted_name(city, key, _next_generation(paths))}")
+            continue
+        try:
+            stats["rows"] += compact_group(city, key, paths, actual_dir)
+            stats["compacted"] += 1
+        except Exception as e:
+            print(f"[WARNING] Could not compact {city} {key}: {e}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge single-row actual_*.csv files per city and period")
+    parser.add_argument("--period", choices=PERIODS, default="day")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be compacted")
+    args = parser.parse_args()
+
+    stats = compact_actuals(args.period, dry_run=args.dry_run)
+    print(f"[INFO] {stats['files']} files -> {stats['compacted']} compacted files ({stats['rows']} rows)")
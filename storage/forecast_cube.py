@@ -0,0 +1,290 @@
+"""
+Compact in-memory forecast runs.
+
+A `ForecastRun` is one forecast as issued: the issue time, its target times
+(datetime64[s]) and one float32 column per parameter. A `ForecastCube` holds
+every run of one city as a dense array indexed by
+issue time x hour offset x parameter (NaN where a run has no value).
+
+Hour offset k of a run is the whole hour k hours after its anchor, the issue
+time floored to the hour: a run issued at 03:55 has 04:00 at offset 1. The
+offset is only a storage index. The horizon of a forecast is what the
+evaluations report (`horizon_hours`, evaluator.horizon.horizon_hours): hours
+from the issue time to the target, rounded, so 04:00 of the 03:55 run is
+horizon 0. All forecasts at one offset are a single strided view; all
+forecasts at one horizon are gathered from at most two offsets per run:
+
+    cube = ForecastCube.from_archive("Maribor", HOURLY_PARAMS, max_offset=48)
+    column = cube.at_offset("temperature_2m", 6)       # view, one value per run
+    runs, targets, six_hours = cube.horizon("temperature_2m", 6)
+
+The memory-mapped store (storage.forecast_store) uses the same layout and
+hands out its runs as cubes.
+
+    python -m storage.forecast_cube --city Maribor --parameter temperature_2m --horizon 6
+"""
+
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from evaluator.horizon import horizon_hours
+from storage import archive
+
+VALUE_DTYPE = np.float32
+HOUR = np.timedelta64(3600, "s")
+
+
+def run_anchor(issue_times: np.ndarray) -> np.ndarray:
+    """Target time at hour offset 0: the issue time floored to the hour."""
+    return np.asarray(issue_times).astype("datetime64[h]").astype("datetime64[s]")
+
+
+def hour_offsets(issue_times: np.ndarray, target_times: np.ndarray) -> np.ndarray:
+    """Hour offset of every target time from the anchor of its run; -1 for targets off the whole hour."""
+    offset = (np.asarray(target_times).astype("datetime64[s]") - run_anchor(issue_times)).astype(np.int64)
+    return np.where(offset % 3600 == 0, offset // 3600, -1)
+
+
+def scatter_runs(issue_times: np.ndarray, target_times: np.ndarray, columns: Sequence[np.ndarray],
+                 max_offset: int, dtype=VALUE_DTYPE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scatter long forecast rows into runs: (sorted issue times, values
+    run x offset x column, mask of runs in which two rows share an offset).
+    Rows outside offsets 0..max_offset are dropped; where rows collide, the
+    first non-NaN value of every column wins, like in evaluator.horizon.
+    """
+    issue = np.asarray(issue_times).astype("datetime64[s]")
+    offsets = hour_offsets(issue, target_times)
+    keep = (offsets >= 0) & (offsets <= max_offset)
+    run_issue, runs = np.unique(issue, return_inverse=True)
+    values = np.full((len(run_issue), max_offset + 1, len(columns)), np.nan, dtype=dtype)
+    for j, column in enumerate(columns):
+        filled = keep & ~np.isnan(column)
+        # Reversed, so that the first value of a cell is written last
+        values[runs[filled][::-1], offsets[filled][::-1], j] = column[filled][::-1]
+
+    cells, counts = np.unique(runs[keep] * (max_offset + 1) + offsets[keep], return_counts=True)
+    collided = np.zeros(len(run_issue), dtype=bool)
+    collided[cells[counts > 1] // (max_offset + 1)] = True
+    return run_issue, values, collided
+
+
+class ForecastRun:
+    """One forecast run of one city: `values[i, j]` is parameter j at `times[i]`."""
+
+    __slots__ = ("city", "issue_time", "parameters", "times", "values")
+
+    def __init__(self, city: str, issue_time, parameters: Sequence[str], times, values):
+        self.city = city
+        self.issue_time = np.datetime64(issue_time, "s")
+        self.parameters = tuple(parameters)
+        self.times = np.asarray(times, dtype="datetime64[s]")
+        self.values = np.asarray(values, dtype=VALUE_DTYPE).reshape(len(self.times), len(self.parameters))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, parameters: Sequence[str]) -> "ForecastRun":
+        """Build from the rows of a single run (`city`, `issue_time`, `target_time`, parameter columns)."""
+        values = np.column_stack([df[p].to_numpy(dtype=VALUE_DTYPE) if p in df.columns
+                                  else np.full(len(df), np.nan, dtype=VALUE_DTYPE) for p in parameters])
+        return cls(df["city"].iloc[0], df["issue_time"].iloc[0], parameters,
+                   df["target_time"].to_numpy(dtype="datetime64[s]"), values)
+
+    @property
+    def hour_offsets(self) -> np.ndarray:
+        return hour_offsets(np.full(len(self.times), self.issue_time), self.times)
+
+    @property
+    def horizons(self) -> np.ndarray:
+        """Horizon of every target time, as in the evaluation results."""
+        return horizon_hours((self.times - self.issue_time).astype(np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    def column(self, parameter: str) -> np.ndarray:
+        return self.values[:, self.parameters.index(parameter)]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __repr__(self) -> str:
+        return f"ForecastRun({self.city!r}, {self.issue_time}, {len(self)} times x {len(self.parameters)} parameters)"
+
+
+class ForecastCube:
+    """
+    Runs of one city as `values[run, offset, parameter]`, runs sorted by
+    issue time. `anchors[run]` is the target time at hour offset 0 of that
+    run. Values are float32 when built here and float64 when read from the
+    forecast store.
+    """
+
+    __slots__ = ("city", "parameters", "issue_times", "anchors", "values")
+
+    def __init__(self, city: str, parameters: Sequence[str], issue_times, anchors, values):
+        self.city = city
+        self.parameters = tuple(parameters)
+        self.issue_times = np.asarray(issue_times, dtype="datetime64[s]")
+        self.anchors = np.asarray(anchors, dtype="datetime64[s]")
+        self.values = values
+
+    @classmethod
+    def empty(cls, city: str, parameters: Sequence[str], max_offset: int) -> "ForecastCube":
+        return cls(city, parameters, np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype="datetime64[s]"),
+                   np.empty((0, max_offset + 1, len(parameters)), dtype=VALUE_DTYPE))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, city: str, parameters: Sequence[str],
+                   max_offset: int = 48) -> "ForecastCube":
+        """
+        Scatter long forecast rows (`issue_time`, `target_time`, parameter
+        columns, as returned by archive.query) into the cube. Rows outside
+        offsets 0..max_offset are dropped; runs with two rows for the same
+        offset are left out with a warning.
+        """
+        if df.empty:
+            return cls.empty(city, parameters, max_offset)
+        columns = [df[p].to_numpy(dtype=np.float64) if p in df.columns else np.full(len(df), np.nan)
+                   for p in parameters]
+        issue_times, values, collided = scatter_runs(df["issue_time"].to_numpy(dtype="datetime64[s]"),
+                                                     df["target_time"].to_numpy(dtype="datetime64[s]"),
+                                                     columns, max_offset)
+        if collided.any():
+            print(f"[WARNING] Skipping {int(collided.sum())} runs of {city} with several rows for one target hour")
+            issue_times, values = issue_times[~collided], values[~collided]
+        return cls(city, parameters, issue_times, run_anchor(issue_times), values)
+
+    @classmethod
+    def from_runs(cls, runs: Iterable[ForecastRun], parameters: Sequence[str],
+                  max_offset: int = 48) -> "ForecastCube":
+        """Stack runs of one city (in any order) into a cube."""
+        runs = list(runs)
+        if not runs:
+            raise ValueError("At least one run is needed to name the city")
+        frame = pd.DataFrame({
+            "issue_time": np.concatenate([np.full(len(r), r.issue_time) for r in runs]),
+            "target_time": np.concatenate([r.times for r in runs]),
+            **{p: np.concatenate([r.column(p) if p in r.parameters else np.full(len(r), np.nan, dtype=VALUE_DTYPE)
+                                  for r in runs]) for p in parameters},
+        })
+        return cls.from_frame(frame, runs[0].city, parameters, max_offset)
+
+    @classmethod
+    def from_archive(cls, city: str, parameters: Sequence[str], max_offset: int = 48, issue_start=None,
+                     issue_end=None, kind: str = "hourly", root=archive.ARCHIVE_DIR) -> "ForecastCube":
+        """Cube of every archived run of `city` issued within the (inclusive) window."""
+        df = archive.query(kind, city, parameters=parameters, issue_start=issue_start, issue_end=issue_end,
+                           root=root)
+        return cls.from_frame(df, city, parameters, max_offset)
+
+    @property
+    def max_offset(self) -> int:
+        return self.values.shape[1] - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.issue_times.nbytes + self.anchors.nbytes + self.values.nbytes
+
+    def at_offset(self, parameter: str, offset: int) -> np.ndarray:
+        """Forecast of `parameter` at hour offset `offset`, one value per run (a view, not a copy)."""
+        if not 0 <= offset <= self.max_offset:
+            raise IndexError(f"Hour offset {offset} outside 0..{self.max_offset}")
+        return self.values[:, offset, self.parameters.index(parameter)]
+
+    def target_times(self, offset: int) -> np.ndarray:
+        """Target time of every run at hour offset `offset`."""
+        return self.anchors + offset * HOUR
+
+    def target_grid(self) -> np.ndarray:
+        """Target times of every run and hour offset, as run x offset."""
+        return self.anchors[:, None] + np.arange(self.max_offset + 1) * HOUR
+
+    def horizon_grid(self) -> np.ndarray:
+        """Horizon of every run and hour offset, as in the evaluation results (run x offset)."""
+        return horizon_hours((self.target_grid() - self.issue_times[:, None]).astype(np.int64))
+
+    def horizon(self, parameter: str, horizon: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (run indexes, target times, values) of every forecast of `parameter`
+        with the given horizon, ordered by run. Horizon h of a run lies at
+        offset h or h + 1; a run issued at half past has none or two of them,
+        as in the evaluation.
+        """
+        column = self.parameters.index(parameter)
+        offsets = np.arange(horizon, horizon + 2)
+        offsets = offsets[(offsets >= 0) & (offsets <= self.max_offset)]
+        targets = self.anchors[:, None] + offsets * HOUR
+        match = horizon_hours((targets - self.issue_times[:, None]).astype(np.int64)) == horizon
+        runs, which = np.nonzero(match)
+        return runs, targets[runs, which], self.values[runs, offsets[which], column]
+
+    def run(self, index: int) -> ForecastRun:
+        """Run `index` with the hour offsets it has values for."""
+        filled = ~np.isnan(self.values[index]).all(axis=1)
+        offsets = np.flatnonzero(filled)
+        return ForecastRun(self.city, self.issue_times[index], self.parameters,
+                           self.anchors[index] + offsets * HOUR, self.values[index, offsets])
+
+    def runs(self) -> Iterator[ForecastRun]:
+        for index in range(len(self)):
+            yield self.run(index)
+
+    def select(self, issue_start=None, issue_end=None) -> "ForecastCube":
+        """Runs issued within the inclusive window, sharing memory with this cube."""
+        lo = 0 if issue_start is None else np.searchsorted(self.issue_times, np.datetime64(issue_start, "s"), "left")
+        hi = len(self) if issue_end is None else np.searchsorted(self.issue_times, np.datetime64(issue_end, "s"),
+                                                                 "right")
+        return ForecastCube(self.city, self.parameters, self.issue_times[lo:hi], self.anchors[lo:hi],
+                            self.values[lo:hi])
+
+    def __len__(self) -> int:
+        return len(self.issue_times)
+
+    def __repr__(self) -> str:
+        return (f"ForecastCube({self.city!r}, {len(self)} runs x {self.max_offset + 1} hour offsets x "
+                f"{len(self.parameters)} parameters, {self.nbytes / 1e6:.1f} MB)")
+
+
+def horizon_frame(cubes: List[ForecastCube], parameter: str, horizon: int) -> pd.DataFrame:
+    """All forecasts of `parameter` with the given horizon over several cities, without empty cells."""
+    frames = []
+    for cube in cubes:
+        runs, targets, values = cube.horizon(parameter, horizon)
+        mask = ~np.isnan(values)
+        frames.append(pd.DataFrame({
+            "city": cube.city,
+            "issue_time": cube.issue_times[runs[mask]],
+            "target_time": targets[mask],
+            "forecast_value": values[mask],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["city", "issue_time", "target_time", "forecast_value"])
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from config import HOURLY_PARAMS
+
+    parser = argparse.ArgumentParser(description="Build the forecast cube of a city from the archive")
+    parser.add_argument("--city", required=True)
+    parser.add_argument("--parameter", default=HOURLY_PARAMS[0], choices=HOURLY_PARAMS)
+    parser.add_argument("--horizon", type=int, default=6, help="horizon in hours, as in the evaluation results")
+    parser.add_argument("--max-offset", type=int, default=48)
+    parser.add_argument("--issue-start")
+    parser.add_argument("--issue-end")
+    args = parser.parse_args()
+
+    archive.sync()
+    frame = archive.query("hourly", args.city, parameters=HOURLY_PARAMS,
+                          issue_start=args.issue_start, issue_end=args.issue_end)
+    cube = ForecastCube.from_frame(frame, args.city, HOURLY_PARAMS, args.max_offset)
+    print(f"[INFO] {cube}")
+    if len(cube):
+        print(f"[INFO] {cube.nbytes / len(cube):.0f} bytes per run "
+              f"(DataFrame: {frame.memory_usage(deep=True).sum() / len(cube):.0f} bytes per run)")
+        print(horizon_frame([cube], args.parameter, args.horizon).to_string(index=False))
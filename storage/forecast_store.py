@@ -0,0 +1,345 @@
+"""
+Memory-mapped store of hourly forecast runs and observations, for evaluations
+over years of history with bounded memory.
+
+Per city, forecasts are one float64 array of run x hour offset x parameter and
+observations one array of hour x parameter, kept in flat binary files that
+are opened with np.memmap, so a scan only reads the runs and hours it visits:
+
+    data/forecast_store/{city}/
+        _meta.json          committed sizes and the archive batches already copied
+        issue_time.bin      int64 seconds per run, in the order runs were added
+        forecast.bin        float64 run x hour offset x parameter; offset k targets
+                            the hour of the issue time + k hours (storage.forecast_cube)
+        observed_key.bin    int64 (issue, target) seconds of the observation kept
+                            for every hour, 0 where there is none
+        observed.bin        float64 hour x parameter, hour i = origin + i hours
+
+`sync` copies the archive batches that arrived since the previous call: new
+runs are appended, replaced runs are overwritten in place and the observation
+grid only grows at its end. Only observations older than the grid origin or
+superseded observation batches (both rare) rebuild the grid. The meta file is
+the commit point: bytes beyond the committed sizes are dropped on the next
+append, and partitions not yet recorded as copied are copied again.
+
+    python -m storage.forecast_store
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import HOURLY_PARAMS
+from evaluator.horizon import ACTUAL_RENAME
+from storage import archive, forecast_cube
+from telemetry import recorder
+
+STORE_DIR = Path("data") / "forecast_store"
+PARAMETERS = list(HOURLY_PARAMS)
+# Hour offsets 0..48 from the hour of issue
+OFFSETS = 49
+HOUR = 3600
+
+TIME_DTYPE = archive.TIME_DTYPE
+VALUE_DTYPE = archive.VALUE_DTYPE
+META_FILE = "_meta.json"
+
+# Archive column holding each observed parameter
+OBSERVED_COLUMNS = {new: old for old, new in ACTUAL_RENAME.items()}
+
+
+def _empty_meta() -> Dict:
+    return {"parameters": PARAMETERS, "offsets": OFFSETS, "runs": 0, "origin": None, "hours": 0, "copied": {}}
+
+
+def _read_meta(store: Path) -> Dict:
+    path = store / META_FILE
+    if not path.exists():
+        return _empty_meta()
+    with path.open("r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["parameters"] != PARAMETERS or meta.get("offsets") != OFFSETS:
+        print(f"[WARNING] Forecast store layout of {store.name} changed, copying the archive again")
+        return _empty_meta()
+    return meta
+
+
+def _write_meta(store: Path, meta: Dict) -> None:
+    """Write the store metadata atomically; it is the commit point of every change."""
+    tmp = store / (META_FILE + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, store / META_FILE)
+
+
+def _append(path: Path, dtype: str, committed_items: int, values: np.ndarray) -> None:
+    """Append values, dropping bytes beyond the committed item count first."""
+    with path.open("ab") as f:
+        f.truncate(committed_items * np.dtype(dtype).itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def _resize(path: Path, dtype: str, committed_items: int, items: int) -> None:
+    """Grow a file to `items` items; everything beyond the committed items reads as zeros."""
+    itemsize = np.dtype(dtype).itemsize
+    with path.open("ab") as f:
+        f.truncate(committed_items * itemsize)
+        f.truncate(items * itemsize)
+
+
+def _map(path: Path, dtype: str, shape: Tuple[int, ...], mode: str = "r") -> np.ndarray:
+    if not shape[0]:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+def _store_runs(store: Path, meta: Dict, rows: Dict[str, np.ndarray], ranges: List[Tuple[int, int]]) -> int:
+    """
+    Write complete runs (every live archive row of their issue times) into the
+    store. Stored runs with the same issue time are overwritten; stored runs
+    inside `ranges` (inclusive issue-time bounds) that `rows` no longer has are
+    cleared. Returns the number of runs written.
+    """
+    # Colliding rows are kept: the first value wins, as in the pair builder
+    run_issue, block, _ = forecast_cube.scatter_runs(
+        rows["issue_time"].astype("datetime64[s]"), rows["target_time"].astype("datetime64[s]"),
+        [rows[p] for p in PARAMETERS], OFFSETS - 1, dtype=np.float64)
+    run_issue = run_issue.astype(np.int64)
+
+    runs = meta["runs"]
+    stored = np.array(_map(store / "issue_time.bin", TIME_DTYPE, (runs,)))
+    index = np.full(len(run_issue), -1)
+    cleared = np.zeros(runs, dtype=bool)
+    if runs:
+        order = np.argsort(stored, kind="stable")
+        ordered = stored[order]
+        pos = np.minimum(np.searchsorted(ordered, run_issue), runs - 1)
+        hit = ordered[pos] == run_issue
+        index[hit] = order[pos[hit]]
+        for lo, hi in ranges:
+            cleared |= (stored >= lo) & (stored <= hi)
+        cleared[index[hit]] = False
+
+    old = index >= 0
+    if old.any() or cleared.any():
+        forecast = _map(store / "forecast.bin", VALUE_DTYPE, (runs, OFFSETS, len(PARAMETERS)), "r+")
+        forecast[index[old]] = block[old]
+        forecast[np.flatnonzero(cleared)] = np.nan
+        forecast.flush()
+        del forecast
+    new = ~old
+    if new.any():
+        _append(store / "issue_time.bin", TIME_DTYPE, runs, run_issue[new])
+        _append(store / "forecast.bin", VALUE_DTYPE, runs * OFFSETS * len(PARAMETERS), block[new])
+        meta["runs"] = runs + int(new.sum())
+    return len(run_issue)
+
+
+def _store_observations(store: Path, meta: Dict, rows: Dict[str, np.ndarray]) -> int:
+    """
+    Merge observation rows into the hourly grid. Every hour keeps the row
+    that comes first by (issue time, target time), like
+    evaluator.horizon.prepare_actuals. Returns the number of hours updated.
+    """
+    issue, target = rows["issue_time"], rows["target_time"]
+    if not len(issue):
+        return 0
+    order = np.lexsort((target, issue))
+    hours = (target - target % HOUR)[order]
+    _, first = np.unique(hours, return_index=True)
+    rows_first = order[first]
+    issue, target, hours = issue[rows_first], target[rows_first], hours[first]
+    values = np.column_stack([rows[OBSERVED_COLUMNS.get(p, p)][rows_first] for p in PARAMETERS])
+
+    if hours.min() < meta["origin"]:
+        raise ValueError("Observations before the origin of the grid")
+    index = (hours - meta["origin"]) // HOUR
+    committed = meta["hours"]
+    size = max(committed, int(index.max()) + 1)
+    if size > committed:
+        _resize(store / "observed_key.bin", TIME_DTYPE, committed * 2, size * 2)
+        _resize(store / "observed.bin", VALUE_DTYPE, committed * len(PARAMETERS), size * len(PARAMETERS))
+
+    keys = _map(store / "observed_key.bin", TIME_DTYPE, (size, 2), "r+")
+    grid = _map(store / "observed.bin", VALUE_DTYPE, (size, len(PARAMETERS)), "r+")
+    current = keys[index]
+    better = (current[:, 0] == 0) | (issue < current[:, 0]) | ((issue == current[:, 0]) & (target < current[:, 1]))
+    keys[index[better]] = np.column_stack((issue, target))[better]
+    grid[index[better]] = values[better]
+    keys.flush()
+    grid.flush()
+    del keys, grid
+    meta["hours"] = size
+    return int(better.sum())
+
+
+def _pending(pmeta: Dict, copied: Optional[Dict]) -> Tuple[List[int], List[int]]:
+    """
+    (new live batches, batches superseded since they were copied) of one
+    partition. A partition rewritten without its superseded batches since
+    (archive generation) has new batch indexes: every batch counts as new.
+    """
+    copied = copied or {"batches": 0, "superseded": []}
+    batches = pmeta["batches"]
+    if _regenerated(pmeta, copied):
+        return [i for i, b in enumerate(batches) if not b.get("superseded")], []
+    new = [i for i in range(copied["batches"], len(batches)) if not batches[i].get("superseded")]
+    seen = set(copied["superseded"])
+    hidden = [i for i in range(min(copied["batches"], len(batches)))
+              if batches[i].get("superseded") and i not in seen]
+    return new, hidden
+
+
+def _regenerated(pmeta: Dict, copied: Optional[Dict]) -> bool:
+    return copied is not None and copied.get("generation", 0) != pmeta.get("generation", 0)
+
+
+def _copied(pmeta: Dict) -> Dict:
+    return {
+        "batches": len(pmeta["batches"]),
+        "superseded": [i for i, b in enumerate(pmeta["batches"]) if b.get("superseded")],
+        "generation": pmeta.get("generation", 0),
+    }
+
+
+def _sync_forecasts(store: Path, meta: Dict, city: str, archive_root: Path) -> int:
+    written = 0
+    columns = list(archive.TIME_COLUMNS) + PARAMETERS
+    for part in archive.list_partitions("hourly", city, archive_root):
+        key = f"hourly/{part.name}"
+        pmeta = archive.partition_meta(part)
+        if meta["copied"].get(key) == _copied(pmeta):
+            continue
+        new, hidden = _pending(pmeta, meta["copied"].get(key))
+        if new or hidden:
+            # Whole runs are rewritten, so read every live row of the affected issue times
+            ranges = [(pmeta["batches"][i]["issue_min"], pmeta["batches"][i]["issue_max"]) for i in new + hidden]
+            rows = archive.read_partition(part, columns, pmeta)
+            affected = np.zeros(len(rows["issue_time"]), dtype=bool)
+            for lo, hi in ranges:
+                affected |= (rows["issue_time"] >= lo) & (rows["issue_time"] <= hi)
+            written += _store_runs(store, meta, {c: v[affected] for c, v in rows.items()}, ranges)
+        meta["copied"][key] = _copied(pmeta)
+        _write_meta(store, meta)
+    return written
+
+
+def _sync_observations(store: Path, meta: Dict, city: str, archive_root: Path) -> int:
+    columns = list(archive.TIME_COLUMNS) + [OBSERVED_COLUMNS.get(p, p) for p in PARAMETERS]
+    parts = [(part, archive.partition_meta(part)) for part in archive.list_partitions("actual", city, archive_root)]
+    pending = {}
+    rebuild = False
+    for part, pmeta in parts:
+        copied = meta["copied"].get(f"actual/{part.name}")
+        new, hidden = _pending(pmeta, copied)
+        pending[part] = new
+        # Batches superseded before the partition was rewritten are no longer listed
+        rebuild |= bool(hidden) or _regenerated(pmeta, copied)
+        if new and meta["origin"] is not None:
+            first = min(pmeta["batches"][i]["target_min"] for i in new)
+            rebuild |= first - first % HOUR < meta["origin"]
+
+    if rebuild or meta["origin"] is None:
+        if rebuild:
+            print(f"[INFO] Rebuilding the observation grid of {city}")
+        live = [b["target_min"] for _, pmeta in parts for b in pmeta["batches"] if not b.get("superseded")]
+        meta["origin"] = min(t - t % HOUR for t in live) if live else None
+        meta["hours"] = 0
+
+    written = 0
+    for part, pmeta in parts:
+        key = f"actual/{part.name}"
+        if not rebuild and meta["copied"].get(key) == _copied(pmeta):
+            continue
+        batches = None if rebuild else pending[part]
+        if batches is None or batches:
+            written += _store_observations(store, meta, archive.read_partition(part, columns, pmeta, batches))
+        meta["copied"][key] = _copied(pmeta)
+        _write_meta(store, meta)
+    return written
+
+
+def sync_city(city: str, root: Path = STORE_DIR, archive_root: Path = archive.ARCHIVE_DIR) -> Tuple[int, int]:
+    """Copy new archive batches of one city. Returns (runs written, hours updated)."""
+    store = Path(root) / city
+    store.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(store)
+    with recorder.stage("store_sync", city=city) as stage:
+        runs = _sync_forecasts(store, meta, city, archive_root)
+        hours = _sync_observations(store, meta, city, archive_root)
+        stage.rows = runs + hours
+    return runs, hours
+
+
+def sync(cities: Optional[Iterable[str]] = None, root: Path = STORE_DIR,
+         archive_root: Path = archive.ARCHIVE_DIR) -> None:
+    """Bring the store of every city (default: every archived city) up to date with the archive."""
+    if cities is None:
+        cities = sorted(set(archive.list_cities("hourly", archive_root)) | set(archive.list_cities("actual", archive_root)))
+    for city in cities:
+        runs, hours = sync_city(city, root, archive_root)
+        if runs or hours:
+            print(f"[INFO] Stored {runs} forecast runs and {hours} observed hours for {city}")
+
+
+class CityStore:
+    """
+    Read access to the committed store of one city. Only the run index
+    (`issue_times`, int64 seconds) is held in memory; forecast runs and
+    observed hours are copied out of a memory map that is closed again, so
+    pages read for one window do not stay resident.
+    """
+
+    __slots__ = ("city", "parameters", "offsets", "issue_times", "origin", "hours", "_store")
+
+    def __init__(self, city: str, store: Path, meta: Dict):
+        self.city = city
+        self.parameters = tuple(meta["parameters"])
+        self.offsets = meta["offsets"]
+        self.issue_times = np.fromfile(store / "issue_time.bin", dtype=TIME_DTYPE, count=meta["runs"]) \
+            if meta["runs"] else np.empty(0, dtype=TIME_DTYPE)
+        self.origin = meta["origin"]
+        self.hours = meta["hours"]
+        self._store = store
+
+    def _read(self, name: str, dtype: str, shape: Tuple[int, ...], index) -> np.ndarray:
+        data = _map(self._store / name, dtype, shape)
+        try:
+            return np.array(data[index])
+        finally:
+            del data
+
+    def cube(self, runs: np.ndarray) -> forecast_cube.ForecastCube:
+        """The given runs (sorted run indexes read fastest) as a float64 forecast cube, in that order."""
+        issue_times = self.issue_times[runs].astype("datetime64[s]")
+        values = self._read("forecast.bin", VALUE_DTYPE, (len(self), self.offsets, len(self.parameters)), runs)
+        return forecast_cube.ForecastCube(self.city, self.parameters, issue_times,
+                                          forecast_cube.run_anchor(issue_times), values)
+
+    def observations(self, first: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(observed mask, values hour x parameter) of `count` hours from grid row `first`."""
+        hours = slice(first, first + count)
+        keys = self._read("observed_key.bin", TIME_DTYPE, (self.hours, 2), hours)
+        return keys[:, 0] != 0, self._read("observed.bin", VALUE_DTYPE, (self.hours, len(self.parameters)), hours)
+
+    def __len__(self) -> int:
+        return len(self.issue_times)
+
+    def __repr__(self) -> str:
+        return f"CityStore({self.city!r}, {len(self)} runs, {self.hours} observed hours)"
+
+
+def open_city(city: str, root: Path = STORE_DIR) -> Optional[CityStore]:
+    """The store of `city` as it was last committed, None if it was never synced."""
+    store = Path(root) / city
+    if not (store / META_FILE).exists():
+        return None
+    return CityStore(city, store, _read_meta(store))
+
+
+if __name__ == "__main__":
+    archive.sync()
+    sync()
@@ -0,0 +1,69 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+# Raw CSV layout written by the collectors, per kind: (subfolder of data/, filename prefix)
+CSV_LAYOUT = {
+    "hourly": ("hourly_forecasts", "hourly"),
+    "daily": ("daily_forecasts", "forecast"),
+    "actual": ("actual_data", "actual"),
+    # Forecasts from the historical-forecast endpoint (run_backfill.py); they have no
+    # real issue time, so they are kept apart from the collected runs
+    "historical": ("historical_forecasts", "historical"),
+}
+
+# Suffix of merged actual files written by storage.compact
+COMPACTED_SUFFIX = "compacted"
+
+
+def kind_for_subfolder(subfolder: str) -> Optional[str]:
+    """Kind of the collector files stored in a data/ subfolder, or None."""
+    for kind, (folder, _) in CSV_LAYOUT.items():
+        if folder == Path(subfolder).name:
+            return kind
+    return None
+
+
+def compacted_name(city: str, period_key: str, generation: int = 0) -> str:
+    """Name of a compacted actual file; a period compacted again gets the next generation."""
+    if generation:
+        return f"actual_{city}_{period_key}_{generation}_{COMPACTED_SUFFIX}.csv"
+    return f"actual_{city}_{period_key}_{COMPACTED_SUFFIX}.csv"
+
+
+def is_compacted(filename: str) -> bool:
+    return Path(filename).stem.endswith(f"_{COMPACTED_SUFFIX}")
+
+
+def compacted_generation(filename: str) -> int:
+    parts = Path(filename).stem.split("_")
+    return int(parts[3]) if len(parts) == 5 else 0
+
+
+def is_daily_actual(filename: str) -> bool:
+    """Explicit daily actuals actual_{city}_{YYYY-MM-DD}.csv (run_daily_accuracy), not collector snapshots."""
+    parts = Path(filename).stem.split("_")
+    return parts[0] == "actual" and len(parts) == 3 and len(parts[2]) == 10
+
+
+def parse_csv_name(kind: str, filename: str) -> Dict:
+    """
+    Split a collector filename into city and issue time.
+    hourly_{city}_{YYYY-MM-DD}_{HH-MM}.csv, forecast_{city}_{YYYY-MM-DD}.csv,
+    historical_{city}_{YYYY-MM-DD}.csv (issue time = midnight of the day),
+    actual_{city}_{YYYY-MM-DD}_{HH-MM}.csv, and compacted actuals
+    actual_{city}_{YYYY-MM-DD}_compacted.csv / actual_{city}_{YYYY-MM}_compacted.csv,
+    optionally with a generation before the suffix (issue time = start of the
+    period, see storage.compact)
+    """
+    parts = Path(filename).stem.split("_")
+    city = parts[1]
+    if kind in ("daily", "historical"):
+        return {"city": city, "issue_time": datetime.strptime(parts[2], "%Y-%m-%d")}
+    if is_compacted(filename):
+        fmt = "%Y-%m-%d" if len(parts[2]) == 10 else "%Y-%m"
+        return {"city": city, "issue_time": datetime.strptime(parts[2], fmt)}
+    return {
+        "city": city,
+        "issue_time": datetime.strptime(f"{parts[2]} {parts[3]}", "%Y-%m-%d %H-%M"),
+    }
@@ -1,6 +1,45 @@
 from pathlib import Path
 import csv
-from typing import Dict, List
+import io
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from telemetry import recorder
+
+# Column types of the collector CSV files. Times become datetime64, everything else is numeric;
+# pass float32 schemas where memory matters more than the last digits.
+HOURLY_SCHEMA: Dict[str, str] = {
+    "time": "datetime64[s]",
+    "temperature_2m": "float64",
+    "precipitation": "float64",
+    "cloudcover": "float64",
+    "windspeed_10m": "float64",
+}
+DAILY_SCHEMA: Dict[str, str] = {
+    "time": "datetime64[s]",
+    "temperature_2m_min": "float64",
+    "temperature_2m_max": "float64",
+    "temperature_2m_mean": "float64",
+    "precipitation_sum": "float64",
+    "cloudcover_mean": "float64",
+    "windspeed_10m_max": "float64",
+}
+ACTUAL_SCHEMA: Dict[str, str] = {
+    "time": "datetime64[s]",
+    "interval": "float64",
+    "temperature": "float64",
+    "windspeed": "float64",
+    "winddirection": "float64",
+    "is_day": "float64",
+    "weathercode": "float64",
+    "fetched_time": "datetime64[s]",
+    "api_time": "datetime64[s]",
+}
+
+DEFAULT_CHUNK_ROWS = 100_000
+
 
 def load_records(filename: str, subfolder: str = "") -> List[Dict]:
     """
@@ -14,4 +53,125 @@ def load_records(filename: str, subfolder: str = "") -> List[Dict]:
 
     with path.open("r", newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        return list(reader)
\ No newline at end of file
+        return list(reader)
+
+
+def _split_file(path: Path) -> Tuple[bytes, bytes, int]:
+    """Header line, data lines and number of data rows of a CSV file."""
+    raw = path.read_bytes()
+    header, _, body = raw.partition(b"\n")
+    body = body.strip()
+    rows = body.count(b"\n") + 1 if body else 0
+    return header.strip(), body, rows
+
+
+def _parse(header: bytes, bodies: List[bytes], schema: Dict[str, str], rows: int) -> pd.DataFrame:
+    """Parse many data blocks sharing one header with a single read_csv call."""
+    buffer = io.BytesIO(header + b"\n" + b"\n".join(bodies) + b"\n")
+    columns = header.decode("utf-8").split(",")
+    numeric = {c: t for c, t in schema.items() if c in columns and not t.startswith("datetime")}
+    df = pd.read_csv(buffer, usecols=[c for c in columns if c in schema], dtype=numeric)
+    if len(df) != rows:
+        raise ValueError(f"Expected {rows} rows, parsed {len(df)}")
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            fill = np.datetime64("NaT") if dtype.startswith("datetime") else np.nan
+            df[col] = np.full(len(df), fill, dtype=dtype)
+        elif dtype.startswith("datetime"):
+            df[col] = pd.to_datetime(df[col], format="ISO8601").to_numpy(dtype=dtype)
+    return df[list(schema)]
+
+
+def _files(pattern: str, subfolder: str) -> List[Path]:
+    folder = Path("data") / subfolder if subfolder else Path("data")
+    return sorted(folder.glob(pattern))
+
+
+def iter_column_chunks(
+    pattern: str,
+    subfolder: str = "",
+    schema: Optional[Dict[str, str]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    with_source: bool = False,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Stream typed columns from every file matching `pattern`, in filename order.
+    Rows of many files are parsed together and yielded as {column: array}
+    chunks of roughly `chunk_rows` rows; with `with_source` a `source`
+    column holds the filename of each row. Only one chunk is held in memory.
+    """
+    schema = schema or HOURLY_SCHEMA
+    header = None
+    bodies: List[bytes] = []
+    sources: List[str] = []
+    counts: List[int] = []
+
+    def flush():
+        df = _parse(header, bodies, schema, sum(counts))
+        chunk = {c: df[c].to_numpy() for c in schema}
+        if with_source:
+            chunk["source"] = np.repeat(np.array(sources, dtype=object), counts)
+        return chunk
+
+    for path in _files(pattern, subfolder):
+        file_header, body, rows = _split_file(path)
+        if not rows:
+            continue
+        if bodies and (file_header != header or sum(counts) >= chunk_rows):
+            yield flush()
+            bodies, sources, counts = [], [], []
+        header = file_header
+        bodies.append(body)
+        sources.append(path.name)
+        counts.append(rows)
+    if bodies:
+        yield flush()
+
+
+@recorder.timed("load_csv", rows=len)
+def load_files(
+    paths: Iterable[Path],
+    schema: Optional[Dict[str, str]] = None,
+    with_source: bool = False,
+) -> pd.DataFrame:
+    """
+    One typed DataFrame for the given CSV files, built with one parse per
+    distinct header instead of one DataFrame per file. Rows keep file order.
+    """
+    schema = schema or HOURLY_SCHEMA
+    groups: Dict[bytes, Tuple[List[bytes], List[str], List[int], List[int]]] = {}
+    for order, path in enumerate(paths):
+        header, body, rows = _split_file(Path(path))
+        if not rows:
+            continue
+        bodies, sources, counts, orders = groups.setdefault(header, ([], [], [], []))
+        bodies.append(body)
+        sources.append(Path(path).name)
+        counts.append(rows)
+        orders.append(order)
+
+    frames = []
+    for header, (bodies, sources, counts, orders) in groups.items():
+        df = _parse(header, bodies, schema, sum(counts))
+        df["source"] = np.repeat(np.array(sources, dtype=object), counts)
+        df["_order"] = np.repeat(orders, counts)
+        frames.append(df)
+
+    columns = list(schema) + (["source"] if with_source else [])
+    if not frames:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in schema.items()}, columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        # Different headers were parsed separately; restore file order
+        df = df.sort_values("_order", kind="stable").reset_index(drop=True)
+    return df[columns]
+
+
+def load_frame(
+    pattern: str,
+    subfolder: str = "",
+    schema: Optional[Dict[str, str]] = None,
+    with_source: bool = False,
+) -> pd.DataFrame:
+    """Fast path: one typed DataFrame for every file in data/`subfolder` matching `pattern`."""
+    return load_files(_files(pattern, subfolder), schema, with_source)
@@ -0,0 +1,307 @@
+"""
+Index of the collector CSV files in data/, kept in data/manifest.sqlite.
+
+One row per file: kind, city, issue time, covered target-time range, row
+count, size and checksum. `storage.save.save_records` updates it on every
+write, so readers can pick the files of a time window with an index lookup
+instead of parsing every filename. Files placed in the folders by other means
+(copied or synced in, placed by hand) are picked up by `repair`, which lists
+the folders; `archive.sync` runs it at most once per REPAIR_SECONDS. Names
+that are not collector files are recorded once and not warned about again;
+explicit daily actuals (actual_{city}_{date}.csv) are skipped silently.
+
+    python -m storage.manifest --rebuild      # recreate from an existing data directory
+    python -m storage.manifest --repair       # index files that bypassed storage.save
+"""
+
+import csv
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from storage.layout import CSV_LAYOUT, is_daily_actual, kind_for_subfolder, parse_csv_name
+
+DATA_DIR = Path("data")
+MANIFEST_NAME = "manifest.sqlite"
+
+# Column holding the target (valid) time of each row, per kind
+TARGET_COLUMNS = {"hourly": "time", "daily": "time", "actual": "api_time", "historical": "time"}
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Folder listings of `repair` during archive sync are at least this far apart
+REPAIR_SECONDS = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    city TEXT NOT NULL,
+    issue_time TEXT NOT NULL,
+    target_start TEXT,
+    target_end TEXT,
+    rows INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    PRIMARY KEY (kind, name)
+);
+CREATE INDEX IF NOT EXISTS files_by_issue ON files (kind, city, issue_time);
+CREATE INDEX IF NOT EXISTS files_by_target ON files (kind, city, target_end);
+CREATE TABLE IF NOT EXISTS rejected (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (kind, name)
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _db_path(data_dir: Path) -> Path:
+    return Path(data_dir) / MANIFEST_NAME
+
+
+def _connect(data_dir: Path, path: Optional[Path] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or _db_path(data_dir), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _iso(value) -> Optional[str]:
+    """Normalise a date/datetime (or ISO string) to a sortable timestamp string."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.strftime(TIME_FORMAT)
+
+
+def describe_file(kind: str, path: Path) -> Dict:
+    """Manifest row for one collector file, read from its name and contents."""
+    path = Path(path)
+    raw = path.read_bytes()
+    info = parse_csv_name(kind, path.name)
+    column = TARGET_COLUMNS[kind]
+    targets = [
+        row[column] for row in csv.DictReader(io.StringIO(raw.decode("utf-8")))
+        if row.get(column)
+    ]
+    rows = raw.strip().count(b"\n")
+    return {
+        "kind": kind,
+        "name": path.name,
+        "city": info["city"],
+        "issue_time": _iso(info["issue_time"]),
+        "target_start": _iso(min(targets)) if targets else None,
+        "target_end": _iso(max(targets)) if targets else None,
+        "rows": rows,
+        "size": len(raw),
+        "checksum": hashlib.sha1(raw).hexdigest(),
+    }
+
+
+def _upsert(conn: sqlite3.Connection, entries: Iterable[Dict]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO files VALUES "
+        "(:kind, :name, :city, :issue_time, :target_start, :target_end, :rows, :size, :checksum)",
+        entries,
+    )
+
+
+def _collector_file(kind: str, name: str) -> bool:
+    """False for files that share a collector folder but are not collector output."""
+    return not (kind == "actual" and is_daily_actual(name))
+
+
+def record_file(kind: str, path: Path, data_dir: Path = DATA_DIR) -> None:
+    """Add or refresh the entry of a file that was just written."""
+    if not _collector_file(kind, Path(path).name):
+        return
+    if not _db_path(data_dir).exists():
+        # First write into this data directory: index everything, including this file
+        ensure(data_dir)
+        return
+    entry = describe_file(kind, path)
+    with closing(_connect(data_dir)) as conn, conn:
+        _upsert(conn, [entry])
+
+
+def record_saved(filename: str, subfolder: str, data_dir: Path = DATA_DIR) -> None:
+    """Hook for `storage.save.save_records`; files outside the collector folders are ignored."""
+    kind = kind_for_subfolder(subfolder) if subfolder else None
+    if kind is None:
+        return
+    try:
+        record_file(kind, Path(data_dir) / subfolder / filename, data_dir)
+    except Exception as e:
+        print(f"[WARNING] Could not update manifest for {filename}: {e}")
+
+
+def forget(kind: str, names: Iterable[str], data_dir: Path = DATA_DIR) -> None:
+    """Drop entries of files that were removed (e.g. merged by storage.compact)."""
+    with closing(_connect(data_dir)) as conn, conn:
+        conn.executemany("DELETE FROM files WHERE kind = ? AND name = ?", [(kind, n) for n in names])
+
+
+def _scan(kind: str, data_dir: Path, skip: Iterable[str] = ()) -> tuple:
+    """
+    (entries, rejected (name, reason) pairs, names on disk) of one kind's
+    folder; files named in `skip` are not opened.
+    """
+    subfolder, prefix = CSV_LAYOUT[kind]
+    on_disk = {path.name: path for path in (Path(data_dir) / subfolder).glob(f"{prefix}_*.csv")
+               if _collector_file(kind, path.name)}
+    entries, rejected = [], []
+    for name in sorted(on_disk.keys() - set(skip)):
+        try:
+            entries.append(describe_file(kind, on_disk[name]))
+        except Exception as e:
+            print(f"[WARNING] Skipping {name} in manifest: {e}")
+            rejected.append((name, str(e)))
+    return entries, rejected, set(on_disk)
+
+
+def _mark_repaired(conn: sqlite3.Connection) -> None:
+    conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('repaired', ?)", (str(time.time()),))
+
+
+def rebuild(data_dir: Path = DATA_DIR) -> int:
+    """Recreate the manifest from the files in the data directory. Returns the number of files."""
+    entries, rejected = [], []
+    for kind in CSV_LAYOUT:
+        found, failed, _ = _scan(kind, data_dir)
+        entries.extend(found)
+        rejected.extend((kind, name, reason) for name, reason in failed)
+    # Built next to the live manifest and swapped in, so readers never see it half-filled
+    tmp = _db_path(data_dir).with_suffix(f".{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    with closing(_connect(data_dir, tmp)) as conn, conn:
+        _upsert(conn, entries)
+        conn.executemany("INSERT OR REPLACE INTO rejected (kind, name, reason) VALUES (?, ?, ?)", rejected)
+        _mark_repaired(conn)
+    os.replace(tmp, _db_path(data_dir))
+    return len(entries)
+
+
+def ensure(data_dir: Path = DATA_DIR) -> None:
+    """Build the manifest on first use of a data directory."""
+    if not _db_path(data_dir).exists():
+        count = rebuild(data_dir)
+        print(f"[INFO] Built file manifest with {count} files")
+
+
+def reconcile(kind: str, data_dir: Path = DATA_DIR) -> None:
+    """
+    Bring the entries of one kind in line with its folder: index files that
+    arrived without going through `storage.save` and drop entries of removed
+    files. Names rejected before are not opened (or warned about) again.
+    """
+    if not _db_path(data_dir).exists():
+        ensure(data_dir)
+        return
+    with closing(_connect(data_dir)) as conn:
+        known = {name for (name,) in conn.execute("SELECT name FROM files WHERE kind = ?", (kind,))}
+        rejected = {name for (name,) in conn.execute("SELECT name FROM rejected WHERE kind = ?", (kind,))}
+    added, failed, on_disk = _scan(kind, data_dir, skip=known | rejected)
+    gone = sorted(known - on_disk)
+    with closing(_connect(data_dir)) as conn, conn:
+        _upsert(conn, added)
+        conn.executemany("INSERT OR REPLACE INTO rejected (kind, name, reason) VALUES (?, ?, ?)",
+                         [(kind, name, reason) for name, reason in failed])
+        conn.executemany("DELETE FROM files WHERE kind = ? AND name = ?", [(kind, n) for n in gone])
+        conn.executemany("DELETE FROM rejected WHERE kind = ? AND name = ?",
+                         [(kind, n) for n in sorted(rejected - on_disk)])
+    if added:
+        print(f"[INFO] Indexed {len(added)} {kind} files that were not in the manifest")
+    if gone:
+        print(f"[INFO] Dropped {len(gone)} removed {kind} files from the manifest")
+
+
+def repair(data_dir: Path = DATA_DIR, max_age: Optional[float] = None) -> bool:
+    """
+    Reconcile every kind with its folder, unless the last repair is younger
+    than `max_age` seconds. Returns True if the folders were listed.
+    """
+    if not _db_path(data_dir).exists():
+        ensure(data_dir)
+        return True
+    if max_age is not None:
+        with closing(_connect(data_dir)) as conn:
+            row = conn.execute("SELECT value FROM state WHERE key = 'repaired'").fetchone()
+        if row and time.time() - float(row[0]) < max_age:
+            return False
+    for kind in CSV_LAYOUT:
+        reconcile(kind, data_dir)
+    with closing(_connect(data_dir)) as conn, conn:
+        _mark_repaired(conn)
+    return True
+
+
+def files(
+    kind: str,
+    city: Optional[str] = None,
+    issue_start=None,
+    issue_end=None,
+    target_start=None,
+    target_end=None,
+    data_dir: Path = DATA_DIR,
+) -> List[Path]:
+    """
+    Paths of the files of one kind whose issue time lies in the window and whose
+    target-time range overlaps the target window (inclusive), oldest issue first.
+    """
+    clauses = ["kind = ?"]
+    args: List = [kind]
+    for clause, value in (
+        ("city = ?", city),
+        ("issue_time >= ?", _iso(issue_start)),
+        ("issue_time <= ?", _iso(issue_end)),
+        ("target_end >= ?", _iso(target_start)),
+        ("target_start <= ?", _iso(target_end)),
+    ):
+        if value is not None:
+            clauses.append(clause)
+            args.append(value)
+    sql = f"SELECT name FROM files WHERE {' AND '.join(clauses)} ORDER BY issue_time, name"
+    folder = Path(data_dir) / CSV_LAYOUT[kind][0]
+    with closing(_connect(data_dir)) as conn:
+        return [folder / name for (name,) in conn.execute(sql, args)]
+
+
+def latest(kind: str, city: str, data_dir: Path = DATA_DIR) -> Optional[Path]:
+    """Most recently issued file of a kind for a city."""
+    with closing(_connect(data_dir)) as conn:
+        row = conn.execute(
+            "SELECT name FROM files WHERE kind = ? AND city = ? ORDER BY issue_time DESC, name DESC LIMIT 1",
+            (kind, city),
+        ).fetchone()
+    return Path(data_dir) / CSV_LAYOUT[kind][0] / row[0] if row else None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index of the collector CSV files")
+    parser.add_argument("--rebuild", action="store_true", help="recreate the manifest from data/")
+    parser.add_argument("--repair", action="store_true", help="index files that bypassed storage.save")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"[INFO] Manifest rebuilt with {rebuild()} files")
+    elif args.repair:
+        repair()
+    else:
+        ensure()
+        for kind in CSV_LAYOUT:
+            print(f"{kind}: {len(files(kind))} files")
@@ -1,6 +1,9 @@
 from pathlib import Path
 import csv
-from typing import Dict, List, Iterable
+from typing import Dict, List, Iterable, Sequence
+
+from storage import manifest
+from telemetry import recorder
 
 # Create main data directories if not exist
 Path("data").mkdir(exist_ok=True)
@@ -21,7 +24,33 @@ def save_records(filename: str, records: Iterable[Dict], subfolder: str = "") ->
     if not records:
         return
 
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=records[0].keys())
-        writer.writeheader()
-        writer.writerows(records)
\ No newline at end of file
+    with recorder.stage("save_csv", subfolder=subfolder) as stage:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=records[0].keys())
+            writer.writeheader()
+            writer.writerows(records)
+        manifest.record_saved(filename, subfolder)
+        stage.rows = len(records)
+
+
+def save_columns(filename: str, columns: Dict[str, Sequence], subfolder: str = "") -> None:
+    """
+    Columnar counterpart of `save_records`: `columns` maps each CSV column to its
+    values (e.g. the arrays of an Open-Meteo `hourly` block). The file is
+    byte-identical to `save_records` with the same data, without per-row dicts.
+    """
+    folder = Path("data") / subfolder if subfolder else Path("data")
+    folder.mkdir(exist_ok=True)
+    path = folder / filename
+
+    rows = len(next(iter(columns.values()), []))
+    if not rows:
+        return
+
+    with recorder.stage("save_csv", subfolder=subfolder) as stage:
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns.keys())
+            writer.writerows(zip(*columns.values()))
+        manifest.record_saved(filename, subfolder)
+        stage.rows = rows
@@ -0,0 +1,247 @@
+"""
+Opt-in instrumentation of fetching, storage and evaluation.
+
+Records HTTP requests (latency, response bytes, status, retries), stage
+durations with row counts, and the peak memory of the process. Enabled by
+setting FORECAST_TELEMETRY_DIR (or calling `enable`):
+
+    FORECAST_TELEMETRY_DIR=data/telemetry python run_hourly_analysis.py
+
+Every event is appended to `{dir}/events.jsonl` as one JSON line. Totals per
+stage and per host/status are written as a Prometheus textfile
+`{dir}/{job}.prom` (for node_exporter's textfile collector) by `flush()` and
+at exit. When disabled, `stage` returns a shared no-op object and the other
+functions return immediately.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TELEMETRY_DIR_ENV = "FORECAST_TELEMETRY_DIR"
+# Pid of the process that owns the .prom file; worker processes only append events
+OWNER_PID_ENV = "FORECAST_TELEMETRY_OWNER"
+EVENTS_FILE = "events.jsonl"
+METRIC_PREFIX = "forecast_tracker"
+
+_lock = threading.Lock()
+_directory: Optional[Path] = None
+_job = ""
+_events = None
+# stage -> [calls, seconds, rows, failures]
+_stages: Dict[str, list] = {}
+# (host, status) -> [requests, seconds, bytes, retries]
+_requests: Dict[Tuple[str, str], list] = {}
+
+
+def enable(directory: Path, job: Optional[str] = None) -> None:
+    """Start recording into `directory`. `job` names the .prom file (default: the script name)."""
+    global _directory, _job, _events
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        if _events is not None:
+            _events.close()
+        _directory = directory
+        script = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] not in ("", "-c") else ""
+        _job = job or script or "python"
+        _events = (directory / EVENTS_FILE).open("a", encoding="utf-8", buffering=1)
+    os.environ.setdefault(TELEMETRY_DIR_ENV, str(directory))
+    os.environ.setdefault(OWNER_PID_ENV, str(os.getpid()))
+
+
+def enabled() -> bool:
+    return _directory is not None
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _emit(event: Dict) -> None:
+    line = json.dumps({"time": round(time.time(), 3), "job": _job, "pid": os.getpid(), **event}, default=str)
+    with _lock:
+        if _events is not None:
+            _events.write(line + "\n")
+
+
+class Stage:
+    """Times a `with` block; set `rows` inside the block to record how many rows it handled."""
+
+    __slots__ = ("name", "labels", "rows", "_started")
+
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+        self.rows = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        rows = int(self.rows) if self.rows is not None else None
+        with _lock:
+            totals = _stages.setdefault(self.name, [0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += rows or 0
+            totals[3] += exc_type is not None
+        _emit({"event": "stage", "stage": self.name, "labels": self.labels, "seconds": round(seconds, 6),
+               "rows": rows, "ok": exc_type is None, "peak_memory_bytes": peak_memory_bytes()})
+        return False
+
+
+class _NullStage:
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, **labels):
+    """
+    Context manager timing one stage:
+
+        with recorder.stage("load", city=city) as s:
+            df = ...
+            s.rows = len(df)
+    """
+    return Stage(name, labels) if _directory is not None else _NULL_STAGE
+
+
+def timed(name: str, rows: Optional[Callable] = None):
+    """Decorator recording every call as stage `name`; `rows(result)` gives its row count."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _directory is None:
+                return func(*args, **kwargs)
+            with Stage(name, {}) as s:
+                result = func(*args, **kwargs)
+                if rows is not None and result is not None:
+                    s.rows = rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def _retries(response) -> int:
+    """Retries urllib3 made before this response (0 unless the adapter has a Retry policy)."""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(getattr(retries, "history", ()) or ())
+
+
+def request(url: str, response, seconds: float, retries: Optional[int] = None) -> None:
+    """
+    Record one HTTP request. `response` is the requests.Response, or None when
+    the request failed before one arrived; call it while handling that error
+    so the exception type is recorded. `retries` is the number of earlier
+    attempts (default: the retries urllib3 made).
+    """
+    if _directory is None:
+        return
+    host = urlsplit(url).netloc
+    error = sys.exc_info()[0]
+    if response is not None:
+        status, size = str(response.status_code), len(response.content)
+    else:
+        status, size = "error", 0
+    if retries is None:
+        retries = _retries(response) if response is not None else 0
+    with _lock:
+        totals = _requests.setdefault((host, status), [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += size
+        totals[3] += retries
+    _emit({"event": "request", "host": host, "path": urlsplit(url).path, "status": status,
+           "seconds": round(seconds, 6), "bytes": size, "retries": retries,
+           "error": error.__name__ if error else None})
+
+
+def _labels(**labels) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def prometheus_text() -> str:
+    """The totals of this process in the Prometheus text exposition format."""
+    p, job = METRIC_PREFIX, _job
+    lines = []
+
+    def family(name: str, kind: str, help_text: str, samples) -> None:
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} {kind}")
+        lines.extend(samples)
+
+    with _lock:
+        stages = sorted((k, list(v)) for k, v in _stages.items())
+        requests_ = sorted((k, list(v)) for k, v in _requests.items())
+
+    family("stage_duration_seconds", "summary", "Wall time of instrumented stages.", [
+        f"{p}_stage_duration_seconds_{suffix}{_labels(job=job, stage=s)} {value}"
+        for s, (calls, seconds, _, _) in stages
+        for suffix, value in (("sum", f"{seconds:.6f}"), ("count", calls))
+    ])
+    family("stage_rows_total", "counter", "Rows handled by instrumented stages.",
+           [f"{p}_stage_rows_total{_labels(job=job, stage=s)} {rows}" for s, (_, _, rows, _) in stages])
+    family("stage_failures_total", "counter", "Instrumented stages that raised.",
+           [f"{p}_stage_failures_total{_labels(job=job, stage=s)} {failed}" for s, (_, _, _, failed) in stages])
+    family("http_request_duration_seconds", "summary", "Latency of HTTP requests.", [
+        f"{p}_http_request_duration_seconds_{suffix}{_labels(job=job, host=h, status=st)} {value}"
+        for (h, st), (count, seconds, _, _) in requests_
+        for suffix, value in (("sum", f"{seconds:.6f}"), ("count", count))
+    ])
+    family("http_response_bytes_total", "counter", "Bytes of HTTP response bodies.",
+           [f"{p}_http_response_bytes_total{_labels(job=job, host=h, status=st)} {size}"
+            for (h, st), (_, _, size, _) in requests_])
+    family("http_retries_total", "counter", "Retries made before a response arrived.",
+           [f"{p}_http_retries_total{_labels(job=job, host=h, status=st)} {retries}"
+            for (h, st), (_, _, _, retries) in requests_])
+    peak = peak_memory_bytes()
+    if peak is not None:
+        family("peak_memory_bytes", "gauge", "Peak resident set size of the process.",
+               [f"{p}_peak_memory_bytes{_labels(job=job)} {peak}"])
+    family("last_flush_timestamp_seconds", "gauge", "When these values were written.",
+           [f"{p}_last_flush_timestamp_seconds{_labels(job=job)} {time.time():.3f}"])
+    return "\n".join(lines) + "\n"
+
+
+def flush() -> None:
+    """Rewrite `{dir}/{job}.prom` with the current totals (worker processes leave it alone)."""
+    if _directory is None or os.environ.get(OWNER_PID_ENV) != str(os.getpid()):
+        return
+    path = _directory / f"{_job}.prom"
+    tmp = path.with_suffix(".prom.tmp")
+    tmp.write_text(prometheus_text(), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+atexit.register(flush)
+
+if os.environ.get(TELEMETRY_DIR_ENV):
+    enable(Path(os.environ[TELEMETRY_DIR_ENV]))
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from storage import archive
+
+
+def _daily(day: str, value: float) -> pd.DataFrame:
+    targets = pd.date_range(day, periods=10, freq="D")
+    return pd.DataFrame({"issue_time": pd.Timestamp(day), "target_time": targets,
+                         "temperature_2m_max": value + np.arange(10)})
+
+
+def test_replaced_batches_are_dropped_from_the_partition(tmp_path):
+    for day in ("2025-06-01", "2025-06-02"):
+        for hour in range(24):
+            archive.append_frame("daily", "Koper", _daily(day, hour), source=f"daily_Koper_{day}.csv",
+                                 replace=True, root=tmp_path)
+
+    part = archive.list_partitions("daily", "Koper", tmp_path)[0]
+    meta = archive.partition_meta(part)
+    live = sum(b["rows"] for b in meta["batches"] if not b.get("superseded"))
+    assert live == 20 and meta["rows"] <= 2 * live
+    assert meta["generation"] > 1
+    # Only the current and the previous generation of column files are kept
+    assert len(list(part.glob("issue_time*.bin"))) == 2
+
+    df = archive.query("daily", "Koper", root=tmp_path)
+    assert len(df) == 20
+    assert (df.groupby("issue_time")["temperature_2m_max"].min() == 23).all()
+    assert archive.list_sources("daily", "Koper", tmp_path) == ["daily_Koper_2025-06-01.csv",
+                                                               "daily_Koper_2025-06-02.csv"]
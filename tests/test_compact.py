@@ -0,0 +1,37 @@
+from datetime import date
+
+from storage import archive, compact
+
+HEADER = "time,interval,temperature,windspeed,winddirection,is_day,weathercode,fetched_time,api_time\n"
+
+
+def _snapshot(folder, city: str, day: str, hour: int) -> None:
+    stamp = f"{day}T{hour:02d}:00"
+    (folder / f"actual_{city}_{day}_{hour:02d}-05.csv").write_text(
+        HEADER + f"{stamp},900,{10 + hour},2.4,207,1,2,{day}T{hour:02d}:05:00,{stamp}\n")
+
+
+def test_compaction_keeps_daily_actuals_and_archives_late_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(compact, "SETTLE_SECONDS", -60)
+    data_dir, root = tmp_path / "data", tmp_path / "archive"
+    folder = data_dir / "actual_data"
+    folder.mkdir(parents=True)
+    for hour in (1, 2):
+        _snapshot(folder, "Koper", "2025-06-06", hour)
+    daily = folder / "actual_Koper_2025-06-06.csv"
+    daily.write_text("temperature_2m_max,temperature_2m_min\n25.0,12.0\n")
+
+    compact.compact_actuals("day", folder, today=date(2025, 6, 8))
+    assert daily.exists()
+    assert (folder / "actual_Koper_2025-06-06_compacted.csv").exists()
+    archive.sync(data_dir, root)
+    assert len(archive.query("actual", "Koper", root=root)) == 2
+
+    # A late snapshot of the compacted day is merged into the next generation and archived
+    _snapshot(folder, "Koper", "2025-06-06", 3)
+    compact.compact_actuals("day", folder, today=date(2025, 6, 8))
+    assert not (folder / "actual_Koper_2025-06-06_compacted.csv").exists()
+    assert (folder / "actual_Koper_2025-06-06_1_compacted.csv").exists()
+    assert daily.exists()
+    archive.sync(data_dir, root)
+    assert sorted(archive.query("actual", "Koper", root=root)["temperature"]) == [11.0, 12.0, 13.0]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from evaluator.horizon import build_horizon_pairs, horizon_metrics, prepare_actuals, stack_forecasts
+from evaluator.scan import scan_horizon_metrics
+from storage import archive, forecast_store
+from storage.forecast_cube import ForecastCube
+from storage.forecast_store import OBSERVED_COLUMNS, PARAMETERS
+
+START = pd.Timestamp("2025-01-30")
+# Minutes past the hour of the runs; half past is where the rounded horizon collides
+ISSUE_MINUTES = (0, 30, 55, 5, 30, 45)
+
+
+def _forecasts(rng: np.random.Generator, days: int) -> pd.DataFrame:
+    frames = []
+    for i in range(days * 4):
+        issue = START + pd.Timedelta(hours=6 * i, minutes=ISSUE_MINUTES[i % len(ISSUE_MINUTES)])
+        targets = pd.date_range(issue.floor("h"), periods=49, freq="h")
+        values = {p: rng.normal(10, 5, len(targets)).round(1) for p in PARAMETERS}
+        values[PARAMETERS[1]][rng.random(len(targets)) < 0.1] = np.nan
+        frames.append(pd.DataFrame({"issue_time": issue, "target_time": targets, **values}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _observations(rng: np.random.Generator, days: int) -> pd.DataFrame:
+    targets = pd.date_range(START, periods=days * 24 + 48, freq="h") + pd.Timedelta(minutes=2)
+    df = pd.DataFrame({"issue_time": targets + pd.Timedelta(minutes=3), "target_time": targets})
+    for p in PARAMETERS:
+        df[OBSERVED_COLUMNS.get(p, p)] = rng.normal(10, 5, len(df)).round(1)
+    return df
+
+
+def _reference(city: str, root) -> pd.DataFrame:
+    actuals = prepare_actuals(archive.query("actual", city, root=root), PARAMETERS)
+    forecasts = archive.query("hourly", city, parameters=PARAMETERS, root=root)
+    return horizon_metrics(build_horizon_pairs(forecasts, actuals, PARAMETERS), "x")
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(["city", "parameter", "horizon_hours"]).reset_index(drop=True)
+
+
+def test_scan_matches_in_memory_evaluation(tmp_path):
+    rng = np.random.default_rng(0)
+    archive_root, store_root = tmp_path / "archive", tmp_path / "store"
+    forecasts, observations = _forecasts(rng, 6), _observations(rng, 6)
+
+    # Two syncs, so that runs are appended to an existing store and the grid grows
+    half = forecasts["issue_time"] < START + pd.Timedelta(days=3)
+    archive.append_frame("hourly", "Koper", forecasts[half], source="first", root=archive_root)
+    archive.append_frame("actual", "Koper", observations.iloc[:80], source="first", root=archive_root)
+    forecast_store.sync(["Koper"], store_root, archive_root)
+    archive.append_frame("hourly", "Koper", forecasts[~half], source="second", root=archive_root)
+    archive.append_frame("actual", "Koper", observations.iloc[80:], source="second", root=archive_root)
+    # A replaced run is overwritten in place
+    issue = forecasts["issue_time"].iloc[0]
+    replaced = forecasts[forecasts["issue_time"] == issue].copy()
+    replaced[PARAMETERS[0]] += 5
+    archive.append_frame("hourly", "Koper", replaced, source="first", replace=True, root=archive_root)
+    archive.append_frame("hourly", "Koper", forecasts[half & (forecasts["issue_time"] != issue)],
+                         source="first-rest", root=archive_root)
+    forecast_store.sync(["Koper"], store_root, archive_root)
+
+    expected = _sorted(_reference("Koper", archive_root))
+    got = _sorted(scan_horizon_metrics(["Koper"], PARAMETERS, window_days=2, evaluation_timestamp="x",
+                                       root=store_root))
+    assert len(got) == len(expected) > 0
+    for column in ("city", "parameter", "horizon_hours", "count"):
+        assert (got[column].to_numpy() == expected[column].to_numpy()).all()
+    for column in ("MAE", "RMSE", "MAPE"):
+        assert np.array_equal(got[column].to_numpy(), expected[column].to_numpy(), equal_nan=True)
+
+
+def test_cube_horizon_matches_evaluation_horizon():
+    rng = np.random.default_rng(1)
+    forecasts = _forecasts(rng, 2)
+    cube = ForecastCube.from_frame(forecasts, "Koper", PARAMETERS)
+    long = stack_forecasts(forecasts.assign(city="Koper"), PARAMETERS[:1])
+    for horizon in (0, 1, 6, 24):
+        runs, targets, values = cube.horizon(PARAMETERS[0], horizon)
+        expected = long[long["horizon_hours"] == horizon].sort_values(["issue_time", "target_time"])
+        assert (cube.issue_times[runs] == expected["issue_time"].to_numpy(dtype="datetime64[s]")).all()
+        assert (targets == expected["target_time"].to_numpy(dtype="datetime64[s]")).all()
+        assert np.allclose(values, expected["forecast_value"].to_numpy(), equal_nan=True)
+
+
+def test_store_follows_rewritten_partitions(tmp_path):
+    rng = np.random.default_rng(2)
+    archive_root, store_root = tmp_path / "archive", tmp_path / "store"
+    forecasts = _forecasts(rng, 2)
+    archive.append_frame("hourly", "Koper", forecasts, source="runs", root=archive_root)
+    archive.append_frame("actual", "Koper", _observations(rng, 2), source="obs", root=archive_root)
+    forecast_store.sync(["Koper"], store_root, archive_root)
+
+    # Replacing the whole file twice outnumbers the live rows, so the partition is rewritten
+    for shift in (1, 2):
+        archive.append_frame("hourly", "Koper", forecasts.assign(**{PARAMETERS[0]: forecasts[PARAMETERS[0]] + shift}),
+                             source="runs", replace=True, root=archive_root)
+    assert archive.partition_meta(archive.list_partitions("hourly", "Koper", archive_root)[0])["generation"] == 1
+    forecast_store.sync(["Koper"], store_root, archive_root)
+
+    expected = _sorted(_reference("Koper", archive_root))
+    got = _sorted(scan_horizon_metrics(["Koper"], PARAMETERS, window_days=2, evaluation_timestamp="x",
+                                       root=store_root))
+    for column in ("MAE", "RMSE", "MAPE"):
+        assert np.array_equal(got[column].to_numpy(), expected[column].to_numpy(), equal_nan=True)
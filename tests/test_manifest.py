@@ -0,0 +1,24 @@
+from storage import archive, manifest
+
+HEADER = "time,interval,temperature,windspeed,winddirection,is_day,weathercode,fetched_time,api_time\n"
+
+
+def test_repair_indexes_copied_files_and_warns_once(tmp_path, capsys):
+    data_dir, root = tmp_path / "data", tmp_path / "archive"
+    folder = data_dir / "actual_data"
+    folder.mkdir(parents=True)
+    (folder / "actual_Koper_2025-06-06.csv").write_text("temperature_2m_max\n25.0\n")
+    (folder / "actual_Koper_notes.csv").write_text("x\n1\n")
+    archive.sync(data_dir, root)
+    assert capsys.readouterr().out.count("actual_Koper_notes.csv") == 1
+
+    # A copied file is not seen until the folders are listed again
+    (folder / "actual_Koper_2025-06-07_10-05.csv").write_text(
+        HEADER + "2025-06-07T10:00,900,18.5,2.4,207,1,2,2025-06-07T10:05:00,2025-06-07T10:00\n")
+    archive.sync(data_dir, root)
+    assert manifest.files("actual", data_dir=data_dir) == []
+    archive.sync(data_dir, root, repair=True)
+    assert [p.name for p in manifest.files("actual", data_dir=data_dir)] == ["actual_Koper_2025-06-07_10-05.csv"]
+    assert len(archive.query("actual", "Koper", root=root)) == 1
+    out = capsys.readouterr().out
+    assert "actual_Koper_notes.csv" not in out and "2025-06-06.csv" not in out
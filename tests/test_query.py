@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from service.query import aggregate_results
+
+
+def test_aggregate_skips_nan_metrics_in_the_weights():
+    df = pd.DataFrame({
+        "city": ["Koper", "Koper", "Maribor"],
+        "MAE": [1.0, 3.0, 2.0],
+        "RMSE": [1.0, np.nan, 2.0],
+        "MAPE": [10.0, np.nan, np.nan],
+        "count": [10, 10, 5],
+    })
+    result = aggregate_results(df, ["city"]).set_index("city")
+    assert result.loc["Koper", "MAPE"] == 10.0
+    assert result.loc["Koper", "RMSE"] == 1.0
+    assert result.loc["Koper", "MAE"] == 2.0
+    assert result.loc["Koper", "count"] == 20
+    assert np.isnan(result.loc["Maribor", "MAPE"])
+
+
+def test_aggregate_weights_mape_by_its_own_count():
+    df = pd.DataFrame({
+        "MAPE": [10.0, 40.0],
+        "mape_count": [3, 1],
+        "count": [10, 10],
+    })
+    result = aggregate_results(df, [])
+    assert result.loc[0, "MAPE"] == 17.5
+    assert result.loc[0, "count"] == 20
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from fetcher import ratelimit
+
+
+class _Trickle(BaseHTTPRequestHandler):
+    """Sends the body a byte at a time, each read well within the requests timeout."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "20")
+        self.end_headers()
+        for _ in range(20):
+            self.wfile.write(b"x")
+            self.wfile.flush()
+            time.sleep(0.1)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_send_async_limits_each_attempt(monkeypatch):
+    monkeypatch.setattr(ratelimit, "MAX_RETRIES", 1)
+    monkeypatch.setattr(ratelimit, "backoff", lambda attempt: 0.0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Trickle)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    async def attempt() -> float:
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await ratelimit.send_async(requests.Session(), url, {}, timeout=0.5)
+        return time.perf_counter() - started
+
+    try:
+        # Two attempts of 0.5 s; without the per-attempt limit each takes the 2 s trickle
+        assert asyncio.run(attempt()) < 1.8
+    finally:
+        server.shutdown()
+
+
+def test_limiter_paces_a_full_bucket():
+    clock = [0.0]
+    limiter = ratelimit.RateLimiter({"minute": 60, "day": 1000}, state_file=None, clock=lambda: clock[0],
+                                    sleep=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    waits = [limiter.acquire() for _ in range(5)]
+    # One call per second, the rate of the minute budget, although 60 calls are available at once
+    assert waits == [0.0, 1.0, 1.0, 1.0, 1.0]
+    assert clock[0] == 4.0
+    # A request for ten locations holds the next one back for ten calls' worth
+    limiter.acquire(10)
+    assert limiter.acquire() == 10.0
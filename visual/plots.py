@@ -1,9 +1,9 @@
 from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from visual.batch import PLOT_DIR, plot_job, render_plot
 
 # Ensure plots directory exists
-PLOT_DIR = Path("plots")
 PLOT_DIR.mkdir(exist_ok=True)
 
 
@@ -17,21 +17,9 @@ def plot_forecast_vs_actual(
 ) -> Path:
     """
     Plots actual vs forecasted values for a given city.
+    Many plots at once are faster with `visual.batch.render_batch`.
     """
-    fig, ax = plt.subplots(figsize=(10, 5))
-    df.plot(x=date_col, y=actual_col, ax=ax, label="Actual", linestyle='-', marker='o')
-    df.plot(x=date_col, y=forecast_col, ax=ax, label="Forecast", linestyle='--', marker='x')
-
-    ax.set_title(f"Forecast vs Actual - {city} {label}")
-    ax.set_xlabel("Time")
-    ax.set_ylabel("Value")
-    ax.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
     filename = f"forecast_vs_actual_{city.replace(' ', '_')}_{label.replace(' ', '_')}.png"
-    path = PLOT_DIR / filename
-    fig.savefig(path)
-    plt.close(fig)
-    return path
-
+    job = plot_job(df, date_col, actual_col, forecast_col, f"Forecast vs Actual - {city} {label}",
+                   PLOT_DIR / filename, template="detailed")
+    return Path(render_plot(job))